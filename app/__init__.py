@@ -1,21 +1,69 @@
+import logging
 from flask import Flask
 from app.config.config import config
 from app.config.extensions import db, migrate
 
-def create_app(config_name='development'):
+logger = logging.getLogger(__name__)
+
+def create_app(config_name='production', start_background=True):
+    """Build the app; ``start_background=False`` leaves its threads to ``start_background_tasks``,
+    e.g. for a server that forks workers after loading the app."""
     app = Flask(__name__)
 
     app.config.from_object(config[config_name])
 
+    from app.services.auth import init_auth
+    init_auth(app)
+
+    from app.services.sharding import init_sharding
+    init_sharding(app)
+
     db.init_app(app)
     migrate.init_app(app, db)
 
+    from app.services.expense_cache import init_expense_cache
+    init_expense_cache(app)
+
+    from app.services.shared_cache import init_shared_cache
+    init_shared_cache(app)
+
+    from app.services.result_cache import init_result_cache
+    init_result_cache(app)
+
+    from app.services.group_commit import init_group_commit
+    init_group_commit(app)
+
+    from app.utils.responses import init_response_encoding
+    init_response_encoding(app)
+
     with app.app_context():
         from app import models
 
         # Auto-create tables if they don't exist (development only)
         if config_name == 'development':
             # db.create_all()
-            print("✅ Database tables created/verified")
+            logger.info("Database tables created/verified")
+
+    from app.api import bp as api_bp
+    from app.api.health_controller import bp as health_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
+    app.register_blueprint(health_bp, url_prefix='/')
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    if start_background:
+        start_background_tasks(app)
+
+    return app
 
-    return app
\ No newline at end of file
+def start_background_tasks(app):
+    """Start the threads the app runs besides serving requests, in this process."""
+    if app.config.get('RECURRING_SCHEDULER_ENABLED'):
+        from app.services.recurring import start_scheduler_thread
+        from app.services.sharding import shard_names
+        for shard in shard_names(app):
+            start_scheduler_thread(app, shard=shard)
+    if app.config.get('PARTITION_MAINTENANCE_ENABLED'):
+        from app.services.partitions import start_maintenance_thread
+        start_maintenance_thread(app)
\ No newline at end of file
@@ -0,0 +1,208 @@
+from datetime import datetime
+from flask import Blueprint, request
+import numpy as np
+from app.services.expense_cache import PAYMENT_METHODS, get_expense_cache, get_user_columns, to_day
+from app.utils.money import amount_fields, requested_amount_format
+from app.utils.responses import success_response, error_response
+from app.utils.conditional import conditional_get, with_cache_validators
+from app.services.result_cache import cached_result
+from app.services.auth import current_user_id
+
+bp = Blueprint('analytics', __name__)
+
+GROUPINGS = ('category', 'payment_method', 'month', 'day')
+
+
+def _filters(user_id):
+    """Return the request's (start_day, end_day, category_id) filters, or an error response."""
+    if not user_id:
+        return None, error_response("user_id is required", status_code=400)
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    category_id = request.args.get('category_id', type=int)
+    try:
+        start_day = to_day(datetime.fromisoformat(start_date)) if start_date else None
+        end_day = to_day(datetime.fromisoformat(end_date)) if end_date else None
+    except ValueError:
+        return None, error_response("start_date and end_date must be ISO dates", status_code=400)
+    return (start_day, end_day, category_id), None
+
+
+def _load(user_id, filters):
+    """Return (columns, mask) for the user's expenses matching ``filters``."""
+    start_day, end_day, category_id = filters
+    columns = get_user_columns(user_id)
+    mask = np.ones(len(columns), dtype=bool)
+    if start_day is not None:
+        mask &= columns.days >= start_day
+    if end_day is not None:
+        mask &= columns.days <= end_day
+    if category_id:
+        mask &= columns.categories == category_id
+    return columns, mask
+
+
+def _day_labels(days):
+    return [str(day) for day in np.asarray(days).astype('datetime64[D]')]
+
+
+def _group_totals(cents, keys):
+    groups, inverse = np.unique(keys, return_inverse=True)
+    totals = np.zeros(len(groups), dtype=np.int64)
+    np.add.at(totals, inverse, cents)
+    counts = np.bincount(inverse, minlength=len(groups))
+    return groups, totals, counts
+
+
+@bp.route('/summary', methods=['GET'])
+def get_summary():
+    user_id = current_user_id()
+    group_by = request.args.get('group_by')
+    if group_by and group_by not in GROUPINGS:
+        return error_response(f"group_by must be one of: {', '.join(GROUPINGS)}", status_code=400)
+
+    filters, error = _filters(user_id)
+    if error:
+        return error
+    not_modified = conditional_get(user_id)
+    if not_modified:
+        return not_modified
+
+    data = cached_result(user_id, lambda: _summary(user_id, filters, group_by))
+    return with_cache_validators(success_response(data))
+
+
+def _summary(user_id, filters, group_by):
+    columns, mask = _load(user_id, filters)
+    cents = columns.cents[mask]
+    amount_format = requested_amount_format()
+
+    data = {
+        'count': int(cents.size),
+        **amount_fields(
+            amount_format,
+            total=int(cents.sum()),
+            average=int(round(float(cents.mean()))) if cents.size else 0,
+            min=int(cents.min()) if cents.size else 0,
+            max=int(cents.max()) if cents.size else 0,
+        ),
+    }
+    if group_by:
+        if group_by == 'category':
+            keys = columns.categories[mask]
+        elif group_by == 'payment_method':
+            keys = columns.payment_methods[mask]
+        else:
+            days = columns.days[mask]
+            keys = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) if group_by == 'month' else days
+        groups, totals, counts = _group_totals(cents, keys)
+
+        if group_by == 'category':
+            labels = [int(group) for group in groups]
+        elif group_by == 'payment_method':
+            labels = [PAYMENT_METHODS[group] for group in groups]
+        elif group_by == 'month':
+            labels = [str(np.datetime64(int(group), 'M')) for group in groups]
+        else:
+            labels = _day_labels(groups)
+        data['groups'] = [
+            {group_by: label, 'count': int(count), **amount_fields(amount_format, total=int(total))}
+            for label, total, count in zip(labels, totals, counts)
+        ]
+    return data
+
+
+@bp.route('/histogram', methods=['GET'])
+def get_histogram():
+    user_id = current_user_id()
+    bins = min(max(request.args.get('bins', 20, type=int), 1), 200)
+    scale = request.args.get('scale', 'linear')
+    if scale not in ('linear', 'log'):
+        return error_response("scale must be linear or log", status_code=400)
+
+    filters, error = _filters(user_id)
+    if error:
+        return error
+    not_modified = conditional_get(user_id)
+    if not_modified:
+        return not_modified
+
+    data = cached_result(user_id, lambda: _histogram(user_id, filters, bins, scale))
+    return with_cache_validators(success_response(data))
+
+
+def _histogram(user_id, filters, bins, scale):
+    columns, mask = _load(user_id, filters)
+    amounts = columns.cents[mask] / 100
+
+    if amounts.size == 0:
+        return {'edges': [], 'counts': []}
+    low, high = float(amounts.min()), float(amounts.max())
+    if scale == 'log':
+        edges = np.geomspace(low, high, bins + 1) if high > low else np.array([low, high])
+    else:
+        edges = bins
+    counts, edges = np.histogram(amounts, bins=edges, range=(low, high))
+    return {
+        'edges': [round(float(edge), 2) for edge in edges],
+        'counts': counts.tolist(),
+    }
+
+
+@bp.route('/top', methods=['GET'])
+def get_top():
+    user_id = current_user_id()
+    by = request.args.get('by', 'expense')
+    n = min(max(request.args.get('n', 10, type=int), 1), 100)
+    if by not in ('expense', 'category', 'payment_method'):
+        return error_response("by must be expense, category or payment_method", status_code=400)
+
+    filters, error = _filters(user_id)
+    if error:
+        return error
+    not_modified = conditional_get(user_id)
+    if not_modified:
+        return not_modified
+
+    data = cached_result(user_id, lambda: _top(user_id, filters, by, n))
+    return with_cache_validators(success_response(data))
+
+
+def _top(user_id, filters, by, n):
+    columns, mask = _load(user_id, filters)
+    cents = columns.cents[mask]
+    amount_format = requested_amount_format()
+
+    if by == 'expense':
+        count = min(n, cents.size)
+        top = np.argpartition(-cents, count - 1)[:count] if count else np.array([], dtype=np.int64)
+        top = top[np.argsort(-cents[top], kind='stable')]
+        ids, days, categories = columns.ids[mask][top], columns.days[mask][top], columns.categories[mask][top]
+        return [
+            {
+                'id': int(expense_id),
+                **amount_fields(amount_format, amount=int(amount)),
+                'expense_date': label,
+                'category_id': int(category),
+            }
+            for expense_id, amount, label, category in zip(ids, cents[top], _day_labels(days), categories)
+        ]
+    keys = columns.categories[mask] if by == 'category' else columns.payment_methods[mask]
+    groups, totals, counts = _group_totals(cents, keys)
+    order = np.argsort(-totals, kind='stable')[:n]
+    return [
+        {
+            by: int(groups[i]) if by == 'category' else PAYMENT_METHODS[groups[i]],
+            'count': int(counts[i]),
+            **amount_fields(amount_format, total=int(totals[i])),
+        }
+        for i in order
+    ]
+
+
+@bp.route('/cache', methods=['GET'])
+def get_cache_stats():
+    cache = get_expense_cache()
+    if cache is None:
+        return success_response({'enabled': False})
+    return success_response({'enabled': True, **cache.stats()})
@@ -0,0 +1,46 @@
+from flask import Blueprint, request
+from pydantic import ValidationError
+from app.models.user import User
+from app.schemas.auth_schema import LoginSchema, TokenResponseSchema
+from app.services.auth import current_principal, get_token_auth
+from app.services.sharding import get_shard_router, route_to
+from app.utils.responses import serialized_response, success_response, error_response, validation_error_response
+
+bp = Blueprint('auth', __name__)
+
+@bp.route('/login', methods=['POST'])
+def login():
+    try:
+        data = LoginSchema.model_validate_json(request.get_data())
+    except ValidationError as e:
+        return validation_error_response(e.errors())
+
+    # Usernames are stored lowercased
+    login = data.login if '@' in data.login else data.login.lower()
+    router = get_shard_router()
+    if router is not None:
+        user_id = router.find_user(login)
+        if user_id is None:
+            return error_response("Invalid login or password", status_code=401)
+        route_to(router.shard_of(user_id))
+
+    user = User.query.filter((User.email == login) | (User.username == login)).first()
+    if not user or not user.check_password(data.password):
+        return error_response("Invalid login or password", status_code=401)
+    if not user.is_active:
+        return error_response("User is inactive", status_code=403)
+
+    auth = get_token_auth()
+    return serialized_response(
+        TokenResponseSchema,
+        {'access_token': auth.issue(user), 'expires_in': int(auth.ttl), 'user': user},
+        "Logged in successfully",
+    )
+
+@bp.route('/logout', methods=['POST'])
+def logout():
+    principal = current_principal()
+    if principal is None:
+        return error_response("Authentication required", status_code=401)
+    get_token_auth().denylist.revoke_token(principal)
+    return success_response(message="Logged out successfully")
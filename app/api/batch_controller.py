@@ -0,0 +1,111 @@
+import json
+from flask import Blueprint, current_app, g, request
+from pydantic import ValidationError
+from werkzeug.test import EnvironBuilder
+from app.config.extensions import db
+from app.schemas.batch_schema import BatchRequestSchema
+from app.utils.responses import success_response, error_response, validation_error_response, wants_msgpack
+from app.utils.unit_of_work import unit_of_work
+
+bp = Blueprint('batch', __name__)
+
+# Sub-requests get JSON bodies and plain JSON responses; everything else (auth, cookies) is passed on
+_NOT_FORWARDED = {'content-type', 'content-length', 'accept', 'accept-encoding', 'host'}
+_RETURNED_HEADERS = ('ETag', 'Last-Modified', 'Location')
+
+
+def _dispatch(item):
+    """Run one sub-request through the app in-process and return its status, body and validators."""
+    headers = {name: value for name, value in request.headers if name.lower() not in _NOT_FORWARDED}
+    headers.update(item.headers)
+    path, _, query_string = item.path.partition('?')
+    builder = EnvironBuilder(
+        path=path,
+        query_string=query_string,
+        method=item.method,
+        headers=headers,
+        environ_base={'REMOTE_ADDR': request.remote_addr},
+        **({'json': item.body} if item.body is not None else {}),
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    # The sub-requests share this app context, and with it ``g`` and the DB session
+    g.pop('cache_validators', None)
+    g.pop('data_versions', None)
+    with current_app.request_context(environ):
+        try:
+            response = current_app.full_dispatch_request()
+        except Exception as e:
+            response = current_app.handle_exception(e)
+
+    # JSON bodies stay encoded; _batch_response splices them into the envelope
+    result = {
+        'status': response.status_code,
+        'body': response.get_data() if response.is_json else response.get_data(as_text=True) or None,
+    }
+    returned = {name: response.headers[name] for name in _RETURNED_HEADERS if name in response.headers}
+    if returned:
+        result['headers'] = returned
+    return result
+
+
+def _batch_response(results, message, **fields):
+    """Envelope the sub-responses without decoding and re-encoding their JSON bodies."""
+    if wants_msgpack():
+        return success_response({
+            'responses': [
+                {**result, 'body': json.loads(result['body'])} if isinstance(result['body'], bytes) else result
+                for result in results
+            ],
+            **fields,
+        }, message)
+
+    dumps = current_app.json.dumps
+    items = []
+    for result in results:
+        body = result['body'] if isinstance(result['body'], bytes) else dumps(result['body']).encode()
+        meta = dumps({key: value for key, value in result.items() if key != 'body'})
+        items.append(meta[:-1].encode() + b',"body":' + body + b'}')
+    data = b''.join(f'{dumps(key)}:{dumps(value)},'.encode() for key, value in fields.items())
+    payload = (b'{"success":true,"message":' + dumps(message).encode()
+               + b',"data":{' + data + b'"responses":[' + b','.join(items) + b']}}')
+    return current_app.response_class(payload, mimetype='application/json'), 200
+
+
+@bp.route('', methods=['POST'])
+def run_batch():
+    try:
+        data = BatchRequestSchema.model_validate_json(request.get_data())
+    except ValidationError as e:
+        return validation_error_response(e.errors())
+
+    limit = current_app.config['BATCH_MAX_REQUESTS']
+    if len(data.requests) > limit:
+        return error_response(f"A batch can hold at most {limit} requests", status_code=400)
+    if any(item.path.split('?')[0].rstrip('/') == '/api/batch' for item in data.requests):
+        return error_response("Batches cannot be nested", status_code=400)
+
+    results = []
+    if not data.atomic:
+        for item in data.requests:
+            result = _dispatch(item)
+            if result['status'] >= 500:
+                # Don't let a failed handler leave the shared session unusable for the rest
+                db.session.rollback()
+            results.append(result)
+        return _batch_response(results, "Batch processed")
+
+    with unit_of_work() as uow:
+        for item in data.requests:
+            result = _dispatch(item)
+            results.append(result)
+            if result['status'] >= 400:
+                uow.rollback()
+                break
+    # Sub-requests after the failing one are not run
+    results += [{'status': 424, 'body': None}] * (len(data.requests) - len(results))
+    committed = not uow.rolled_back
+    return _batch_response(results, "Batch committed" if committed else "Batch rolled back", committed=committed)
@@ -1,59 +1,114 @@
+from datetime import datetime, timezone
 from flask import Blueprint, request
 from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from app.models.budget import Budget
 from app.models.user import User
-from app.models.role import Category
-from app.schemas.budget_schema import BudgetCreateSchema, BudgetUpdateSchema
-from app.utils.responses import success_response, error_response, created_response, not_found_response, validation_error_response
+from app.schemas.budget_schema import (
+    BudgetCreateSchema, BudgetUpdateSchema, BUDGET_RESPONSE_SCHEMAS, BUDGET_DETAIL_RESPONSE_SCHEMAS,
+    budget_response_data,
+)
+from app.utils.responses import (
+    success_response, serialized_response, error_response, not_found_response,
+    validation_error_response,
+)
+from app.utils.money import from_cents, requested_amount_format
+from app.utils.conditional import conditional_get, with_cache_validators
+from app.utils.integrity import integrity_error_response
+from app.utils.unit_of_work import transactional
+from app.services.forecast import forecast_budgets
+from app.services.result_cache import cached_result
+from app.services.auth import current_user_id, may_read, owned_rows
+from app.config.extensions import db
 
 bp = Blueprint('budgets', __name__)
 
 @bp.route('/', methods=['GET'])
 def get_budgets():
-    user_id = request.args.get('user_id', type=int)
+    user_id = current_user_id()
     category_id = request.args.get('category_id', type=int)
     is_active = request.args.get('is_active', type=bool)
 
-    query = Budget.query
-
     if user_id:
-        query = query.filter_by(user_id=user_id)
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    if is_active is not None:
-        query = query.filter_by(is_active=is_active)
-
-    budgets = query.all()
-    return success_response([budget.to_dict() for budget in budgets])
+        not_modified = conditional_get(user_id)
+        if not_modified:
+            return not_modified
+
+    schema = BUDGET_RESPONSE_SCHEMAS[requested_amount_format()]
+
+    def load():
+        query = Budget.query
+
+        if user_id:
+            query = query.filter_by(user_id=user_id)
+        if category_id:
+            query = query.filter_by(category_id=category_id)
+        if is_active is not None:
+            query = query.filter_by(is_active=is_active)
+
+        # Validated here, so a cached result holds the spending rather than the ORM rows
+        return [schema.model_validate(budget) for budget in query.all()]
+
+    budgets = cached_result(user_id, load) if user_id else load()
+    return with_cache_validators(serialized_response(list[schema], budgets))
+
+@bp.route('/forecast', methods=['GET'])
+def get_forecast():
+    user_id = current_user_id()
+    if not user_id:
+        return error_response("user_id is required", status_code=400)
+
+    user = User.query.get(user_id)
+    if not user:
+        return not_found_response("User not found")
+
+    forecasts = cached_result(user_id, lambda: forecast_budgets(
+        db.session.connection(),
+        [user_id],
+        lookback_days=min(max(request.args.get('lookback_days', 90, type=int), 1), 365),
+        halflife_days=max(request.args.get('halflife_days', 7, type=int), 1),
+    ), extra=(datetime.now(timezone.utc).date(),))
+    return success_response(forecasts)
 
 @bp.route('/<int:budget_id>', methods=['GET'])
 def get_budget(budget_id):
+    not_modified = conditional_get(owner_of=(Budget, budget_id))
+    if not_modified:
+        return not_modified
+
     budget = Budget.query.get(budget_id)
-    if not budget:
+    if not budget or not may_read(budget.user_id):
         return not_found_response("Budget not found")
-    return success_response(budget.to_dict(include_relations=True))
+    return with_cache_validators(
+        serialized_response(BUDGET_DETAIL_RESPONSE_SCHEMAS[requested_amount_format()], budget)
+    )
+
+BUDGET_CONSTRAINT_ERRORS = {
+    'user_id': (404, "User not found"),
+    'category_id': (404, "Category not found"),
+}
+
+def _budget_response(row, message, status_code=200):
+    """Serialize a written ``(budget, spent_cents)`` row; its user and category came with it."""
+    budget, spent_cents = row
+    schema = BUDGET_DETAIL_RESPONSE_SCHEMAS[requested_amount_format()]
+    return serialized_response(
+        schema, budget_response_data(budget, int(spent_cents), schema.model_fields), message, status_code
+    )
 
 @bp.route('/', methods=['POST'])
+@transactional
 def create_budget():
     try:
-        data = BudgetCreateSchema(**request.get_json())
-        user_id = request.args.get('user_id', type=int)
+        data = BudgetCreateSchema.model_validate_json(request.get_data())
+        user_id = current_user_id()
 
         if not user_id:
             return error_response("user_id is required", status_code=400)
 
-        user = User.query.get(user_id)
-        if not user:
-            return not_found_response("User not found")
-
-        if data.category_id:
-            category = Category.query.get(data.category_id)
-            if not category:
-                return not_found_response("Category not found")
-
         budget = Budget(
             name=data.name,
-            amount=data.amount,
+            amount_cents=data.amount_cents,
             period=data.period,
             start_date=data.start_date,
             end_date=data.end_date,
@@ -61,60 +116,62 @@ def create_budget():
             user_id=user_id,
             category_id=data.category_id
         )
-        budget.save()
-
-        return created_response(budget.to_dict(include_relations=True), "Budget created successfully")
+        row = budget.insert_returning(related=(Budget.user, Budget.category), columns=(Budget.spent_cents_column,))
+        return _budget_response(row, "Budget created successfully", 201)
 
     except ValidationError as e:
         return validation_error_response(e.errors())
+    except IntegrityError as e:
+        return integrity_error_response(
+            e, Budget, {'user_id': user_id, 'category_id': data.category_id}, BUDGET_CONSTRAINT_ERRORS
+        )
     except Exception as e:
         return error_response(str(e), status_code=500)
 
 @bp.route('/<int:budget_id>', methods=['PUT'])
+@transactional
 def update_budget(budget_id):
     try:
-        budget = Budget.query.get(budget_id)
-        if not budget:
-            return not_found_response("Budget not found")
-
-        data = BudgetUpdateSchema(**request.get_json())
+        data = BudgetUpdateSchema.model_validate_json(request.get_data())
 
+        values = {}
         if data.name:
-            budget.name = data.name
-        if data.amount is not None:
-            budget.amount = data.amount
+            values['name'] = data.name
+        if data.amount_cents is not None:
+            values['amount_cents'] = data.amount_cents
+            values['amount'] = from_cents(data.amount_cents)
         if data.period:
-            budget.period = data.period
+            values['period'] = data.period
         if data.end_date is not None:
-            budget.end_date = data.end_date
+            values['end_date'] = data.end_date
         if data.alert_threshold is not None:
-            budget.alert_threshold = data.alert_threshold
+            values['alert_threshold'] = data.alert_threshold
         if data.is_active is not None:
-            budget.is_active = data.is_active
+            values['is_active'] = data.is_active
         if data.category_id is not None:
-            if data.category_id:
-                category = Category.query.get(data.category_id)
-                if not category:
-                    return not_found_response("Category not found")
-            budget.category_id = data.category_id
+            values['category_id'] = data.category_id
 
-        budget.save()
-        return success_response(budget.to_dict(include_relations=True), "Budget updated successfully")
+        row = Budget.update_returning(
+            budget_id, values, *owned_rows(Budget), related=(Budget.user, Budget.category), columns=(Budget.spent_cents_column,)
+        )
+        if row is None:
+            return not_found_response("Budget not found")
+        return _budget_response(row, "Budget updated successfully")
 
     except ValidationError as e:
         return validation_error_response(e.errors())
+    except IntegrityError as e:
+        return integrity_error_response(e, Budget, {'category_id': data.category_id}, BUDGET_CONSTRAINT_ERRORS)
     except Exception as e:
         return error_response(str(e), status_code=500)
 
 @bp.route('/<int:budget_id>', methods=['DELETE'])
+@transactional
 def delete_budget(budget_id):
     try:
-        budget = Budget.query.get(budget_id)
-        if not budget:
+        if not Budget.delete_returning(Budget.id == budget_id, *owned_rows(Budget)):
             return not_found_response("Budget not found")
-
-        budget.delete()
         return success_response(message="Budget deleted successfully")
 
     except Exception as e:
-        return error_response(str(e), status_code=500)
\ No newline at end of file
+        return error_response(str(e), status_code=500)
@@ -1,43 +1,83 @@
+from functools import partial
 from flask import Blueprint, request
 from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from app.config.extensions import db
 from app.models.role import Category
-from app.schemas.category_schema import CategoryCreateSchema, CategoryUpdateSchema
-from app.utils.responses import success_response, error_response, created_response, not_found_response, validation_error_response
+from app.schemas.category_schema import CategoryCreateSchema, CategoryUpdateSchema, CategoryResponseSchema
+from app.utils.responses import (
+    success_response, serialized_response, created_serialized_response, error_response, not_found_response,
+    validation_error_response,
+)
+from app.utils.conditional import conditional_get, validator_scopes, with_cache_validators
+from app.utils.integrity import integrity_error_response
+from app.utils.unit_of_work import on_rollback, transactional
+from app.models.data_version import SHARED_SCOPE
+from app.services.shared_cache import cached
+from app.services.auth import current_user_id, may_read, owned_rows
+from app.services.sharding import get_shard_router
 
 bp = Blueprint('categories', __name__)
 
+CATEGORY_FIELDS = tuple(CategoryResponseSchema.model_fields)
+
 @bp.route('/', methods=['GET'])
 def get_categories():
-    user_id = request.args.get('user_id', type=int)
-
-    if user_id:
-        categories = Category.query.filter(
-            (Category.user_id == user_id) | (Category.is_default == True)
-        ).all()
-    else:
-        categories = Category.query.filter_by(is_default=True).all()
-
-    return success_response([cat.to_dict() for cat in categories])
+    user_id = current_user_id()
+
+    not_modified = conditional_get(user_id, shared=True) if user_id else conditional_get(SHARED_SCOPE)
+    if not_modified:
+        return not_modified
+
+    def load():
+        if user_id:
+            categories = Category.query.filter(
+                (Category.user_id == user_id) | (Category.is_default == True)
+            ).all()
+        else:
+            categories = Category.query.filter_by(is_default=True).all()
+        # Rows of plain values: compact enough for a shared cache slot
+        return [tuple(getattr(category, name) for name in CATEGORY_FIELDS) for category in categories]
+
+    scopes = validator_scopes(user_id, shared=True) if user_id else {SHARED_SCOPE}
+    categories = [dict(zip(CATEGORY_FIELDS, row)) for row in cached('categories', (user_id,), load, scopes)]
+    return with_cache_validators(serialized_response(list[CategoryResponseSchema], categories))
 
 @bp.route('/<int:category_id>', methods=['GET'])
 def get_category(category_id):
     category = Category.query.get(category_id)
-    if not category:
+    if not category or not may_read(category.user_id):
         return not_found_response("Category not found")
     return success_response(category.to_dict(include_relations=True))
 
+CATEGORY_CONSTRAINT_ERRORS = {
+    ('name', 'user_id'): (409, "Category with this name already exists for this user"),
+    'user_id': (404, "User not found"),
+}
+
+def _default_category_error(category_id, action):
+    """Why a write limited to non-default categories matched nothing."""
+    category = db.session.get(Category, category_id)
+    if not category or not may_read(category.user_id):
+        return not_found_response("Category not found")
+    return error_response(f"Cannot {action} default categories", status_code=403)
+
+def _copy_shared(category_id):
+    """Give every shard the request's version of a shared category, undone if the request rolls back."""
+    router = get_shard_router()
+    if router is not None:
+        router.copy_shared_rows(Category.__table__, [category_id])
+        on_rollback(partial(router.restore_shared_rows, Category.__table__, [category_id]))
+
 @bp.route('/', methods=['POST'])
+@transactional
 def create_category():
     try:
-        data = CategoryCreateSchema(**request.get_json())
-        user_id = request.args.get('user_id', type=int)
-
-        existing = Category.query.filter_by(
-            name=data.name,
-            user_id=user_id
-        ).first()
+        data = CategoryCreateSchema.model_validate_json(request.get_data())
+        user_id = current_user_id()
 
-        if existing:
+        # The unique constraint treats NULL user_ids as distinct, so shared names are checked here
+        if user_id is None and Category.query.filter_by(name=data.name, user_id=None).first():
             return error_response("Category with this name already exists for this user", status_code=409)
 
         category = Category(
@@ -47,56 +87,68 @@ def create_category():
             color=data.color,
             user_id=user_id
         )
-        category.save()
-
-        return created_response(category.to_dict(), "Category created successfully")
+        router = get_shard_router()
+        if router is not None and user_id is None:
+            # Copied to every shard under this id, so any user's expenses and budgets can use it
+            shared_id = router.shared_row_id(Category.__table__)
+            if shared_id is not None:
+                category.id = shared_id
+        (category,) = category.insert_returning()
+        if user_id is None:
+            _copy_shared(category.id)
+
+        return created_serialized_response(CategoryResponseSchema, category, "Category created successfully")
 
     except ValidationError as e:
         return validation_error_response(e.errors())
+    except IntegrityError as e:
+        return integrity_error_response(e, Category, {'user_id': user_id}, CATEGORY_CONSTRAINT_ERRORS)
     except Exception as e:
         return error_response(str(e), status_code=500)
 
 @bp.route('/<int:category_id>', methods=['PUT'])
+@transactional
 def update_category(category_id):
     try:
-        category = Category.query.get(category_id)
-        if not category:
-            return not_found_response("Category not found")
-
-        if category.is_default:
-            return error_response("Cannot update default categories", status_code=403)
-
-        data = CategoryUpdateSchema(**request.get_json())
+        data = CategoryUpdateSchema.model_validate_json(request.get_data())
 
+        values = {}
         if data.name:
-            category.name = data.name
+            values['name'] = data.name
         if data.description is not None:
-            category.description = data.description
+            values['description'] = data.description
         if data.icon is not None:
-            category.icon = data.icon
+            values['icon'] = data.icon
         if data.color is not None:
-            category.color = data.color
+            values['color'] = data.color
 
-        category.save()
-        return success_response(category.to_dict(), "Category updated successfully")
+        row = Category.update_returning(category_id, values, Category.is_default.isnot(True), *owned_rows(Category))
+        if row is None:
+            return _default_category_error(category_id, 'update')
+        if row[0].user_id is None:
+            _copy_shared(category_id)
+        return serialized_response(CategoryResponseSchema, row[0], "Category updated successfully")
 
     except ValidationError as e:
         return validation_error_response(e.errors())
+    except IntegrityError as e:
+        return integrity_error_response(e, Category, {}, CATEGORY_CONSTRAINT_ERRORS)
     except Exception as e:
         return error_response(str(e), status_code=500)
 
 @bp.route('/<int:category_id>', methods=['DELETE'])
+@transactional
 def delete_category(category_id):
     try:
-        category = Category.query.get(category_id)
-        if not category:
-            return not_found_response("Category not found")
-
-        if category.is_default:
-            return error_response("Cannot delete default categories", status_code=403)
-
-        category.delete()
+        rows = Category.delete_returning(Category.id == category_id, Category.is_default.isnot(True), *owned_rows(Category))
+        if not rows:
+            return _default_category_error(category_id, 'delete')
+        if rows[0].user_id is None:
+            _copy_shared(category_id)
         return success_response(message="Category deleted successfully")
 
+    except IntegrityError:
+        db.session.rollback()
+        return error_response("Category is used by expenses or budgets", status_code=409)
     except Exception as e:
-        return error_response(str(e), status_code=500)
\ No newline at end of file
+        return error_response(str(e), status_code=500)
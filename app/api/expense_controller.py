@@ -1,123 +1,341 @@
 from flask import Blueprint, request
 from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from app.models.expense import Expense
-from app.models.user import User
 from app.models.role import Category
-from app.schemas.expense_schema import ExpenseCreateSchema, ExpenseUpdateSchema
-from app.utils.responses import success_response, error_response, created_response, not_found_response, validation_error_response
+from app.schemas.expense_schema import (
+    ExpenseCreateSchema, ExpenseUpdateSchema, ExpenseBulkUpdateSchema, EXPENSE_RESPONSE_SCHEMAS,
+    EXPENSE_DETAIL_RESPONSE_SCHEMAS,
+)
+from app.utils.responses import (
+    success_response, serialized_response, error_response, created_response, not_found_response,
+    validation_error_response,
+)
+from app.utils.money import from_cents, requested_amount_format
+from app.utils.conditional import conditional_get, with_cache_validators
+from app.utils.columnar import columnar_data, parse_column_list
+from app.utils.integrity import integrity_error_response
+from app.utils.unit_of_work import transactional
+from app.services.search import search_expenses
+from app.services.dedupe import find_duplicates, scan_user
+from app.services.auth import current_user_id, may_read, owned_rows
+from app.models.data_version import UserDataVersion
 from app.config.extensions import db
 from datetime import datetime
 
 bp = Blueprint('expenses', __name__)
 
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+# ?format=columnar: column name -> (projected expression, per-value converter)
+COLUMNAR_FIELDS = {
+    'id': (Expense.id, None),
+    'amount': (Expense.amount_cents, lambda cents: cents / 100),
+    'amount_cents': (Expense.amount_cents, None),
+    'description': (Expense.description, None),
+    'notes': (Expense.notes, None),
+    'expense_date': (Expense.expense_date, _isoformat),
+    'payment_method': (Expense.payment_method, None),
+    'receipt_url': (Expense.receipt_url, None),
+    'is_recurring': (Expense.is_recurring, None),
+    'recurring_frequency': (Expense.recurring_frequency, None),
+    'recurring_parent_id': (Expense.recurring_parent_id, None),
+    'user_id': (Expense.user_id, None),
+    'category_id': (Expense.category_id, None),
+    'created_at': (Expense.created_at, _isoformat),
+    'updated_at': (Expense.updated_at, _isoformat),
+}
+
+def _columnar_expenses(query, columns, dictionary):
+    rows = query.with_entities(*(COLUMNAR_FIELDS[name][0] for name in columns)).all()
+    converters = {name: COLUMNAR_FIELDS[name][1] for name in columns if COLUMNAR_FIELDS[name][1]}
+    return success_response(columnar_data(rows, columns, converters, dictionary))
+
 @bp.route('/', methods=['GET'])
 def get_expenses():
-    user_id = request.args.get('user_id', type=int)
+    user_id = current_user_id()
     category_id = request.args.get('category_id', type=int)
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
 
-    query = Expense.query
+    response_format = request.args.get('format', 'rows')
+    if response_format not in ('rows', 'columnar'):
+        return error_response("format must be rows or columnar", status_code=400)
+    if response_format == 'columnar':
+        default_columns = [
+            name for name in COLUMNAR_FIELDS
+            if name != ('amount' if requested_amount_format() == 'cents' else 'amount_cents')
+        ]
+        try:
+            columns = parse_column_list(request.args.get('columns'), tuple(COLUMNAR_FIELDS), default_columns)
+            dictionary = parse_column_list(request.args.get('dictionary'), columns, ())
+        except ValueError as e:
+            return error_response(str(e), status_code=400)
 
     if user_id:
-        query = query.filter_by(user_id=user_id)
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    if start_date:
-        query = query.filter(Expense.expense_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Expense.expense_date <= datetime.fromisoformat(end_date))
+        not_modified = conditional_get(user_id)
+        if not_modified:
+            return not_modified
+
+    query = Expense.apply_filters(
+        Expense.query,
+        user_id=user_id,
+        category_id=category_id,
+        start_date=datetime.fromisoformat(start_date) if start_date else None,
+        end_date=datetime.fromisoformat(end_date) if end_date else None,
+    ).order_by(Expense.expense_date.desc())
+
+    if response_format == 'columnar':
+        return with_cache_validators(_columnar_expenses(query, columns, dictionary))
+    expenses = query.all()
+    schema = EXPENSE_RESPONSE_SCHEMAS[requested_amount_format()]
+    return with_cache_validators(serialized_response(list[schema], expenses))
+
+@bp.route('/search', methods=['GET'])
+def search():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return error_response("q is required", status_code=400)
+
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+    try:
+        rows, next_cursor = search_expenses(
+            q,
+            user_id=current_user_id(),
+            category_id=request.args.get('category_id', type=int),
+            start_date=datetime.fromisoformat(start_date) if start_date else None,
+            end_date=datetime.fromisoformat(end_date) if end_date else None,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
 
-    expenses = query.order_by(Expense.expense_date.desc()).all()
-    return success_response([exp.to_dict() for exp in expenses])
+    return success_response({
+        'results': [{**expense.to_dict(), 'score': score} for expense, score in rows],
+        'next_cursor': next_cursor,
+    })
+
+@bp.route('/duplicates', methods=['GET'])
+def get_duplicates():
+    user_id = current_user_id()
+    if not user_id:
+        return error_response("user_id is required", status_code=400)
+
+    not_modified = conditional_get(user_id)
+    if not_modified:
+        return not_modified
+
+    clusters = scan_user(
+        user_id,
+        window_days=request.args.get('window_days', type=int),
+        threshold=request.args.get('threshold', type=float),
+    )
+    expense_ids = [expense_id for cluster in clusters for expense_id in cluster]
+    expenses = {exp.id: exp for exp in Expense.query.filter(Expense.id.in_(expense_ids))} if expense_ids else {}
+    schema = EXPENSE_RESPONSE_SCHEMAS[requested_amount_format()]
+    return with_cache_validators(serialized_response(
+        list[list[schema]], [[expenses[expense_id] for expense_id in cluster] for cluster in clusters]
+    ))
 
 @bp.route('/<int:expense_id>', methods=['GET'])
 def get_expense(expense_id):
+    not_modified = conditional_get(owner_of=(Expense, expense_id))
+    if not_modified:
+        return not_modified
+
     expense = Expense.query.get(expense_id)
-    if not expense:
+    if not expense or not may_read(expense.user_id):
         return not_found_response("Expense not found")
-    return success_response(expense.to_dict(include_relations=True))
+    return with_cache_validators(
+        serialized_response(EXPENSE_DETAIL_RESPONSE_SCHEMAS[requested_amount_format()], expense)
+    )
+
+EXPENSE_CONSTRAINT_ERRORS = {
+    'user_id': (404, "User not found"),
+    'category_id': (404, "Category not found"),
+}
 
 @bp.route('/', methods=['POST'])
+@transactional
 def create_expense():
     try:
-        data = ExpenseCreateSchema(**request.get_json())
-        user_id = request.args.get('user_id', type=int)
+        data = ExpenseCreateSchema.model_validate_json(request.get_data())
+        user_id = current_user_id()
 
         if not user_id:
             return error_response("user_id is required", status_code=400)
 
-        user = User.query.get(user_id)
-        if not user:
-            return not_found_response("User not found")
-
-        category = Category.query.get(data.category_id)
-        if not category:
-            return not_found_response("Category not found")
-
         expense = Expense(
-            amount=data.amount,
+            amount_cents=data.amount_cents,
             description=data.description,
             notes=data.notes,
             expense_date=data.expense_date,
             payment_method=data.payment_method,
             receipt_url=data.receipt_url,
+            is_recurring=data.is_recurring,
+            recurring_frequency=data.recurring_frequency if data.is_recurring else None,
             user_id=user_id,
             category_id=data.category_id
         )
-        expense.save()
+        possible_duplicates = find_duplicates(expense)
+        # The foreign keys reject a missing user or category
+        (expense,) = expense.insert_returning(related=(Expense.user, Expense.category))
 
-        return created_response(expense.to_dict(include_relations=True), "Expense created successfully")
+        return created_response(
+            {**expense.to_dict(include_relations=True), 'possible_duplicates': possible_duplicates},
+            "Expense created successfully"
+        )
 
     except ValidationError as e:
         return validation_error_response(e.errors())
+    except IntegrityError as e:
+        return integrity_error_response(
+            e, Expense, {'user_id': user_id, 'category_id': data.category_id}, EXPENSE_CONSTRAINT_ERRORS
+        )
     except Exception as e:
         return error_response(str(e), status_code=500)
 
 @bp.route('/<int:expense_id>', methods=['PUT'])
+@transactional
 def update_expense(expense_id):
     try:
-        expense = Expense.query.get(expense_id)
-        if not expense:
-            return not_found_response("Expense not found")
-
-        data = ExpenseUpdateSchema(**request.get_json())
+        data = ExpenseUpdateSchema.model_validate_json(request.get_data())
 
-        if data.amount is not None:
-            expense.amount = data.amount
+        values = {}
+        if data.amount_cents is not None:
+            values['amount_cents'] = data.amount_cents
+            values['amount'] = from_cents(data.amount_cents)
         if data.description:
-            expense.description = data.description
+            values['description'] = data.description
         if data.notes is not None:
-            expense.notes = data.notes
+            values['notes'] = data.notes
         if data.expense_date:
-            expense.expense_date = data.expense_date
+            values['expense_date'] = data.expense_date
         if data.payment_method is not None:
-            expense.payment_method = data.payment_method
+            values['payment_method'] = data.payment_method
         if data.receipt_url is not None:
-            expense.receipt_url = data.receipt_url
+            values['receipt_url'] = data.receipt_url
+        if data.recurring_frequency is not None:
+            values['recurring_frequency'] = data.recurring_frequency
+        if data.is_recurring is not None:
+            values['is_recurring'] = data.is_recurring
         if data.category_id:
-            category = Category.query.get(data.category_id)
-            if not category:
-                return not_found_response("Category not found")
-            expense.category_id = data.category_id
+            values['category_id'] = data.category_id
+
+        # Making an expense recurring needs it to qualify; checked by the UPDATE itself
+        criteria = [*owned_rows(Expense)]
+        if data.is_recurring:
+            criteria.append(Expense.recurring_parent_id.is_(None))
+            if not data.recurring_frequency:
+                criteria.append(Expense.recurring_frequency.isnot(None))
 
-        expense.save()
-        return success_response(expense.to_dict(include_relations=True), "Expense updated successfully")
+        row = Expense.update_returning(expense_id, values, *criteria, related=(Expense.user, Expense.category))
+        if row is None:
+            expense = db.session.get(Expense, expense_id)
+            if not expense or not may_read(expense.user_id):
+                return not_found_response("Expense not found")
+            if expense.recurring_parent_id:
+                return error_response("Generated recurring instances cannot be recurring", status_code=400)
+            return error_response("recurring_frequency is required for recurring expenses", status_code=400)
+
+        return serialized_response(
+            EXPENSE_DETAIL_RESPONSE_SCHEMAS[requested_amount_format()], row[0], "Expense updated successfully"
+        )
 
     except ValidationError as e:
         return validation_error_response(e.errors())
+    except IntegrityError as e:
+        return integrity_error_response(e, Expense, {'category_id': data.category_id}, EXPENSE_CONSTRAINT_ERRORS)
     except Exception as e:
         return error_response(str(e), status_code=500)
 
 @bp.route('/<int:expense_id>', methods=['DELETE'])
+@transactional
 def delete_expense(expense_id):
     try:
-        expense = Expense.query.get(expense_id)
-        if not expense:
+        if not Expense.delete_returning(Expense.id == expense_id, *owned_rows(Expense)):
             return not_found_response("Expense not found")
-
-        expense.delete()
         return success_response(message="Expense deleted successfully")
 
     except Exception as e:
-        return error_response(str(e), status_code=500)
\ No newline at end of file
+        return error_response(str(e), status_code=500)
+
+def _bulk_filters():
+    """``get_expenses`` filters plus ``ids=1,2,3`` for the bulk endpoints; raises ValueError."""
+    args = request.args
+    try:
+        expense_ids = [int(value) for value in args['ids'].split(',') if value.strip()] if args.get('ids') else None
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+    filters = {
+        'user_id': current_user_id(),
+        'category_id': args.get('category_id', type=int),
+        'start_date': datetime.fromisoformat(args['start_date']) if args.get('start_date') else None,
+        'end_date': datetime.fromisoformat(args['end_date']) if args.get('end_date') else None,
+        'expense_ids': expense_ids,
+    }
+    if not any(filters.values()):
+        raise ValueError("At least one filter is required: user_id, category_id, start_date, end_date or ids")
+    return filters
+
+def _dry_run(filters):
+    matched = db.session.scalar(Expense.apply_filters(db.select(db.func.count(Expense.id)), **filters))
+    return success_response({'matched': matched, 'dry_run': True}, "Dry run, nothing changed")
+
+def _bulk_write(statement):
+    """Run a filtered UPDATE/DELETE in one statement; returns the number of rows it touched."""
+    # RETURNING the owners lets the data versions be bumped in the same transaction
+    user_ids = db.session.scalars(
+        statement.returning(Expense.user_id).execution_options(synchronize_session=False)
+    ).all()
+    UserDataVersion.bump(user_ids)
+    db.session.commit()
+    return len(user_ids)
+
+@bp.route('/', methods=['PATCH'])
+def bulk_update_expenses():
+    try:
+        filters = _bulk_filters()
+        data = ExpenseBulkUpdateSchema.model_validate_json(request.get_data())
+    except ValidationError as e:
+        return validation_error_response(e.errors())
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
+
+    values = data.model_dump(exclude_none=True, exclude={'amount'})
+    if not values:
+        return error_response("No fields to update", status_code=400)
+    if 'amount_cents' in values:
+        values['amount'] = from_cents(values['amount_cents'])
+    if data.category_id and not db.session.get(Category, data.category_id):
+        return not_found_response("Category not found")
+
+    if request.args.get('dry_run', '').lower() in ('1', 'true', 'yes'):
+        return _dry_run(filters)
+    try:
+        updated = _bulk_write(Expense.apply_filters(db.update(Expense), **filters).values(**values))
+    except Exception as e:
+        db.session.rollback()
+        return error_response(str(e), status_code=500)
+    return success_response({'updated': updated}, f"{updated} expenses updated")
+
+@bp.route('/', methods=['DELETE'])
+def bulk_delete_expenses():
+    try:
+        filters = _bulk_filters()
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
+
+    if request.args.get('dry_run', '').lower() in ('1', 'true', 'yes'):
+        return _dry_run(filters)
+    try:
+        deleted = _bulk_write(Expense.apply_filters(db.delete(Expense), **filters))
+    except Exception as e:
+        db.session.rollback()
+        return error_response(str(e), status_code=500)
+    return success_response({'deleted': deleted}, f"{deleted} expenses deleted")
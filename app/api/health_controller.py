@@ -1,4 +1,5 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from app.services.group_commit import group_commit_writers
 
 
 bp = Blueprint('health', __name__)
@@ -7,3 +8,26 @@ bp = Blueprint('health', __name__)
 @bp.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok", "message":"I'm up and running"}), 200
+
+@bp.route('/health/group-commit', methods=['GET'])
+def group_commit_metrics():
+    writers = group_commit_writers()
+    if not writers:
+        return jsonify({"status": "disabled"}), 404
+    if None in writers:
+        return jsonify({"status": "ok", **writers[None].metrics()}), 200
+    return jsonify({"status": "ok", "shards": {shard: writer.metrics() for shard, writer in writers.items()}}), 200
+
+@bp.route('/health/shared-cache', methods=['GET'])
+def shared_cache_metrics():
+    cache = current_app.extensions.get('shared_cache')
+    if cache is None:
+        return jsonify({"status": "disabled"}), 404
+    return jsonify({"status": "ok", **cache.stats()}), 200
+
+@bp.route('/health/result-cache', methods=['GET'])
+def result_cache_metrics():
+    cache = current_app.extensions.get('result_cache')
+    if cache is None:
+        return jsonify({"status": "disabled"}), 404
+    return jsonify({"status": "ok", **cache.stats()}), 200
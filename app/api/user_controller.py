@@ -1,33 +1,58 @@
-from flask import Blueprint, request
+from functools import partial
+from flask import Blueprint, current_app, request
 from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from app.models.user import User
-from app.schemas.user_schema import UserCreateSchema, UserUpdateSchema
-from app.utils.responses import success_response, error_response, created_response, not_found_response, validation_error_response
+from app.models.user_directory import UserDirectory
+from app.schemas.user_schema import UserCreateSchema, UserUpdateSchema, UserResponseSchema
+from app.services.auth import get_token_auth
+from app.services.sharding import current_engine, get_shard_router, route_to
+from app.services.user_purge import running_purge, start_purge_thread
+from app.utils.integrity import integrity_error_response
+from app.utils.responses import (
+    success_response, serialized_response, created_serialized_response, error_response, not_found_response,
+    validation_error_response,
+)
+from app.utils.unit_of_work import on_rollback, transactional
 
 bp = Blueprint('users', __name__)
 
 @bp.route('/', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return success_response([user.to_dict() for user in users])
+    router = get_shard_router()
+    if router is None:
+        users = User.query.all()
+    else:
+        # Every shard at once; a user caught mid-move is listed from their home shard only
+        placements = router.placements()
+        users = sorted(
+            (user for shard, rows in router.fan_out(lambda shard: User.query.all()).items()
+             for user in rows if placements.get(user.id) == shard),
+            key=lambda user: user.id,
+        )
+    return serialized_response(list[UserResponseSchema], users)
 
 @bp.route('/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     user = User.query.get(user_id)
     if not user:
         return not_found_response("User not found")
-    return success_response(user.to_dict(include_relations=True))
+    data = user.to_dict(include_relations=True)
+    purge = running_purge(user_id)
+    if purge is not None:
+        data['deletion'] = purge.to_dict()
+    return success_response(data)
+
+USER_CONSTRAINT_ERRORS = {
+    'email': (409, "Email already exists"),
+    'username': (409, "Username already exists"),
+}
 
 @bp.route('/', methods=['POST'])
+@transactional
 def create_user():
     try:
-        data = UserCreateSchema(**request.get_json())
-
-        if User.query.filter_by(email=data.email).first():
-            return error_response("Email already exists", status_code=409)
-
-        if User.query.filter_by(username=data.username).first():
-            return error_response("Username already exists", status_code=409)
+        data = UserCreateSchema.model_validate_json(request.get_data())
 
         user = User(
             email=data.email,
@@ -36,46 +61,69 @@ def create_user():
             last_name=data.last_name
         )
         user.set_password(data.password)
-        user.save()
-
-        return created_response(user.to_dict(), "User created successfully")
+        router = get_shard_router()
+        if router is not None:
+            # The directory hands out the id and shard, and rejects an email or username taken on any shard
+            try:
+                user.id, shard = router.reserve(data.email, data.username)
+            except IntegrityError as e:
+                return integrity_error_response(e, UserDirectory, {}, USER_CONSTRAINT_ERRORS)
+            on_rollback(partial(router.release, user.id))
+            route_to(shard)
+        # The unique indexes reject a taken email or username
+        (user,) = user.insert_returning()
+
+        return created_serialized_response(UserResponseSchema, user, "User created successfully")
 
     except ValidationError as e:
         return validation_error_response(e.errors())
+    except IntegrityError as e:
+        return integrity_error_response(e, User, {}, USER_CONSTRAINT_ERRORS)
     except Exception as e:
         return error_response(str(e), status_code=500)
 
 @bp.route('/<int:user_id>', methods=['PUT'])
+@transactional
 def update_user(user_id):
     try:
-        user = User.query.get(user_id)
-        if not user:
-            return not_found_response("User not found")
-
-        data = UserUpdateSchema(**request.get_json())
-
-        if data.email and data.email != user.email:
-            if User.query.filter_by(email=data.email).first():
-                return error_response("Email already exists", status_code=409)
-            user.email = data.email
-
-        if data.username and data.username != user.username:
-            if User.query.filter_by(username=data.username).first():
-                return error_response("Username already exists", status_code=409)
-            user.username = data.username
+        data = UserUpdateSchema.model_validate_json(request.get_data())
 
+        values = {}
+        if data.email:
+            values['email'] = data.email
+        if data.username:
+            values['username'] = data.username
         if data.first_name is not None:
-            user.first_name = data.first_name
+            values['first_name'] = data.first_name
         if data.last_name is not None:
-            user.last_name = data.last_name
+            values['last_name'] = data.last_name
         if data.is_active is not None:
-            user.is_active = data.is_active
-
-        user.save()
-        return success_response(user.to_dict(), "User updated successfully")
+            values['is_active'] = data.is_active
+
+        router = get_shard_router()
+        renamed = {key: values[key] for key in ('email', 'username') if key in values}
+        if router is not None and renamed:
+            previous = router.identity(user_id)
+            if previous is None:
+                return not_found_response("User not found")
+            try:
+                router.rename(user_id, renamed)
+            except IntegrityError as e:
+                return integrity_error_response(e, UserDirectory, {}, USER_CONSTRAINT_ERRORS)
+            on_rollback(partial(router.rename, user_id, previous))
+
+        row = User.update_returning(user_id, values)
+        if row is None:
+            return not_found_response("User not found")
+        if data.is_active is False:
+            # Tokens carry the active flag; the ones already issued stop working once this commits
+            get_token_auth().revoke_user(user_id, in_transaction=True)
+        return serialized_response(UserResponseSchema, row[0], "User updated successfully")
 
     except ValidationError as e:
         return validation_error_response(e.errors())
+    except IntegrityError as e:
+        return integrity_error_response(e, User, {}, USER_CONSTRAINT_ERRORS)
     except Exception as e:
         return error_response(str(e), status_code=500)
 
@@ -86,8 +134,28 @@ def delete_user(user_id):
         if not user:
             return not_found_response("User not found")
 
-        user.delete()
-        return success_response(message="User deleted successfully")
+        purge = running_purge(user_id)
+        if purge is not None:
+            return success_response(purge.to_dict(), "User deletion in progress", 202)
+
+        # Locked out right away, however long the rest takes
+        user.is_active = False
+        user.save()
+        get_token_auth().revoke_user(user_id)
+
+        router = get_shard_router()
+        if user.expenses.count() <= current_app.config['USER_DELETE_INLINE_LIMIT']:
+            # ON DELETE CASCADE removes the expenses, budgets and categories in the database
+            user.delete()
+            if router is not None:
+                router.release(user_id)
+            return success_response(message="User deleted successfully")
+
+        purge = start_purge_thread(
+            current_app._get_current_object(), user_id, engine=current_engine(),
+            on_complete=partial(router.release, user_id) if router is not None else None,
+        )
+        return success_response(purge.to_dict(), "User deactivated; deletion in progress", 202)
 
     except Exception as e:
         return error_response(str(e), status_code=500)
\ No newline at end of file
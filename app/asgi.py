@@ -0,0 +1,298 @@
+"""
+ASGI application with native async read endpoints.
+
+The read-heavy list endpoints run as coroutines on SQLAlchemy's asyncio
+engine (asyncpg on PostgreSQL, aiosqlite on SQLite), so one worker keeps
+serving other requests while a query waits on the database:
+
+- ``GET /api/expenses/`` (``format=rows``)
+- ``GET /api/budgets/?user_id=`` (budget status, spending in the same query)
+- ``GET /api/analytics/summary?user_id=`` (ungrouped or by category / payment_method)
+
+Everything else - writes, other endpoints, MessagePack and columnar variants,
+requests the async handlers decline - is passed to the Flask app through
+asgiref's WSGI adapter, as is every request when the data is sharded (the
+async engine only reaches the main database) and every request carrying a
+bearer token (the Flask app verifies it). Both paths share the models,
+response schemas, ETags and compression settings, so responses are
+identical. Serve with::
+
+    uvicorn asgi:application --workers 4
+"""
+import asyncio
+import contextvars
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import Headers, MIMEAccept, MultiDict
+from werkzeug.http import http_date, parse_accept_header, parse_etags
+
+from app.models.budget import Budget
+from app.models.data_version import UserDataVersion
+from app.models.expense import Expense
+from app.schemas.budget_schema import BUDGET_RESPONSE_SCHEMAS, budget_response_data
+from app.schemas.expense_schema import EXPENSE_RESPONSE_SCHEMAS
+from app.services.expense_cache import PAYMENT_METHODS
+from app.utils.conditional import build_validators, validator_scopes
+from app.utils.money import amount_fields
+from app.utils.responses import (
+    MSGPACK_MIMETYPES, compress_body, envelope_adapter, msgpack, negotiate_encoding,
+)
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_database_url(url):
+    """The asyncio-driver equivalent of a sync SQLAlchemy database URL."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f'No async driver for {url.get_backend_name()} databases')
+    return url.set(drivername=driver)
+
+
+class AsyncRequest:
+    def __init__(self, scope):
+        self.scope = scope
+        self.path = scope['path']
+        query_string = scope.get('query_string', b'').decode('latin-1')
+        self.full_path = f'{self.path}?{query_string}'
+        self.args = MultiDict(parse_qsl(query_string, keep_blank_values=True))
+        self.headers = Headers([(name.decode('latin-1'), value.decode('latin-1'))
+                                for name, value in scope.get('headers', ())])
+
+    def wants_msgpack(self):
+        if msgpack is None:
+            return False
+        accept = parse_accept_header(self.headers.get('Accept'), MIMEAccept)
+        return accept.best_match(('application/json', *MSGPACK_MIMETYPES)) in MSGPACK_MIMETYPES
+
+    def amount_format(self):
+        return 'cents' if self.args.get('amount_format') == 'cents' else 'decimal'
+
+
+class AsyncReadApp:
+    """ASGI app answering the async endpoints itself and delegating everything else to Flask."""
+
+    def __init__(self, flask_app):
+        config = flask_app.config
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.engine = create_async_engine(
+            config.get('ASYNC_DATABASE_URL') or async_database_url(config['SQLALCHEMY_DATABASE_URI']),
+            **({'pool_size': config['ASYNC_POOL_SIZE'], 'max_overflow': config['ASYNC_MAX_OVERFLOW']}
+               if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'postgresql' else {}),
+        )
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.routes = {
+            '/api/expenses/': self.list_expenses,
+            '/api/budgets/': self.list_budgets,
+            '/api/analytics/summary': self.summary,
+        } if not config.get('SHARD_DATABASE_URLS') else {}
+        self.auth_required = config.get('AUTH_REQUIRED')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        handler = self.routes.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+        if handler is not None:
+            request = AsyncRequest(scope)
+            # Bearer tokens are verified by the Flask app's hooks
+            if not request.wants_msgpack() and not self.auth_required and 'authorization' not in request.headers:
+                response = await handler(request)
+                if response is not None:
+                    return await self._send(request, send, *response)
+        # A fresh context: the server starts a connection's next request from the
+        # previous one's, which would hand asgiref that request's finished executor
+        return await contextvars.Context().run(asyncio.ensure_future, self._delegate(scope, receive, send))
+
+    async def _delegate(self, scope, receive, send):
+        # Its own thread per request; by default asgiref runs every WSGI call on one shared thread
+        async with ThreadSensitiveContext():
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _send(self, request, send, status, body=b'', headers=None):
+        headers = Headers(headers or {})
+        if msgpack is not None:
+            # MessagePack requests are left to the Flask app (under their own ETags)
+            headers.add('Vary', 'Accept')
+        if status == 200:
+            headers['Content-Type'] = 'application/json'
+            body = self._encode(request, body, headers)
+        headers['Content-Length'] = str(len(body))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _encode(self, request, body, headers):
+        # Same rules as the Flask after_request compression hook
+        config = self.flask_app.config
+        if not config.get('COMPRESSION_ENABLED'):
+            return body
+        headers.add('Vary', 'Accept-Encoding')
+        encoding = negotiate_encoding(parse_accept_header(request.headers.get('Accept-Encoding')))
+        if encoding is None or len(body) < config['COMPRESSION_MIN_SIZE']:
+            return body
+        headers['Content-Encoding'] = encoding
+        return compress_body(body, encoding, config)
+
+    # --- conditional requests -------------------------------------------------
+
+    async def _conditional(self, session, request, user_id):
+        """Return (not_modified_response, validator_headers) like ``conditional_get``."""
+        scopes = validator_scopes(user_id)
+        rows = await session.execute(UserDataVersion.select_many(scopes))
+        tag, last_modified = build_validators(
+            user_id, UserDataVersion.versions_by_user(scopes, rows), request.full_path,
+        )
+        headers = {'ETag': f'W/"{tag}"', 'Cache-Control': 'private, no-cache'}
+        if last_modified:
+            headers['Last-Modified'] = http_date(last_modified)
+        if parse_etags(request.headers.get('If-None-Match')).contains_weak(tag):
+            return (304, b'', headers), headers
+        return None, headers
+
+    # --- endpoints ------------------------------------------------------------
+
+    async def list_expenses(self, request):
+        args = request.args
+        if args.get('format', 'rows') != 'rows':
+            return None
+        user_id = args.get('user_id', type=int)
+        try:
+            start_date = datetime.fromisoformat(args['start_date']) if args.get('start_date') else None
+            end_date = datetime.fromisoformat(args['end_date']) if args.get('end_date') else None
+        except ValueError:
+            return None
+
+        async with self.sessions() as session:
+            headers = {}
+            if user_id:
+                not_modified, headers = await self._conditional(session, request, user_id)
+                if not_modified:
+                    return not_modified
+            statement = Expense.apply_filters(
+                select(Expense),
+                user_id=user_id,
+                category_id=args.get('category_id', type=int),
+                start_date=start_date,
+                end_date=end_date,
+            ).order_by(Expense.expense_date.desc())
+            expenses = (await session.scalars(statement)).all()
+
+        schema = EXPENSE_RESPONSE_SCHEMAS[request.amount_format()]
+        return 200, self._envelope(list[schema], expenses, from_attributes=True), headers
+
+    async def list_budgets(self, request):
+        args = request.args
+        user_id = args.get('user_id', type=int)
+        if not user_id:
+            return None
+        category_id = args.get('category_id', type=int)
+        is_active = args.get('is_active', type=bool)
+
+        async with self.sessions() as session:
+            not_modified, headers = await self._conditional(session, request, user_id)
+            if not_modified:
+                return not_modified
+            statement = select(Budget, Budget.spent_cents_column()).where(Budget.user_id == user_id)
+            if category_id:
+                statement = statement.where(Budget.category_id == category_id)
+            if is_active is not None:
+                statement = statement.where(Budget.is_active == is_active)
+            rows = (await session.execute(statement)).all()
+
+        schema = BUDGET_RESPONSE_SCHEMAS[request.amount_format()]
+        data = [budget_response_data(budget, int(spent_cents), schema.model_fields) for budget, spent_cents in rows]
+        return 200, self._envelope(list[schema], data), headers
+
+    async def summary(self, request):
+        args = request.args
+        user_id = args.get('user_id', type=int)
+        group_by = args.get('group_by')
+        if not user_id or group_by not in (None, '', 'category', 'payment_method'):
+            return None
+        try:
+            # Whole days, inclusive, like the columnar cache's day numbers
+            start_day = datetime.fromisoformat(args['start_date']).date() if args.get('start_date') else None
+            end_day = datetime.fromisoformat(args['end_date']).date() if args.get('end_date') else None
+        except ValueError:
+            return None
+
+        filters = [Expense.user_id == user_id]
+        if start_day:
+            filters.append(Expense.expense_date >= datetime.combine(start_day, datetime.min.time()))
+        if end_day:
+            filters.append(Expense.expense_date < datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+        if args.get('category_id', type=int):
+            filters.append(Expense.category_id == args.get('category_id', type=int))
+
+        async with self.sessions() as session:
+            not_modified, headers = await self._conditional(session, request, user_id)
+            if not_modified:
+                return not_modified
+            count, total, average, minimum, maximum = (await session.execute(
+                select(
+                    func.count(), func.coalesce(func.sum(Expense.amount_cents), 0), func.avg(Expense.amount_cents),
+                    func.min(Expense.amount_cents), func.max(Expense.amount_cents),
+                ).where(*filters)
+            )).one()
+            groups = []
+            if group_by:
+                key = Expense.category_id if group_by == 'category' else Expense.payment_method
+                groups = (await session.execute(
+                    select(key, func.count(), func.sum(Expense.amount_cents)).where(*filters).group_by(key)
+                )).all()
+
+        amount_format = request.amount_format()
+        data = {
+            'count': count,
+            **amount_fields(
+                amount_format,
+                total=int(total),
+                average=int(round(float(average))) if count else 0,
+                min=int(minimum) if count else 0,
+                max=int(maximum) if count else 0,
+            ),
+        }
+        if group_by:
+            # Same group order as the cache: category id, or payment method code
+            if group_by == 'category':
+                order = lambda group: group[0]
+            else:
+                order = lambda group: PAYMENT_METHODS.index(group[0]) if group[0] in PAYMENT_METHODS else 0
+            data['groups'] = [
+                {group_by: label, 'count': group_count, **amount_fields(amount_format, total=int(group_total))}
+                for label, group_count, group_total in sorted(groups, key=order)
+            ]
+        return 200, self._envelope(dict, data), headers
+
+    @staticmethod
+    def _envelope(data_type, data, from_attributes=False):
+        adapter = envelope_adapter(data_type)
+        envelope = adapter.validate_python(
+            {'success': True, 'message': 'Success', 'data': data}, from_attributes=from_attributes,
+        )
+        return adapter.dump_json(envelope)
+
+
+def create_asgi_app(flask_app):
+    return AsyncReadApp(flask_app)
@@ -0,0 +1,18 @@
+from app.commands.backfills import backfills_group
+from app.commands.budgets import budgets_group
+from app.commands.dedupe import dedupe_group
+from app.commands.partitions import partitions_group
+from app.commands.recurring import recurring_group
+from app.commands.seed import seed_command
+from app.commands.shards import shards_group
+from app.commands.users import users_group
+
+def register_commands(app):
+    app.cli.add_command(seed_command)
+    app.cli.add_command(partitions_group)
+    app.cli.add_command(dedupe_group)
+    app.cli.add_command(recurring_group)
+    app.cli.add_command(budgets_group)
+    app.cli.add_command(users_group)
+    app.cli.add_command(shards_group)
+    app.cli.add_command(backfills_group)
\ No newline at end of file
@@ -0,0 +1,64 @@
+import click
+from alembic.script import ScriptDirectory
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, select
+
+from app.services.online_migrations import Backfill, checkpoints, format_duration
+from app.services.sharding import DEFAULT_SHARD, shard_engine, shard_names
+
+
+def _backfills(revision, directory=None):
+    """The ``Backfill`` objects a migration script defines at module level."""
+    script = ScriptDirectory(directory or current_app.extensions['migrate'].directory).get_revision(revision)
+    if script is None:
+        raise click.ClickException(f'Revision {revision} not found')
+    found = [value for value in vars(script.module).values() if isinstance(value, Backfill)]
+    if not found:
+        raise click.ClickException(f'Revision {script.revision} defines no Backfill')
+    return found
+
+
+@click.group('backfills')
+def backfills_group():
+    """Inspect the batched backfills run by migrations."""
+
+
+@backfills_group.command('status')
+@with_appcontext
+def status_command():
+    """Show every backfill's checkpoint."""
+    shards = shard_names()
+    for shard in shards:
+        with shard_engine(shard).connect() as connection:
+            rows = connection.execute(select(checkpoints).order_by(checkpoints.c.started_at)).all() \
+                if inspect(connection).has_table(checkpoints.name) else []
+        label = f"{shard}: " if len(shards) > 1 else ""
+        if not rows:
+            click.echo(f"{label}No backfills have run")
+        for row in rows:
+            state = f"finished {row.finished_at:%Y-%m-%d %H:%M}" if row.finished_at else f"at key {row.last_key}"
+            click.echo(f"{'✅' if row.finished_at else '⏳'} {label}{row.name} on {row.table_name}: "
+                       f"{row.rows_updated:,} rows in {row.batches:,} batches, {state}")
+
+
+@backfills_group.command('estimate')
+@click.argument('revision')
+@click.option('--shard', default=DEFAULT_SHARD, show_default=True, help='Database to estimate on.')
+@click.option('-d', '--directory', help='Migration script directory (defaults to "migrations").')
+@with_appcontext
+def estimate_command(revision, shard, directory):
+    """Dry run: estimate the rows, batches and time of a migration's backfills, writing nothing."""
+    for backfill in _backfills(revision, directory):
+        estimate = backfill.estimate(shard_engine(shard))
+        click.echo(f"📋 {estimate['name']} on {estimate['table']}: ~{estimate['rows']:,} rows, "
+                   f"~{estimate['pending_rows']:,} to update")
+        if estimate['finished']:
+            click.echo("   already finished")
+            continue
+        if estimate['resumes_after'] is not None:
+            click.echo(f"   resumes after key {estimate['resumes_after']}")
+        if estimate['batches']:
+            click.echo(f"   {estimate['batches']:,} batches of {estimate['batch_size']:,} keys, "
+                       f"{estimate['seconds_per_batch'] * 1000:.1f} ms each, "
+                       f"~{format_duration(estimate['estimated_seconds'])} with pauses")
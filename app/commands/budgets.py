@@ -0,0 +1,40 @@
+import json
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from app.services.forecast import forecast_all
+from app.services.sharding import shard_engine, shard_names
+
+
+@click.group('budgets')
+def budgets_group():
+    """Budget maintenance jobs."""
+
+
+@budgets_group.command('forecast')
+@click.option('--workers', type=int, help='Worker processes (defaults to CPU count; SQLite runs in-process).')
+@click.option('--chunk-users', default=500, show_default=True, help='Users per worker task.')
+@click.option('--lookback-days', default=90, show_default=True, help='History used by the EWMA model.')
+@click.option('--halflife-days', default=7, show_default=True, help='EWMA half-life.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write forecasts as JSON lines to this file.')
+@with_appcontext
+def forecast_command(workers, chunk_users, lookback_days, halflife_days, output):
+    """Forecast every active budget (nightly batch), shard by shard."""
+    started = time.perf_counter()
+    budgets = exceeding = 0
+    out = open(output, 'w') if output else None
+    try:
+        for shard in shard_names():
+            for forecasts in forecast_all(shard_engine(shard), workers=workers, chunk_users=chunk_users,
+                                          lookback_days=lookback_days, halflife_days=halflife_days):
+                budgets += len(forecasts)
+                exceeding += sum(1 for forecast in forecasts if forecast['ewma']['will_exceed'])
+                if out:
+                    out.writelines(json.dumps(forecast) + '\n' for forecast in forecasts)
+    finally:
+        if out:
+            out.close()
+    click.echo(f"📈 Forecast {budgets} budgets in {time.perf_counter() - started:.1f}s; "
+               f"{exceeding} projected to exceed their amount")
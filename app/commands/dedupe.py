@@ -0,0 +1,52 @@
+import json
+
+import click
+from flask.cli import with_appcontext
+
+from app.services.dedupe import scan_all, scan_user
+from app.services.sharding import get_shard_router, route_to, shard_names
+
+
+@click.group('dedupe')
+def dedupe_group():
+    """Find duplicate expenses."""
+
+
+def _scan_shards(window_days, threshold):
+    for shard in shard_names():
+        route_to(shard)
+        yield from scan_all(window_days, threshold)
+
+
+@dedupe_group.command('scan')
+@click.option('--user-id', type=int, help='Only scan this user (defaults to every user).')
+@click.option('--window-days', type=int, help='Max days between duplicates (defaults to DEDUPE_WINDOW_DAYS).')
+@click.option('--threshold', type=float, help='Min description similarity (defaults to DEDUPE_SIMILARITY_THRESHOLD).')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write clusters as JSON lines to this file.')
+@with_appcontext
+def scan_command(user_id, window_days, threshold, output):
+    """Scan stored expenses and report duplicate clusters."""
+    router = get_shard_router()
+    if user_id:
+        if router is not None:
+            route_to(router.shard_of(user_id))
+        clusters = scan_user(user_id, window_days, threshold)
+        results = [(user_id, clusters)] if clusters else []
+    else:
+        results = _scan_shards(window_days, threshold)
+
+    users = total = 0
+    out = open(output, 'w') if output else None
+    try:
+        for owner_id, clusters in results:
+            users += 1
+            total += len(clusters)
+            for cluster in clusters:
+                if out:
+                    out.write(json.dumps({'user_id': owner_id, 'expense_ids': cluster}) + '\n')
+                else:
+                    click.echo(f"user {owner_id}: {', '.join(map(str, cluster))}")
+    finally:
+        if out:
+            out.close()
+    click.echo(f"✅ Found {total} duplicate clusters across {users} users")
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.config.extensions import db
+from app.models.budget import Budget
+from app.models.expense import Expense
+from app.services import partitions
+from app.services.sharding import shard_engine, shard_names
+
+
+def _require_partitioned(connection):
+    if not partitions.is_partitioned(connection):
+        raise click.ClickException('expenses is not a partitioned PostgreSQL table (run flask db upgrade)')
+
+
+def _shard_engines():
+    """(label, engine) of every shard; the label is empty without sharding."""
+    shards = shard_names()
+    return [(f"{shard}: " if len(shards) > 1 else "", shard_engine(shard)) for shard in shards]
+
+
+@click.group('partitions')
+def partitions_group():
+    """Manage monthly partitions of the expenses table."""
+
+
+@partitions_group.command('list')
+@with_appcontext
+def list_command():
+    """Show partitions and their ranges."""
+    for label, engine in _shard_engines():
+        with engine.connect() as connection:
+            _require_partitioned(connection)
+            for name, lower, upper in partitions.list_partitions(connection):
+                click.echo(f"{label}{name:<24} {lower or 'DEFAULT'} .. {upper or ''}")
+
+
+@partitions_group.command('ensure')
+@click.option('--months-ahead', type=int, help='Create partitions this many months ahead (defaults to PARTITION_MONTHS_AHEAD).')
+@with_appcontext
+def ensure_command(months_ahead):
+    """Create missing partitions up to --months-ahead (what PARTITION_MAINTENANCE_ENABLED does in-process)."""
+    months_ahead = months_ahead or current_app.config['PARTITION_MONTHS_AHEAD']
+    for label, engine in _shard_engines():
+        with engine.begin() as connection:
+            _require_partitioned(connection)
+            partitions.lock_maintenance(connection)
+            created = partitions.ensure_partitions(connection, months_ahead=months_ahead)
+        click.echo(f"✅ {label}Created {', '.join(created)}" if created else f"✅ {label}All partitions already exist")
+
+
+@partitions_group.command('retain')
+@click.option('--keep-months', required=True, type=int, help='Months of data to keep attached.')
+@click.option('--drop', is_flag=True, help='Drop detached partitions instead of keeping them as tables.')
+@click.option('--dry-run', is_flag=True, help='Only print what would be detached.')
+@with_appcontext
+def retain_command(keep_months, drop, dry_run):
+    """Detach (or drop) partitions older than the retention window."""
+    action = 'Would detach' if dry_run else 'Dropped' if drop else 'Detached'
+    for label, engine in _shard_engines():
+        with engine.begin() as connection:
+            _require_partitioned(connection)
+            expired = partitions.apply_retention(connection, keep_months, drop=drop, dry_run=dry_run)
+        click.echo(f"{label}{action}: {', '.join(expired) or 'nothing'}")
+
+
+@partitions_group.command('verify')
+@click.option('--user-id', type=int, help='User to build the sample queries for (defaults to the first user).')
+@click.option('--days', default=30, show_default=True, help='Date range of the sample queries.')
+@with_appcontext
+def verify_command(user_id, days):
+    """EXPLAIN the controller queries and check that partitions are pruned."""
+    user_id = user_id or db.session.query(db.func.min(Expense.user_id)).scalar()
+    end = datetime.now(timezone.utc).replace(tzinfo=None)
+    start = end - timedelta(days=days)
+    budget = Budget(user_id=user_id, start_date=start, end_date=end)
+    queries = {
+        'get_expenses(start_date, end_date)': Expense.apply_filters(
+            Expense.query, user_id=user_id, start_date=start, end_date=end
+        ).order_by(Expense.expense_date.desc()),
+        'Budget.get_spent_cents': budget.spent_cents_query(),
+    }
+
+    failed = False
+    with db.engine.connect() as connection:
+        _require_partitioned(connection)
+        for label, query in queries.items():
+            report = partitions.explain_pruning(connection, query)
+            pruned = len(report['scanned']) < report['total']
+            failed |= not pruned
+            click.echo(f"{'✅' if pruned else '❌'} {label}: scans {len(report['scanned'])}/{report['total']} "
+                       f"partitions ({', '.join(report['scanned'])})")
+    if failed:
+        raise click.ClickException('Some queries scan every partition')
@@ -0,0 +1,53 @@
+import logging
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.services.recurring import RecurringScheduler, start_scheduler_thread
+from app.services.sharding import shard_names
+
+
+@click.group('recurring')
+def recurring_group():
+    """Generate instances of recurring expenses."""
+
+
+@recurring_group.command('run')
+@click.option('--once', is_flag=True, help='Catch up on everything due now and exit (for cron).')
+@click.option('--interval', type=int, help='Max seconds between ticks (defaults to RECURRING_INTERVAL_SECONDS).')
+@click.option('--batch-size', type=int, help='Templates per insert batch (defaults to RECURRING_BATCH_SIZE).')
+@with_appcontext
+def run_command(once, interval, batch_size):
+    """Run the recurring expense scheduler (one per shard)."""
+    batch_size = batch_size or current_app.config['RECURRING_BATCH_SIZE']
+    shards = shard_names()
+    if once:
+        for shard in shards:
+            scheduler = RecurringScheduler(batch_size, shard)
+            inserted = scheduler.tick()
+            click.echo(f"✅ Materialized {inserted} recurring expenses from {len(scheduler)} templates"
+                       + (f" on {shard}" if len(shards) > 1 else ""))
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    click.echo("🔁 Recurring expense scheduler running (Ctrl+C to stop)")
+    if len(shards) == 1:
+        try:
+            RecurringScheduler(batch_size, shards[0]).run_forever(
+                interval or current_app.config['RECURRING_INTERVAL_SECONDS']
+            )
+        except KeyboardInterrupt:
+            click.echo("👋 Stopped")
+        return
+
+    app = current_app._get_current_object()
+    threads = [start_scheduler_thread(app, interval, batch_size, shard) for shard in shards]
+    try:
+        for thread, _ in threads:
+            while thread.is_alive():
+                thread.join(1)
+    except KeyboardInterrupt:
+        for _, stop_event in threads:
+            stop_event.set()
+        click.echo("👋 Stopped")
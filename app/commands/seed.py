@@ -0,0 +1,321 @@
+import csv
+import io
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, func, insert, select
+from werkzeug.security import generate_password_hash
+
+from app.config.extensions import db
+from app.models.budget import Budget
+from app.models.expense import Expense
+from app.models.role import Category
+from app.models.user import User
+from app.services.sharding import get_shard_router
+from app.utils.money import to_cents
+
+# name, icon, color, (lognormal mu, sigma) of the amount, description templates
+CATEGORY_PROFILES = [
+    ('Food & Dining', '🍔', '#FF5733', (3.0, 0.6),
+     ['Lunch at {place}', 'Dinner at {place}', 'Coffee at {place}', 'Food delivery from {place}']),
+    ('Groceries', '🛒', '#27AE60', (3.8, 0.5),
+     ['Groceries at {store}', 'Weekly shopping at {store}', 'Fresh produce at {store}']),
+    ('Transportation', '🚗', '#3498DB', (2.7, 0.7),
+     ['Uber ride to {place}', 'Fuel at {store}', 'Parking near {place}', 'Train ticket']),
+    ('Utilities', '💡', '#F1C40F', (4.4, 0.3),
+     ['Electricity bill', 'Water bill', 'Internet bill', 'Mobile phone bill']),
+    ('Entertainment', '🎬', '#9B59B6', (3.2, 0.6),
+     ['Movie tickets', 'Concert at {place}', 'Streaming subscription', 'Games from {store}']),
+    ('Shopping', '🛍️', '#E67E22', (3.9, 0.8),
+     ['Clothes from {store}', 'Electronics from {store}', 'Gift from {store}']),
+    ('Health', '💊', '#1ABC9C', (3.5, 0.7),
+     ['Pharmacy at {store}', 'Doctor visit', 'Gym membership']),
+    ('Travel', '✈️', '#34495E', (5.5, 0.8),
+     ['Flight to {place}', 'Hotel in {place}', 'Car rental in {place}']),
+]
+
+PLACES = ['Downtown', 'Central Park', 'Airport', 'Main Street', 'the Office', 'Riverside', 'Old Town']
+STORES = ['Walmart', 'Target', 'Costco', 'Amazon', 'Whole Foods', 'Shell', 'IKEA', 'CVS']
+NOTES = ['Team lunch', 'Split with friends', 'Reimbursable', 'Paid in advance', 'Birthday']
+PAYMENT_METHODS = ['cash', 'credit_card', 'debit_card', 'bank_transfer', 'digital_wallet', 'other']
+PAYMENT_WEIGHTS = [15, 40, 25, 5, 12, 3]
+RECURRING_FREQUENCIES = ['weekly', 'monthly', 'monthly', 'yearly']
+
+EXPENSE_COLUMNS = (
+    'amount', 'amount_cents', 'description', 'notes', 'expense_date', 'payment_method', 'receipt_url',
+    'is_recurring', 'recurring_frequency', 'user_id', 'category_id', 'created_at', 'updated_at',
+)
+
+# Per-process engine used by spawned loader workers
+_worker_engine = None
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def generate_expense_rows(user_plan, expenses_per_user, seed, months, now):
+    """Yield expense row tuples (in EXPENSE_COLUMNS order) for the given users.
+
+    ``user_plan`` is a list of ``(user_id, [(category_id, profile_index), ...])``.
+    Generation is deterministic for a given seed and user id.
+    """
+    span_seconds = int(months * 30.44 * 86400)
+    for user_id, categories in user_plan:
+        rng = random.Random(seed * 1_000_003 + user_id)
+        weights = [rng.uniform(0.5, 3.0) for _ in categories]
+        picks = rng.choices(categories, weights=weights, k=expenses_per_user)
+        for category_id, profile_index in picks:
+            _, _, _, (mu, sigma), templates = CATEGORY_PROFILES[profile_index]
+            amount = min(Decimal(str(round(rng.lognormvariate(mu, sigma), 2))), Decimal('999999.99'))
+            if amount <= 0:
+                amount = Decimal('0.01')
+            description = rng.choice(templates).format(place=rng.choice(PLACES), store=rng.choice(STORES))
+            expense_date = now - timedelta(seconds=rng.randrange(span_seconds))
+            is_recurring = rng.random() < 0.03
+            yield (
+                amount,
+                to_cents(amount),
+                description,
+                rng.choice(NOTES) if rng.random() < 0.2 else None,
+                expense_date,
+                rng.choices(PAYMENT_METHODS, weights=PAYMENT_WEIGHTS)[0],
+                f'https://example.com/receipts/{user_id}/{rng.getrandbits(32):08x}.jpg' if rng.random() < 0.1 else None,
+                is_recurring,
+                rng.choice(RECURRING_FREQUENCIES) if is_recurring else None,
+                user_id,
+                category_id,
+                expense_date,
+                expense_date,
+            )
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_batch(connection, batch):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in batch:
+        writer.writerow(['' if value is None else value for value in row])
+    buf.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY expenses ({', '.join(EXPENSE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_batch(connection, batch):
+    connection.execute(
+        insert(Expense.__table__),
+        [dict(zip(EXPENSE_COLUMNS, row)) for row in batch],
+    )
+
+
+def load_expense_rows(connection, rows, batch_size):
+    """Bulk load rows on an open connection, using COPY on PostgreSQL."""
+    load = _copy_batch if connection.dialect.name == 'postgresql' else _insert_batch
+    count = 0
+    for batch in _batched(rows, batch_size):
+        load(connection, batch)
+        count += len(batch)
+    return count
+
+
+def _seed_expense_chunk(task):
+    """Worker entry point: generate and load expenses for one chunk of users."""
+    global _worker_engine
+    url, user_plan, expenses_per_user, seed, months, now, batch_size = task
+    if _worker_engine is None:
+        _worker_engine = create_engine(url)
+    with _worker_engine.begin() as connection:
+        rows = generate_expense_rows(user_plan, expenses_per_user, seed, months, now)
+        return load_expense_rows(connection, rows, batch_size)
+
+
+def _ensure_default_categories():
+    existing = {
+        name for (name,) in db.session.execute(
+            select(Category.name).where(Category.is_default.is_(True))
+        )
+    }
+    now = _utcnow()
+    missing = [
+        {'name': name, 'icon': icon, 'color': color, 'is_default': True, 'user_id': None,
+         'created_at': now, 'updated_at': now}
+        for name, icon, color, _, _ in CATEGORY_PROFILES if name not in existing
+    ]
+    router = get_shard_router()
+    first_id = router.shared_row_id(Category.__table__) if router is not None and missing else None
+    if first_id is not None:
+        # Copied to every shard under these ids, which none of them uses yet
+        for offset, row in enumerate(missing):
+            row['id'] = first_id + offset
+    if missing:
+        db.session.execute(insert(Category.__table__), missing)
+
+
+def _insert_users(count, password_hash):
+    base = db.session.query(func.max(User.id)).scalar() or 0
+    now = _utcnow()
+    for start in range(0, count, 10_000):
+        db.session.execute(insert(User.__table__), [
+            {'email': f'seed{base + n}@example.com', 'username': f'seed_user_{base + n}',
+             'password_hash': password_hash, 'first_name': 'Seed', 'last_name': f'User{base + n}',
+             'is_active': True, 'created_at': now, 'updated_at': now}
+            for n in range(start + 1, min(start + 10_000, count) + 1)
+        ])
+    return [user_id for (user_id,) in db.session.execute(
+        select(User.id).where(User.id > base).order_by(User.id)
+    )]
+
+
+def _insert_categories(user_ids, categories_per_user, rng):
+    now = _utcnow()
+    rows = []
+    for user_id in user_ids:
+        for profile_index in rng.sample(range(len(CATEGORY_PROFILES)), categories_per_user):
+            name, icon, color, _, _ = CATEGORY_PROFILES[profile_index]
+            rows.append({'name': f'My {name}', 'icon': icon, 'color': color, 'is_default': False,
+                         'user_id': user_id, 'created_at': now, 'updated_at': now})
+    for batch in _batched(rows, 10_000):
+        db.session.execute(insert(Category.__table__), batch)
+
+    index_by_name = {f'My {profile[0]}': i for i, profile in enumerate(CATEGORY_PROFILES)}
+    plan = {user_id: [] for user_id in user_ids}
+    for category_id, user_id, name in db.session.execute(
+        select(Category.id, Category.user_id, Category.name).where(Category.user_id >= user_ids[0])
+    ):
+        if user_id in plan:
+            plan[user_id].append((category_id, index_by_name[name]))
+    return [(user_id, plan[user_id]) for user_id in user_ids]
+
+
+def _insert_budgets(user_plan, budgets_per_user, rng, now):
+    period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    for user_id, categories in user_plan:
+        for n in range(budgets_per_user):
+            category_id = None if n == 0 else rng.choice(categories)[0]
+            amount = rng.randrange(200, 3000)
+            rows.append({
+                'name': 'Monthly Budget' if category_id is None else f'Category Budget {n}',
+                'amount': Decimal(amount),
+                'amount_cents': amount * 100,
+                'period': 'monthly' if n == 0 else rng.choice(['weekly', 'monthly', 'yearly']),
+                'start_date': period_start,
+                'end_date': None,
+                'alert_threshold': rng.choice([75, 80, 90]),
+                'is_active': True,
+                'user_id': user_id,
+                'category_id': category_id,
+                'created_at': now,
+                'updated_at': now,
+            })
+    for batch in _batched(rows, 10_000):
+        db.session.execute(insert(Budget.__table__), batch)
+    return len(rows)
+
+
+def seed_database(users=100, expenses_per_user=1000, categories_per_user=5, budgets_per_user=3,
+                  workers=None, batch_size=10_000, seed=42, months=24, chunk_users=50, echo=None):
+    """Generate a synthetic dataset in the current app's database.
+
+    Users, categories and budgets are inserted in bulk from this process; expenses
+    are generated and loaded by a pool of worker processes (COPY on PostgreSQL).
+    SQLite does not allow concurrent writers, so it is always loaded in-process.
+    """
+    echo = echo or (lambda message: None)
+    rng = random.Random(seed)
+    now = _utcnow()
+    categories_per_user = max(1, min(categories_per_user, len(CATEGORY_PROFILES)))
+
+    started = time.perf_counter()
+    _ensure_default_categories()
+    user_ids = _insert_users(users, generate_password_hash('password123'))
+    if not user_ids:
+        db.session.commit()
+        return {'users': 0, 'categories': 0, 'budgets': 0, 'expenses': 0}
+    user_plan = _insert_categories(user_ids, categories_per_user, rng)
+    budgets = _insert_budgets(user_plan, budgets_per_user, rng, now)
+    db.session.commit()
+    echo(f"👥 {len(user_ids)} users, {len(user_ids) * categories_per_user} categories, "
+         f"{budgets} budgets in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    total = len(user_ids) * expenses_per_user
+    loaded = 0
+    workers = workers or multiprocessing.cpu_count()
+    if db.engine.dialect.name == 'postgresql' and workers > 1:
+        url = db.engine.url.render_as_string(hide_password=False)
+        tasks = [
+            (url, user_plan[i:i + chunk_users], expenses_per_user, seed, months, now, batch_size)
+            for i in range(0, len(user_plan), chunk_users)
+        ]
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(workers) as pool:
+            for count in pool.imap_unordered(_seed_expense_chunk, tasks):
+                loaded += count
+                echo(f"💸 {loaded}/{total} expenses ({loaded / (time.perf_counter() - started):,.0f} rows/s)")
+    else:
+        with db.engine.begin() as connection:
+            for i in range(0, len(user_plan), chunk_users):
+                rows = generate_expense_rows(user_plan[i:i + chunk_users], expenses_per_user, seed, months, now)
+                loaded += load_expense_rows(connection, rows, batch_size)
+                echo(f"💸 {loaded}/{total} expenses ({loaded / (time.perf_counter() - started):,.0f} rows/s)")
+
+    return {
+        'users': len(user_ids),
+        'categories': len(user_ids) * categories_per_user,
+        'budgets': budgets,
+        'expenses': loaded,
+    }
+
+
+@click.command('seed')
+@click.option('--users', default=100, show_default=True, help='Number of users to create.')
+@click.option('--expenses-per-user', default=1000, show_default=True, help='Expenses generated for each user.')
+@click.option('--categories-per-user', default=5, show_default=True, help='Custom categories per user.')
+@click.option('--budgets-per-user', default=3, show_default=True, help='Budgets per user (first one is overall).')
+@click.option('--workers', default=None, type=int, help='Loader processes (defaults to CPU count).')
+@click.option('--batch-size', default=10_000, show_default=True, help='Rows per COPY/INSERT batch.')
+@click.option('--months', default=24, show_default=True, help='Spread expense dates over this many months.')
+@click.option('--seed', default=42, show_default=True, help='Random seed for reproducible data.')
+@with_appcontext
+def seed_command(users, expenses_per_user, categories_per_user, budgets_per_user, workers, batch_size, months, seed):
+    """Generate realistic synthetic users, categories, budgets and expenses."""
+    click.echo(f"🌱 Seeding {users} users x {expenses_per_user} expenses...")
+    started = time.perf_counter()
+    counts = seed_database(
+        users=users,
+        expenses_per_user=expenses_per_user,
+        categories_per_user=categories_per_user,
+        budgets_per_user=budgets_per_user,
+        workers=workers,
+        batch_size=batch_size,
+        seed=seed,
+        months=months,
+        echo=click.echo,
+    )
+    click.echo(f"✅ Seeded {counts} in {time.perf_counter() - started:.1f}s")
+    router = get_shard_router()
+    if router is not None:
+        click.echo(f"🗂️  {router.sync_shared_categories()} shared categories on every shard")
+        # Seeding writes to the main database, where the new users aren't in the directory yet
+        click.echo("ℹ️  Run `flask shards init` and `flask shards rebalance` to spread them over the shards")
@@ -0,0 +1,156 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_migrate import upgrade
+from sqlalchemy import func, insert, select, text
+
+from app.models.expense import Expense
+from app.models.user import User
+from app.models.user_directory import UserDirectory
+from app.services.shard_move import ShardMove, drop_copy
+from app.services.sharding import DEFAULT_SHARD, get_shard_router
+
+# Tables whose ids are handed out per shard; user ids come from the directory
+STRIDED_TABLES = ('categories', 'expenses', 'budgets')
+
+
+def _router():
+    router = get_shard_router()
+    if router is None:
+        raise click.ClickException('Sharding is off (set SHARD_DATABASE_URLS)')
+    return router
+
+
+@click.group('shards')
+def shards_group():
+    """Manage the shards holding users' data."""
+
+
+@shards_group.command('list')
+@with_appcontext
+def list_command():
+    """Show each shard's users and expenses, and moves in progress."""
+    router = _router()
+    with router.engine(DEFAULT_SHARD).connect() as connection:
+        homed = dict(connection.execute(
+            select(UserDirectory.shard, func.count()).group_by(UserDirectory.shard)
+        ).all())
+        moving = connection.execute(
+            select(UserDirectory.user_id, UserDirectory.shard, UserDirectory.moving_to)
+            .where(UserDirectory.moving_to.is_not(None))
+        ).all()
+    for shard in router.shards:
+        with router.engine(shard).connect() as connection:
+            users = connection.scalar(select(func.count()).select_from(User))
+            expenses = connection.scalar(select(func.count()).select_from(Expense))
+        click.echo(f"{shard:<10} {homed.get(shard, 0):>8,} users homed  {users:>8,} user rows  {expenses:>12,} expenses")
+    for user_id, shard, moving_to in moving:
+        click.echo(f"🚚 user {user_id}: {shard} -> {moving_to}")
+
+
+@shards_group.command('upgrade')
+@with_appcontext
+def upgrade_command():
+    """Run the database migrations on every shard."""
+    for shard in _router().shards:
+        click.echo(f"⬆️  {shard}")
+        upgrade(x_arg=[f'shard={shard}'])
+
+
+@shards_group.command('init')
+@click.option('--stride', type=int, help='Id step of PostgreSQL shards (defaults to SHARD_ID_STRIDE).')
+@with_appcontext
+def init_command(stride):
+    """Register existing users in the directory, copy shared categories to every shard and give each
+    shard its own ids (safe to re-run)."""
+    router = _router()
+    stride = stride or current_app.config['SHARD_ID_STRIDE']
+    if stride < len(router.shards):
+        raise click.ClickException(f'--stride must be at least the number of shards ({len(router.shards)})')
+
+    directory = router.engine(DEFAULT_SHARD)
+    with directory.begin() as connection:
+        known = set(connection.scalars(select(UserDirectory.user_id)))
+        added = 0
+        for shard in router.shards:
+            with router.engine(shard).connect() as source:
+                users = source.execute(select(User.id, User.email, User.username)).all()
+            rows = [{'user_id': user_id, 'email': email, 'username': username, 'shard': shard}
+                    for user_id, email, username in users if user_id not in known]
+            if rows:
+                connection.execute(insert(UserDirectory), rows)
+                known.update(row['user_id'] for row in rows)
+                added += len(rows)
+        if connection.dialect.name == 'postgresql' and known:
+            connection.execute(
+                text("SELECT setval(pg_get_serial_sequence('user_directory', 'user_id'), :value)"),
+                {'value': max(known)},
+            )
+    click.echo(f"✅ Added {added} users to the directory")
+    click.echo(f"✅ {router.sync_shared_categories()} shared categories on every shard")
+
+    if directory.dialect.name != 'postgresql':
+        click.echo("ℹ️  SQLite shards number their rows independently: ids can clash when a user moves")
+        return
+    # Each shard hands out the ids congruent to its index, above every id in use anywhere
+    highest = {}
+    for shard in router.shards:
+        with router.engine(shard).connect() as connection:
+            for table in STRIDED_TABLES:
+                highest[table] = max(highest.get(table, 0),
+                                     connection.scalar(text(f'SELECT COALESCE(MAX(id), 0) FROM {table}')))
+    for index, shard in enumerate(router.shards):
+        with router.engine(shard).begin() as connection:
+            for table in STRIDED_TABLES:
+                sequence = connection.scalar(text('SELECT pg_get_serial_sequence(:table, :column)'),
+                                             {'table': table, 'column': 'id'})
+                if sequence is None:
+                    continue
+                start = highest[table] + 1 + (index - highest[table] - 1) % stride
+                connection.execute(text(f'ALTER SEQUENCE {sequence} INCREMENT BY {stride} RESTART WITH {start}'))
+        click.echo(f"✅ {shard}: ids step by {stride} from residue {index}")
+
+
+@shards_group.command('move')
+@click.argument('user_id', type=int)
+@click.argument('target')
+@click.option('--max-passes', default=5, show_default=True, help='Online copy passes before writes are paused.')
+@with_appcontext
+def move_command(user_id, target, max_passes):
+    """Move a user's data to TARGET while they keep using the app (resumes an interrupted move)."""
+    move = ShardMove(_router(), user_id, target, current_app.config['SHARD_MOVE_BATCH_SIZE'], max_passes,
+                     progress=lambda message: click.echo(f"🚚 {message}"))
+    try:
+        written = move.run()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ Moved user {user_id} from {move.source} to {target} ({written:,} rows written)")
+
+
+@shards_group.command('rebalance')
+@click.option('--dry-run', is_flag=True, help='Only print the moves.')
+@with_appcontext
+def rebalance_command(dry_run):
+    """Move every user to the shard the hash ring places them on (after adding a shard)."""
+    router = _router()
+    moves = [(user_id, shard, router.ring.shard_for(user_id))
+             for user_id, shard in sorted(router.placements().items())
+             if router.ring.shard_for(user_id) != shard]
+    for user_id, source, target in moves:
+        click.echo(f"{'Would move' if dry_run else '🚚 Moving'} user {user_id}: {source} -> {target}")
+        if not dry_run:
+            ShardMove(router, user_id, target, current_app.config['SHARD_MOVE_BATCH_SIZE']).run()
+    click.echo(f"✅ {len(moves)} users {'to move' if dry_run else 'moved'}")
+
+
+@shards_group.command('drop-copy')
+@click.argument('user_id', type=int)
+@click.argument('shard')
+@with_appcontext
+def drop_copy_command(user_id, shard):
+    """Delete what an abandoned move left of a user on SHARD."""
+    try:
+        deleted = drop_copy(_router(), user_id, shard, current_app.config['SHARD_MOVE_BATCH_SIZE'])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ Deleted user {user_id}'s copy on {shard}: {deleted}")
@@ -0,0 +1,41 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.config.extensions import db
+from app.models.user import User
+from app.services.auth import get_token_auth
+from app.services.sharding import current_engine, get_shard_router, route_to
+from app.services.user_purge import UserPurge
+
+
+@click.group('users')
+def users_group():
+    """Manage user accounts."""
+
+
+@users_group.command('purge')
+@click.argument('user_id', type=int)
+@click.option('--batch-size', type=int, help='Rows deleted per transaction (defaults to USER_PURGE_BATCH_SIZE).')
+@with_appcontext
+def purge_command(user_id, batch_size):
+    """Deactivate a user, then delete their data in batches and the user itself (resumes an interrupted purge)."""
+    router = get_shard_router()
+    if router is not None:
+        route_to(router.shard_of(user_id))
+    user = db.session.get(User, user_id)
+    if user is None:
+        raise click.ClickException(f'User {user_id} not found')
+    user.is_active = False
+    user.save()
+    db.session.close()
+    get_token_auth().revoke_user(user_id)
+
+    def progress(table, deleted, total):
+        click.echo(f"🗑️  {table}: {deleted:,}/{total:,}")
+
+    purge = UserPurge(user_id, batch_size or current_app.config['USER_PURGE_BATCH_SIZE'], progress, current_engine())
+    deleted = purge.run()
+    if router is not None:
+        router.release(user_id)
+    click.echo(f"✅ Deleted user {user_id} with {deleted['expenses']:,} expenses and {deleted['budgets']:,} budgets")
@@ -20,6 +20,111 @@ class Config:
         f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
     )
 
+    DEDUPE_WINDOW_DAYS = int(os.environ.get('DEDUPE_WINDOW_DAYS', 3))
+    DEDUPE_SIMILARITY_THRESHOLD = float(os.environ.get('DEDUPE_SIMILARITY_THRESHOLD', 0.6))
+
+    # Run the recurring expense scheduler inside the web process (otherwise use `flask recurring run`)
+    RECURRING_SCHEDULER_ENABLED = os.environ.get('RECURRING_SCHEDULER_ENABLED', '').lower() in ('1', 'true', 'yes')
+    RECURRING_INTERVAL_SECONDS = int(os.environ.get('RECURRING_INTERVAL_SECONDS', 60))
+    RECURRING_BATCH_SIZE = int(os.environ.get('RECURRING_BATCH_SIZE', 500))
+
+    # Keep the monthly expenses partitions created PARTITION_MONTHS_AHEAD ahead from a thread of each
+    # process (PostgreSQL only; otherwise run `flask partitions ensure` daily)
+    PARTITION_MAINTENANCE_ENABLED = os.environ.get('PARTITION_MAINTENANCE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get('PARTITION_MAINTENANCE_INTERVAL_SECONDS', 3600))
+    PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+
+    # Per-process columnar cache of users' expenses for /api/analytics
+    EXPENSE_CACHE_ENABLED = os.environ.get('EXPENSE_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    EXPENSE_CACHE_MAX_MB = int(os.environ.get('EXPENSE_CACHE_MAX_MB', 256))
+
+    # Host-wide cache of data versions, category lists and budget spending, shared by the worker
+    # processes through a memory-mapped file (SHARED_CACHE_PATH defaults to a private directory of /dev/shm)
+    SHARED_CACHE_ENABLED = os.environ.get('SHARED_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH')
+    SHARED_CACHE_SLOTS = int(os.environ.get('SHARED_CACHE_SLOTS', 4096))
+    SHARED_CACHE_SLOT_BYTES = int(os.environ.get('SHARED_CACHE_SLOT_BYTES', 4096))
+    SHARED_CACHE_TTL_SECONDS = float(os.environ.get('SHARED_CACHE_TTL_SECONDS', 300))
+    # Writes on this host invalidate cached versions at once, writes on other hosts after this long
+    SHARED_CACHE_VERSION_TTL_SECONDS = float(os.environ.get('SHARED_CACHE_VERSION_TTL_SECONDS', 2))
+
+    # Per-process cache of analytics, budget list and forecast results, keyed by the user's data version
+    RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 2048))
+    RESULT_CACHE_TTL_SECONDS = float(os.environ.get('RESULT_CACHE_TTL_SECONDS', 60))
+
+    # gzip/br response compression (br needs the optional brotli package)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
+    # Bearer tokens from POST /api/auth/login. With AUTH_REQUIRED every API call but login and sign-up
+    # needs one; otherwise requests without a token still name their user with ?user_id=
+    AUTH_REQUIRED = os.environ.get('AUTH_REQUIRED', '').lower() in ('1', 'true', 'yes')
+    AUTH_TOKEN_TTL_SECONDS = int(os.environ.get('AUTH_TOKEN_TTL_SECONDS', 3600))
+    AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+    # How often each process reads new revocations (logouts, deactivated users) from the database
+    AUTH_DENYLIST_REFRESH_SECONDS = float(os.environ.get('AUTH_DENYLIST_REFRESH_SECONDS', 2))
+    # Revocations are re-read this far back, for rows committed after newer ones were read (longer
+    # than any write transaction, plus clock skew between hosts)
+    AUTH_DENYLIST_OVERLAP_SECONDS = float(os.environ.get('AUTH_DENYLIST_OVERLAP_SECONDS', 60))
+
+    # Most sub-requests accepted by POST /api/batch
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+
+    # Group commit: BaseModel.save() inserts from concurrent requests are committed together
+    # by a writer thread, at most GROUP_COMMIT_MAX_BATCH rows or GROUP_COMMIT_MAX_WAIT_MS apart
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', '').lower() in ('1', 'true', 'yes')
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 100))
+    GROUP_COMMIT_MAX_WAIT_MS = float(os.environ.get('GROUP_COMMIT_MAX_WAIT_MS', 2))
+
+    # DELETE /api/users/<id> deletes accounts with up to this many expenses at once; larger
+    # ones are deactivated and purged in the background, USER_PURGE_BATCH_SIZE rows per transaction
+    USER_DELETE_INLINE_LIMIT = int(os.environ.get('USER_DELETE_INLINE_LIMIT', 5000))
+    USER_PURGE_BATCH_SIZE = int(os.environ.get('USER_PURGE_BATCH_SIZE', 5000))
+
+    # Backfills run by migrations (app/services/online_migrations.py): keys per batch, the least
+    # pause between batches, and how long a batch waits for a row lock before backing off
+    BACKFILL_BATCH_SIZE = int(os.environ.get('BACKFILL_BATCH_SIZE', 5000))
+    BACKFILL_PAUSE_SECONDS = float(os.environ.get('BACKFILL_PAUSE_SECONDS', 0.1))
+    BACKFILL_LOCK_TIMEOUT_SECONDS = float(os.environ.get('BACKFILL_LOCK_TIMEOUT_SECONDS', 5))
+
+    # Connection pool of the async read path (asgi.py); the URL defaults to the
+    # main database with its asyncio driver (asyncpg / aiosqlite)
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+    ASYNC_POOL_SIZE = int(os.environ.get('ASYNC_POOL_SIZE', 10))
+    ASYNC_MAX_OVERFLOW = int(os.environ.get('ASYNC_MAX_OVERFLOW', 10))
+
+    # Production server (python -m app.server): gunicorn workers forked from the preloaded app.
+    # 0 workers = one per CPU core available; each serves SERVER_THREADS requests at a time and is
+    # replaced after SERVER_MAX_REQUESTS plus up to the jitter (default a tenth of it) requests
+    SERVER_BIND = [bind.strip() for bind in os.environ.get('SERVER_BIND', '0.0.0.0:5004').split(',')]
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 0))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 10000))
+    SERVER_MAX_REQUESTS_JITTER = int(os.environ['SERVER_MAX_REQUESTS_JITTER']) \
+        if os.environ.get('SERVER_MAX_REQUESTS_JITTER') else None
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 30))
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+    SERVER_KEEPALIVE = int(os.environ.get('SERVER_KEEPALIVE', 5))
+    SERVER_PIDFILE = os.environ.get('SERVER_PIDFILE')
+    # '-' logs requests to stdout
+    SERVER_ACCESS_LOG = os.environ.get('SERVER_ACCESS_LOG')
+    SERVER_LOG_LEVEL = os.environ.get('SERVER_LOG_LEVEL', 'info')
+
+    # Sharding: extra databases (comma-separated URLs) become shard1, shard2, ...; the main
+    # database is shard0 and also holds the user directory. Empty = no sharding
+    SHARD_DATABASE_URLS = [url.strip() for url in os.environ.get('SHARD_DATABASE_URLS', '').split(',') if url.strip()]
+    SHARD_VIRTUAL_NODES = int(os.environ.get('SHARD_VIRTUAL_NODES', 64))
+    # How long a process trusts its cached copy of a user's directory entry
+    SHARD_DIRECTORY_TTL_SECONDS = float(os.environ.get('SHARD_DIRECTORY_TTL_SECONDS', 2))
+    SHARD_FAN_OUT_WORKERS = int(os.environ.get('SHARD_FAN_OUT_WORKERS', 8))
+    SHARD_MOVE_BATCH_SIZE = int(os.environ.get('SHARD_MOVE_BATCH_SIZE', 1000))
+    # PostgreSQL shards hand out ids in steps of SHARD_ID_STRIDE (set by `flask shards init`),
+    # so rows keep their id when their user moves shard
+    SHARD_ID_STRIDE = int(os.environ.get('SHARD_ID_STRIDE', 64))
+
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_ECHO = True
@@ -30,11 +135,20 @@ class ProductionConfig(Config):
 
 class TestConfig(Config):
     TESTING = True
+    RECURRING_SCHEDULER_ENABLED = False
+    PARTITION_MAINTENANCE_ENABLED = False
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SHARD_DATABASE_URLS = []
+
+class BenchmarkConfig(Config):
+    TESTING = True
+    SQLALCHEMY_RECORD_QUERIES = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get('BENCHMARK_DATABASE_URL', 'sqlite:///benchmark.db')
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestConfig,
-    'default': DevelopmentConfig
+    'benchmark': BenchmarkConfig,
+    'default': ProductionConfig
 }
\ No newline at end of file
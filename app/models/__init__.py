@@ -3,5 +3,8 @@ from app.models.user import User
 from app.models.role import Category
 from app.models.expense import Expense
 from app.models.budget import Budget
+from app.models.data_version import UserDataVersion
+from app.models.user_directory import UserDirectory
+from app.models.token_revocation import TokenRevocation
 
-__all__ = ['BaseModel', 'User', 'Category', 'Expense', 'Budget']
\ No newline at end of file
+__all__ = ['BaseModel', 'User', 'Category', 'Expense', 'Budget', 'UserDataVersion', 'UserDirectory', 'TokenRevocation']
\ No newline at end of file
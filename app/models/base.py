@@ -1,5 +1,9 @@
 from datetime import datetime, timezone
+from sqlalchemy import inspect
+from sqlalchemy.orm import aliased, contains_eager
 from app.config.extensions import db
+from app.models.data_version import bump_session_versions, owner_scope
+from app.utils.money import from_cents, to_cents
 
 class BaseModel(db.Model):
     __abstract__ = True
@@ -9,6 +13,13 @@ class BaseModel(db.Model):
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
 
     def save(self):
+        from app.services.group_commit import get_group_commit_writer
+        writer = get_group_commit_writer()
+        if writer is not None and writer.accepts(self):
+            # Committed together with other requests' inserts, then attached to this session
+            writer.submit(self)
+            db.session.add(self)
+            return self
         db.session.add(self)
         db.session.commit()
         return self
@@ -18,4 +29,121 @@ class BaseModel(db.Model):
         db.session.commit()
 
     def to_dict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
\ No newline at end of file
+        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+    # Single-statement writes. They leave the commit to the caller (see
+    # app.utils.unit_of_work.transactional) and let the foreign keys and unique
+    # indexes reject bad rows instead of checking first (see app.utils.integrity).
+
+    def insert_returning(self, related=(), columns=()):
+        """INSERT this new object and return the written row as ``(obj, *columns)``.
+
+        ``related`` many-to-one relationships (e.g. ``Expense.user``) come back
+        loaded, and ``columns`` are callables giving extra expressions over the
+        row entity (e.g. ``Budget.spent_cents_column``); see ``_write_returning``.
+        """
+        from app.services.group_commit import get_group_commit_writer
+        cls = type(self)
+        writer = get_group_commit_writer()
+        if writer is not None and writer.accepts(self):
+            writer.submit(self)
+            db.session.add(self)
+            if not (related or columns):
+                return (self,)
+            return db.session.execute(cls._select_written(cls, related, columns).where(cls.id == self.id)).first()
+
+        table = cls.__table__
+        state = inspect(self)
+        # Like a flush: a None left on a column with a default means the default
+        values = {
+            column.key: state.dict[column.key] for column in table.c
+            if column.key in state.dict
+            and not (state.dict[column.key] is None and (column.default is not None or column.server_default is not None))
+        }
+        return cls._write_returning(table.insert().values(**values), related, columns)
+
+    @classmethod
+    def update_returning(cls, id, values, *criteria, related=(), columns=()):
+        """UPDATE row ``id`` (if it also matches ``criteria``) and return it like ``insert_returning``,
+        or None when no row matched."""
+        table = cls.__table__
+        row = None
+        if values:
+            # Like a flush, a row the values don't change isn't written and keeps its data version
+            changed = db.or_(*(table.c[key].is_distinct_from(value) for key, value in values.items()))
+            row = cls._write_returning(
+                table.update().where(table.c.id == id, changed, *criteria).values(**values), related, columns,
+            )
+        if row is None:
+            row = db.session.execute(
+                cls._select_written(cls, related, columns).where(cls.id == id, *criteria)
+            ).first()
+        return row
+
+    @classmethod
+    def delete_returning(cls, *criteria):
+        """DELETE the rows matching ``criteria``; returns them (empty when none matched)."""
+        session = db.session
+        table = cls.__table__
+        rows = session.execute(table.delete().where(*criteria).returning(*table.c)).all()
+        if rows:
+            cls._statement_written(session, rows, deleted=True)
+        return rows
+
+    @classmethod
+    def _select_written(cls, entity, related, columns):
+        query = db.select(entity, *(column(entity) for column in columns))
+        for relationship in related:
+            prop = relationship.property
+            (local, remote), = prop.local_remote_pairs
+            target = prop.mapper.class_
+            query = query.outerjoin(target, remote == getattr(entity, local.key)).options(
+                contains_eager(getattr(entity, prop.key))
+            )
+        return query
+
+    @classmethod
+    def _write_returning(cls, statement, related, columns):
+        session = db.session
+        table = cls.__table__
+        if not (related or columns):
+            query = db.select(cls).from_statement(statement.returning(*table.c))
+        elif session.get_bind().dialect.name == 'postgresql':
+            # The write is a CTE of the SELECT that joins the related rows: one round trip
+            entity = aliased(cls, statement.returning(*table.c).cte('written'))
+            query = cls._select_written(entity, related, columns)
+        else:
+            # Other databases can't read a data-modifying CTE back; a SELECT by id follows
+            written_id = session.execute(statement.returning(table.c.id)).scalar()
+            if written_id is None:
+                return None
+            query = cls._select_written(cls, related, columns).where(cls.id == written_id)
+        row = session.execute(query.execution_options(populate_existing=True)).first()
+        if row is not None:
+            cls._statement_written(session, [row[0]])
+        return row
+
+    @classmethod
+    def _statement_written(cls, session, rows, deleted=False):
+        # What the flush hooks would have done for these rows
+        if 'user_id' in cls.__table__.c:
+            bump_session_versions(session, {owner_scope(row) for row in rows})
+        elif cls.__tablename__ == 'users':
+            bump_session_versions(session, {row.id for row in rows})
+
+
+def sync_amount_columns(obj, key, value):
+    """Keep ``amount`` and ``amount_cents`` equal whichever one is assigned."""
+    if value is None or obj.__dict__.get('_syncing_amount'):
+        return value
+    obj._syncing_amount = True
+    try:
+        if key == 'amount':
+            cents = to_cents(value)
+            obj.amount_cents = cents
+            return from_cents(cents)
+        cents = int(value)
+        obj.amount = from_cents(cents)
+        return cents
+    finally:
+        obj._syncing_amount = False
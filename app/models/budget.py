@@ -1,60 +1,81 @@
 from datetime import datetime, timezone
+from sqlalchemy.orm import validates
 from app.config.extensions import db
-from app.models.base import BaseModel
+from app.models.base import BaseModel, sync_amount_columns
+from app.utils.money import amount_fields, requested_amount_format
 
 class Budget(BaseModel):
     __tablename__ = 'budgets'
 
     name = db.Column(db.String(100), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)
     period = db.Column(db.String(20), nullable=False)
     start_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     end_date = db.Column(db.DateTime)
     alert_threshold = db.Column(db.Integer, default=80)
     is_active = db.Column(db.Boolean, default=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
 
     user = db.relationship('User', back_populates='budgets')
     category = db.relationship('Category')
 
-    def get_spent_amount(self):
+    @validates('amount', 'amount_cents')
+    def _sync_amount(self, key, value):
+        return sync_amount_columns(self, key, value)
+
+    def spent_cents_query(self):
         from app.models.expense import Expense
-        query = Expense.query.filter(
-            Expense.user_id == self.user_id,
-            Expense.expense_date >= self.start_date
+        return Expense.apply_filters(
+            db.session.query(db.func.sum(Expense.amount_cents)),
+            user_id=self.user_id,
+            category_id=self.category_id,
+            start_date=self.start_date,
+            end_date=self.end_date,
         )
-        if self.end_date:
-            query = query.filter(Expense.expense_date <= self.end_date)
-        if self.category_id:
-            query = query.filter(Expense.category_id == self.category_id)
 
-        total = db.session.query(db.func.sum(Expense.amount)).filter(
-            Expense.user_id == self.user_id,
-            Expense.expense_date >= self.start_date
+    @classmethod
+    def spent_cents_column(cls, budget=None):
+        """Correlated subquery of each budget's spending, for listing many budgets in one query.
+
+        ``budget`` is the entity to correlate with, when it is an alias of ``Budget``.
+        """
+        from app.models.expense import Expense
+        budget = cls if budget is None else budget
+        return db.select(db.func.coalesce(db.func.sum(Expense.amount_cents), 0)).where(
+            Expense.user_id == budget.user_id,
+            db.or_(budget.category_id.is_(None), Expense.category_id == budget.category_id),
+            Expense.expense_date >= budget.start_date,
+            db.or_(budget.end_date.is_(None), Expense.expense_date <= budget.end_date),
+        ).correlate(budget).scalar_subquery()
+
+    def get_spent_cents(self):
+        from app.services.shared_cache import cached
+        return cached(
+            'budget_spend', (self.id,), lambda: int(self.spent_cents_query().scalar() or 0), scopes={self.user_id}
         )
-        if self.end_date:
-            total = total.filter(Expense.expense_date <= self.end_date)
-        if self.category_id:
-            total = total.filter(Expense.category_id == self.category_id)
 
-        result = total.scalar()
-        return float(result) if result else 0.0
+    def get_spent_amount(self):
+        return self.get_spent_cents() / 100
 
     def get_remaining_amount(self):
-        return float(self.amount) - self.get_spent_amount()
+        return (self.amount_cents - self.get_spent_cents()) / 100
 
-    def get_usage_percentage(self):
-        if self.amount == 0:
+    def get_usage_percentage(self, spent_cents=None):
+        if not self.amount_cents:
             return 0
-        return (self.get_spent_amount() / float(self.amount)) * 100
+        spent_cents = self.get_spent_cents() if spent_cents is None else spent_cents
+        return spent_cents / self.amount_cents * 100
 
-    def to_dict(self, include_relations=False):
+    def to_dict(self, include_relations=False, amount_format=None):
+        amount_format = amount_format or requested_amount_format()
+        spent_cents = self.get_spent_cents()
         data = {
             'id': self.id,
             'name': self.name,
-            'amount': float(self.amount) if self.amount else 0,
+            **amount_fields(amount_format, amount=self.amount_cents),
             'period': self.period,
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'end_date': self.end_date.isoformat() if self.end_date else None,
@@ -62,9 +83,12 @@ class Budget(BaseModel):
             'is_active': self.is_active,
             'user_id': self.user_id,
             'category_id': self.category_id,
-            'spent_amount': self.get_spent_amount(),
-            'remaining_amount': self.get_remaining_amount(),
-            'usage_percentage': round(self.get_usage_percentage(), 2),
+            **amount_fields(
+                amount_format,
+                spent_amount=spent_cents,
+                remaining_amount=self.amount_cents - spent_cents,
+            ),
+            'usage_percentage': round(self.get_usage_percentage(spent_cents), 2),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
@@ -0,0 +1,114 @@
+from collections import Counter
+from datetime import datetime, timezone
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from app.config.extensions import db
+
+# Row holding the version of data shared by everyone (default categories)
+SHARED_SCOPE = 0
+
+class UserDataVersion(db.Model):
+    __tablename__ = 'user_data_versions'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    @classmethod
+    def bump(cls, user_ids, connection=None):
+        """Increment the data version of every user in ``user_ids``."""
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return
+        if connection is None:
+            executor, dialect = db.session, db.session.get_bind().dialect.name
+        else:
+            executor, dialect = connection, connection.dialect.name
+        # Read back by the shared cache when the transaction commits
+        (connection or db.session.connection()).info.setdefault('bumped_versions', set()).update(user_ids)
+        now = datetime.now(timezone.utc)
+        rows = [{'user_id': user_id, 'version': 1, 'updated_at': now} for user_id in user_ids]
+
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(cls.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[cls.__table__.c.user_id],
+                set_={'version': cls.__table__.c.version + 1, 'updated_at': stmt.excluded.updated_at},
+            )
+            executor.execute(stmt, rows)
+            return
+
+        table = cls.__table__
+        for row in rows:
+            result = executor.execute(
+                table.update()
+                .where(table.c.user_id == row['user_id'])
+                .values(version=table.c.version + 1, updated_at=now)
+            )
+            if result.rowcount == 0:
+                executor.execute(table.insert().values(**row))
+
+    @classmethod
+    def select_many(cls, user_ids):
+        return db.select(cls.user_id, cls.version, cls.updated_at).where(cls.user_id.in_(set(user_ids)))
+
+    @staticmethod
+    def versions_by_user(user_ids, rows):
+        """Map (user_id, version, updated_at) rows to {user_id: (version, updated_at)}, missing -> version 0."""
+        found = {user_id: (version, updated_at) for user_id, version, updated_at in rows}
+        return {user_id: found.get(user_id, (0, None)) for user_id in set(user_ids)}
+
+    @classmethod
+    def get_many(cls, user_ids):
+        """Return {user_id: (version, updated_at)} for the given users (missing -> version 0)."""
+        return cls.versions_by_user(user_ids, db.session.execute(cls.select_many(user_ids)))
+
+    def __repr__(self):
+        return f'<UserDataVersion {self.user_id} v{self.version}>'
+
+
+def owner_scope(obj):
+    return obj.user_id if obj.user_id is not None else SHARED_SCOPE
+
+
+@event.listens_for(Session, 'before_flush')
+def bump_versions_before_flush(session, flush_context, instances):
+    from app.models.budget import Budget
+    from app.models.expense import Expense
+    from app.models.role import Category
+    from app.models.user import User
+
+    user_ids = {
+        owner_scope(obj)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, (Expense, Budget, Category))
+        and (obj not in session.dirty or session.is_modified(obj))
+    }
+    # Expense and budget bodies embed their owner, so a changed user changes them too;
+    # a deleted user's rows go through ON DELETE CASCADE, not the session
+    user_ids.update(
+        obj.id for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+        and (obj not in session.dirty or session.is_modified(obj))
+    )
+    bump_session_versions(session, user_ids)
+
+
+def bump_session_versions(session, user_ids):
+    """Bump ``user_ids`` in ``session``'s transaction, as a flush of their rows does."""
+    if not user_ids:
+        return
+    # On the session's own connection, which need not be the scoped db.session
+    UserDataVersion.bump(user_ids, connection=session.connection())
+    # Lets in-process caches tell their own commits from other writers'
+    session.info.setdefault('bumped_versions', Counter()).update(user_ids)
+
+
+@event.listens_for(Session, 'after_transaction_create')
+def reset_bumped_versions(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('bumped_versions', None)
\ No newline at end of file
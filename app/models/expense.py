@@ -1,11 +1,15 @@
 from datetime import datetime, timezone
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import validates
 from app.config.extensions import db
-from app.models.base import BaseModel
+from app.models.base import BaseModel, sync_amount_columns
+from app.utils.money import amount_fields, requested_amount_format
 
 class Expense(BaseModel):
     __tablename__ = 'expenses'
 
     amount = db.Column(db.Numeric(10, 2), nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)
     description = db.Column(db.String(200), nullable=False)
     notes = db.Column(db.Text)
     expense_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
@@ -13,17 +17,58 @@ class Expense(BaseModel):
     receipt_url = db.Column(db.String(255))
     is_recurring = db.Column(db.Boolean, default=False)
     recurring_frequency = db.Column(db.String(20))
+    # Set on instances generated from a recurring template (the template has is_recurring=True)
+    recurring_parent_id = db.Column(db.Integer)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
 
     user = db.relationship('User', back_populates='expenses')
     category = db.relationship('Category', back_populates='expenses')
 
-    def to_dict(self, include_relations=False):
+    __table_args__ = (
+        # Budget spending sums amount_cents per user, category and date range from the index alone
+        db.Index(
+            'ix_expenses_user_id_category_id_expense_date', 'user_id', 'category_id', 'expense_date',
+            postgresql_include=['amount_cents'],
+        ),
+        # One instance per template and occurrence; makes materialization idempotent
+        db.Index('uq_expenses_recurring_parent_id_expense_date', 'recurring_parent_id', 'expense_date', unique=True),
+        db.Index(
+            'ix_expenses_recurring_templates', 'updated_at',
+            postgresql_where=db.text('is_recurring AND recurring_parent_id IS NULL'),
+            sqlite_where=db.text('is_recurring AND recurring_parent_id IS NULL'),
+        ),
+    )
+
+    @validates('amount', 'amount_cents')
+    def _sync_amount(self, key, value):
+        return sync_amount_columns(self, key, value)
+
+    @classmethod
+    def apply_filters(cls, query, user_id=None, category_id=None, start_date=None, end_date=None, expense_ids=None):
+        if expense_ids:
+            query = query.filter(cls.id.in_(expense_ids))
+        if user_id:
+            query = query.filter(cls.user_id == user_id)
+        if category_id:
+            query = query.filter(cls.category_id == category_id)
+        if start_date:
+            query = query.filter(cls.expense_date >= start_date)
+        if end_date:
+            query = query.filter(cls.expense_date <= end_date)
+        return query
+
+    @classmethod
+    def _statement_written(cls, session, rows, deleted=False):
+        from app.services.expense_cache import record_expense_writes
+        super()._statement_written(session, rows, deleted)
+        record_expense_writes(session, rows, deleted)
+
+    def to_dict(self, include_relations=False, amount_format=None):
         data = {
             'id': self.id,
-            'amount': float(self.amount) if self.amount else 0,
+            **amount_fields(amount_format or requested_amount_format(), amount=self.amount_cents),
             'description': self.description,
             'notes': self.notes,
             'expense_date': self.expense_date.isoformat() if self.expense_date else None,
@@ -31,6 +76,7 @@ class Expense(BaseModel):
             'receipt_url': self.receipt_url,
             'is_recurring': self.is_recurring,
             'recurring_frequency': self.recurring_frequency,
+            'recurring_parent_id': self.recurring_parent_id,
             'user_id': self.user_id,
             'category_id': self.category_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -42,4 +88,26 @@ class Expense(BaseModel):
         return data
 
     def __repr__(self):
-        return f'<Expense {self.description} - ${self.amount}>'
\ No newline at end of file
+        return f'<Expense {self.description} - ${self.amount}>'
+
+
+# SQLite full-text search: an external-content FTS5 table kept in sync by
+# triggers. PostgreSQL uses the generated ``search_vector`` column instead
+# (see the add_expense_search migration); neither is mapped on the model.
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5("
+    "description, notes, content='expenses', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_ai AFTER INSERT ON expenses BEGIN "
+    "INSERT INTO expenses_fts(rowid, description, notes) VALUES (new.id, new.description, new.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_ad AFTER DELETE ON expenses BEGIN "
+    "INSERT INTO expenses_fts(expenses_fts, rowid, description, notes) "
+    "VALUES ('delete', old.id, old.description, old.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_au AFTER UPDATE OF description, notes ON expenses BEGIN "
+    "INSERT INTO expenses_fts(expenses_fts, rowid, description, notes) "
+    "VALUES ('delete', old.id, old.description, old.notes); "
+    "INSERT INTO expenses_fts(rowid, description, notes) VALUES (new.id, new.description, new.notes); END",
+]
+
+for statement in SQLITE_FTS_DDL:
+    event.listen(Expense.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Expense.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS expenses_fts').execute_if(dialect='sqlite'))
\ No newline at end of file
@@ -9,7 +9,7 @@ class Category(BaseModel):
     icon = db.Column(db.String(50))
     color = db.Column(db.String(7))
     is_default = db.Column(db.Boolean, default=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
 
     user = db.relationship('User', back_populates='categories')
     expenses = db.relationship('Expense', back_populates='category', lazy='dynamic')
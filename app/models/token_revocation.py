@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+from app.config.extensions import db
+
+class TokenRevocation(db.Model):
+    """A revoked access token (``jti``), or every token of a user issued before ``revoked_at``.
+
+    Lives in the main database only. Rows are useless once ``expires_at`` has
+    passed, as the tokens they revoke have expired by then.
+    """
+    __tablename__ = 'token_revocations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(32))
+    user_id = db.Column(db.Integer)
+    revoked_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<TokenRevocation {self.jti or f"user {self.user_id}"}>'
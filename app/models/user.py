@@ -12,9 +12,9 @@ class User(BaseModel):
     last_name = db.Column(db.String(50))
     is_active = db.Column(db.Boolean, default=True, nullable=False)
 
-    expenses = db.relationship('Expense', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
-    budgets = db.relationship('Budget', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
-    categories = db.relationship('Category', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
+    expenses = db.relationship('Expense', back_populates='user', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
+    budgets = db.relationship('Budget', back_populates='user', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
+    categories = db.relationship('Category', back_populates='user', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+from app.config.extensions import db
+
+class UserDirectory(db.Model):
+    """Which shard holds each user's data (see app.services.sharding).
+
+    Lives in the main database only. Its sequence hands out user ids and its
+    unique indexes keep emails and usernames unique across every shard.
+    """
+    __tablename__ = 'user_directory'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    shard = db.Column(db.String(32), nullable=False, index=True)
+    # Set while the user is being moved to another shard; their writes are refused meanwhile
+    moving_to = db.Column(db.String(32))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    def __repr__(self):
+        return f'<UserDirectory {self.user_id} on {self.shard}>'
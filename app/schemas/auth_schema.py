@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field, ConfigDict
+from app.schemas.user_schema import UserResponseSchema
+
+
+class LoginSchema(BaseModel):
+    login: str = Field(
+        ...,
+        min_length=1,
+        max_length=120,
+        description="Email address or username",
+        examples=["john@example.com", "john_doe"]
+    )
+    password: str = Field(..., min_length=1, max_length=100, description="User password")
+
+    model_config = ConfigDict(
+        str_strip_whitespace=True,
+        json_schema_extra={
+            "example": {
+                "login": "john@example.com",
+                "password": "secure123"
+            }
+        }
+    )
+
+
+class TokenResponseSchema(BaseModel):
+    access_token: str
+    token_type: str = 'Bearer'
+    expires_in: int
+    user: UserResponseSchema
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Any, Literal, Optional
+
+
+class BatchItemSchema(BaseModel):
+    method: Literal['GET', 'POST', 'PUT', 'PATCH', 'DELETE'] = Field('GET', description="HTTP method")
+    path: str = Field(
+        ...,
+        pattern=r'^/api/',
+        max_length=2000,
+        description="API path including the query string",
+        examples=["/api/expenses/?user_id=1"]
+    )
+    body: Optional[Any] = Field(None, description="JSON body for POST/PUT/PATCH")
+    headers: dict[str, str] = Field(
+        default_factory=dict,
+        description="Extra request headers, e.g. If-None-Match",
+    )
+
+
+class BatchRequestSchema(BaseModel):
+    requests: list[BatchItemSchema] = Field(..., min_length=1, description="Sub-requests, run in order")
+    atomic: bool = Field(
+        False,
+        description="Run all sub-requests in one transaction: commit only if every one succeeds",
+    )
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "requests": [
+                    {"method": "GET", "path": "/api/users/1"},
+                    {"method": "GET", "path": "/api/categories/?user_id=1"},
+                    {"method": "GET", "path": "/api/budgets/?user_id=1"},
+                    {"method": "GET", "path": "/api/expenses/?user_id=1&start_date=2024-01-01"}
+                ]
+            }
+        }
+    )
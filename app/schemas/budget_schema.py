@@ -1,7 +1,10 @@
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
 from typing import Optional, Literal
 from datetime import datetime
 from decimal import Decimal
+from app.schemas.category_schema import CategoryResponseSchema
+from app.schemas.user_schema import UserResponseSchema
+from app.utils.money import resolve_cents
 
 BudgetPeriod = Literal['daily', 'weekly', 'monthly', 'yearly']
 
@@ -13,13 +16,20 @@ class BudgetCreateSchema(BaseModel):
         description="Budget name",
         examples=["Monthly Food Budget", "Weekly Transport"]
     )
-    amount: Decimal = Field(
-        ...,
+    amount: Optional[Decimal] = Field(
+        None,
         gt=0,
         decimal_places=2,
         description="Budget limit amount",
         examples=[500.00, 1000.00]
     )
+    amount_cents: Optional[int] = Field(
+        None,
+        gt=0,
+        le=999_999_999,
+        description="Amount in integer cents (alternative to amount)",
+        examples=[50000]
+    )
     period: BudgetPeriod = Field(
         ...,
         description="Budget period",
@@ -79,10 +89,16 @@ class BudgetCreateSchema(BaseModel):
             raise ValueError('End date must be after start date')
         return v
 
+    @model_validator(mode='after')
+    def validate_amount_cents(self) -> 'BudgetCreateSchema':
+        self.amount_cents = resolve_cents(self.amount, self.amount_cents)
+        return self
+
 
 class BudgetUpdateSchema(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
     amount: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
+    amount_cents: Optional[int] = Field(None, gt=0, le=999_999_999)
     period: Optional[BudgetPeriod] = None
     end_date: Optional[datetime] = None
     alert_threshold: Optional[int] = Field(None, ge=1, le=100)
@@ -110,22 +126,71 @@ class BudgetUpdateSchema(BaseModel):
             raise ValueError('Amount must be greater than 0')
         return round(v, 2) if v else v
 
+    @model_validator(mode='after')
+    def validate_amount_cents(self) -> 'BudgetUpdateSchema':
+        self.amount_cents = resolve_cents(self.amount, self.amount_cents, required=False)
+        return self
 
-class BudgetResponseSchema(BaseModel):
+
+def budget_response_data(budget, spent_cents, fields):
+    """Values of ``fields`` for a Budget, with its spending derived from ``spent_cents``."""
+    spending = {
+        'spent_amount': spent_cents / 100,
+        'spent_amount_cents': spent_cents,
+        'remaining_amount': (budget.amount_cents - spent_cents) / 100,
+        'remaining_amount_cents': budget.amount_cents - spent_cents,
+        'usage_percentage': round(budget.get_usage_percentage(spent_cents), 2),
+    }
+    return {**{name: getattr(budget, name) for name in fields if name not in spending}, **spending}
+
+
+class _BudgetResponseFields(BaseModel):
     id: int
     name: str
-    amount: Decimal
     period: str
     start_date: datetime
     end_date: Optional[datetime] = None
-    alert_threshold: int
-    is_active: bool
+    alert_threshold: Optional[int] = None
+    is_active: Optional[bool] = None
     user_id: int
     category_id: Optional[int] = None
+    usage_percentage: float
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @model_validator(mode='before')
+    @classmethod
+    def with_spending(cls, data):
+        """Read a Budget's columns and compute its spending with a single query."""
+        if not hasattr(data, 'get_spent_cents'):
+            return data
+        return budget_response_data(data, data.get_spent_cents(), cls.model_fields)
+
+
+class BudgetResponseSchema(_BudgetResponseFields):
+    amount: float
     spent_amount: float
     remaining_amount: float
-    usage_percentage: float
-    created_at: str
-    updated_at: str
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+
+class BudgetCentsResponseSchema(_BudgetResponseFields):
+    amount_cents: int
+    spent_amount_cents: int
+    remaining_amount_cents: int
+
+
+class BudgetDetailResponseSchema(BudgetResponseSchema):
+    user: Optional[UserResponseSchema] = None
+    category: Optional[CategoryResponseSchema] = None
+
+
+class BudgetCentsDetailResponseSchema(BudgetCentsResponseSchema):
+    user: Optional[UserResponseSchema] = None
+    category: Optional[CategoryResponseSchema] = None
+
+
+# Response schema for each ``amount_format``
+BUDGET_RESPONSE_SCHEMAS = {'decimal': BudgetResponseSchema, 'cents': BudgetCentsResponseSchema}
+BUDGET_DETAIL_RESPONSE_SCHEMAS = {'decimal': BudgetDetailResponseSchema, 'cents': BudgetCentsDetailResponseSchema}
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, field_validator, ConfigDict
 from typing import Optional
+from datetime import datetime
 import re
 
 class CategoryCreateSchema(BaseModel):
@@ -87,7 +88,7 @@ class CategoryResponseSchema(BaseModel):
     color: Optional[str] = None
     is_default: bool
     user_id: Optional[int] = None
-    created_at: str
-    updated_at: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
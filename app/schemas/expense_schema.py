@@ -1,18 +1,29 @@
-from pydantic import BaseModel, Field, field_validator, HttpUrl, ConfigDict
+from pydantic import BaseModel, Field, field_validator, model_validator, HttpUrl, ConfigDict
 from typing import Optional, Literal
 from datetime import datetime
 from decimal import Decimal
+from app.schemas.category_schema import CategoryResponseSchema
+from app.schemas.user_schema import UserResponseSchema
+from app.utils.money import resolve_cents
 
 PaymentMethod = Literal['cash', 'credit_card', 'debit_card', 'bank_transfer', 'digital_wallet', 'other']
+RecurringFrequency = Literal['daily', 'weekly', 'monthly', 'yearly']
 
 class ExpenseCreateSchema(BaseModel):
-    amount: Decimal = Field(
-        ...,
+    amount: Optional[Decimal] = Field(
+        None,
         gt=0,
         decimal_places=2,
         description="Expense amount (must be positive)",
         examples=[50.00, 123.45]
     )
+    amount_cents: Optional[int] = Field(
+        None,
+        gt=0,
+        le=99_999_999,
+        description="Amount in integer cents (alternative to amount)",
+        examples=[5000]
+    )
     description: str = Field(
         ...,
         min_length=1,
@@ -48,6 +59,15 @@ class ExpenseCreateSchema(BaseModel):
         description="Category ID for this expense",
         examples=[1, 5]
     )
+    is_recurring: bool = Field(
+        False,
+        description="Repeat this expense; instances are generated on each occurrence after expense_date"
+    )
+    recurring_frequency: Optional[RecurringFrequency] = Field(
+        None,
+        description="How often a recurring expense repeats",
+        examples=["monthly"]
+    )
 
     model_config = ConfigDict(
         str_strip_whitespace=True,
@@ -79,15 +99,29 @@ class ExpenseCreateSchema(BaseModel):
             raise ValueError('Expense date cannot be in the future')
         return v
 
+    @model_validator(mode='after')
+    def validate_recurring(self) -> 'ExpenseCreateSchema':
+        if self.is_recurring and not self.recurring_frequency:
+            raise ValueError('recurring_frequency is required for recurring expenses')
+        return self
+
+    @model_validator(mode='after')
+    def validate_amount_cents(self) -> 'ExpenseCreateSchema':
+        self.amount_cents = resolve_cents(self.amount, self.amount_cents)
+        return self
+
 
 class ExpenseUpdateSchema(BaseModel):
     amount: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
+    amount_cents: Optional[int] = Field(None, gt=0, le=99_999_999)
     description: Optional[str] = Field(None, min_length=1, max_length=200)
     notes: Optional[str] = Field(None, max_length=1000)
     expense_date: Optional[datetime] = None
     payment_method: Optional[PaymentMethod] = None
     receipt_url: Optional[str] = Field(None, max_length=500)
     category_id: Optional[int] = Field(None, gt=0)
+    is_recurring: Optional[bool] = None
+    recurring_frequency: Optional[RecurringFrequency] = None
 
     model_config = ConfigDict(
         str_strip_whitespace=True,
@@ -106,18 +140,73 @@ class ExpenseUpdateSchema(BaseModel):
             raise ValueError('Amount must be greater than 0')
         return round(v, 2) if v else v
 
+    @model_validator(mode='after')
+    def validate_amount_cents(self) -> 'ExpenseUpdateSchema':
+        self.amount_cents = resolve_cents(self.amount, self.amount_cents, required=False)
+        return self
+
+
+class ExpenseBulkUpdateSchema(BaseModel):
+    """Values set on every expense matched by ``PATCH /api/expenses/``."""
+    amount: Optional[Decimal] = Field(None, gt=0, decimal_places=2)
+    amount_cents: Optional[int] = Field(None, gt=0, le=99_999_999)
+    description: Optional[str] = Field(None, min_length=1, max_length=200)
+    notes: Optional[str] = Field(None, max_length=1000)
+    payment_method: Optional[PaymentMethod] = None
+    receipt_url: Optional[str] = Field(None, max_length=500)
+    category_id: Optional[int] = Field(None, gt=0)
+
+    model_config = ConfigDict(
+        str_strip_whitespace=True,
+        json_schema_extra={
+            "example": {
+                "category_id": 4
+            }
+        }
+    )
+
+    @model_validator(mode='after')
+    def validate_amount_cents(self) -> 'ExpenseBulkUpdateSchema':
+        self.amount_cents = resolve_cents(self.amount, self.amount_cents, required=False)
+        return self
 
-class ExpenseResponseSchema(BaseModel):
+
+class _ExpenseResponseFields(BaseModel):
     id: int
-    amount: Decimal
     description: str
     notes: Optional[str] = None
     expense_date: datetime
     payment_method: Optional[str] = None
     receipt_url: Optional[str] = None
+    is_recurring: bool
+    recurring_frequency: Optional[str] = None
+    recurring_parent_id: Optional[int] = None
     user_id: int
     category_id: int
-    created_at: str
-    updated_at: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ExpenseResponseSchema(_ExpenseResponseFields):
+    amount: float
+
+
+class ExpenseCentsResponseSchema(_ExpenseResponseFields):
+    amount_cents: int
+
+
+class ExpenseDetailResponseSchema(ExpenseResponseSchema):
+    user: Optional[UserResponseSchema] = None
+    category: Optional[CategoryResponseSchema] = None
+
+
+class ExpenseCentsDetailResponseSchema(ExpenseCentsResponseSchema):
+    user: Optional[UserResponseSchema] = None
+    category: Optional[CategoryResponseSchema] = None
+
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+# Response schema for each ``amount_format``
+EXPENSE_RESPONSE_SCHEMAS = {'decimal': ExpenseResponseSchema, 'cents': ExpenseCentsResponseSchema}
+EXPENSE_DETAIL_RESPONSE_SCHEMAS = {'decimal': ExpenseDetailResponseSchema, 'cents': ExpenseCentsDetailResponseSchema}
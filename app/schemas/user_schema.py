@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator, ConfigDict
 from typing import Optional
+from datetime import datetime
 
 class UserCreateSchema(BaseModel):
     email: EmailStr = Field(
@@ -84,12 +85,12 @@ class UserUpdateSchema(BaseModel):
 
 class UserResponseSchema(BaseModel):
     id: int
-    email: EmailStr
+    email: str
     username: str
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     is_active: bool
-    created_at: str
-    updated_at: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
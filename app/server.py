@@ -0,0 +1,143 @@
+"""
+Production server: gunicorn workers forked from a preloaded app.
+
+    python -m app.server                      # FLASK_ENV (default production), SERVER_* settings
+    python -m app.server --bind 0.0.0.0:8000 --workers 8 --pid /run/expenses.pid
+
+The master process builds the app once (imports, numpy, schemas, the shared
+cache) and forks ``SERVER_WORKERS`` workers from it, one per available CPU
+core by default, each serving ``SERVER_THREADS`` requests at a time; the
+threads keep a core busy while one request waits on the database. Connection
+pools inherited from the master are discarded in every new worker so each
+opens its own, and background threads (the recurring scheduler) are started
+per worker, as threads don't survive a fork.
+
+Workers are replaced after ``SERVER_MAX_REQUESTS`` requests (plus up to
+``SERVER_MAX_REQUESTS_JITTER``, so they don't all restart together), after
+finishing the requests they hold. Signals to the master:
+
+- ``HUP``: replace every worker gracefully (same code, as it is preloaded).
+- ``USR2`` then ``TERM`` to the old master: deploy new code with no downtime.
+  The new master starts from the original command line on the same sockets;
+  the old one (its pid file renamed ``*.oldbin``) finishes its requests and exits.
+- ``TERM``: graceful shutdown, waiting up to ``SERVER_GRACEFUL_TIMEOUT``.
+"""
+import argparse
+import gc
+import logging
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+from app import create_app, start_background_tasks
+from app.config.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers():
+    """Workers for the CPU cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def server_options(app, **overrides):
+    """gunicorn settings from the app's ``SERVER_*`` config; ``overrides`` win when not None."""
+    config = app.config
+    options = {
+        'bind': config['SERVER_BIND'],
+        'workers': config['SERVER_WORKERS'] or default_workers(),
+        'worker_class': 'gthread',
+        'threads': config['SERVER_THREADS'],
+        'max_requests': config['SERVER_MAX_REQUESTS'],
+        'timeout': config['SERVER_TIMEOUT'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT'],
+        'keepalive': config['SERVER_KEEPALIVE'],
+        'pidfile': config['SERVER_PIDFILE'],
+        'accesslog': config['SERVER_ACCESS_LOG'],
+        'loglevel': config['SERVER_LOG_LEVEL'],
+        'preload_app': True,
+        'proc_name': 'expense-tracker',
+    }
+    if os.path.isdir('/dev/shm'):
+        # Worker heartbeats are file writes; keep them off a possibly slow disk
+        options['worker_tmp_dir'] = '/dev/shm'
+    options.update({key: value for key, value in overrides.items() if value is not None})
+    jitter = config['SERVER_MAX_REQUESTS_JITTER']
+    options['max_requests_jitter'] = options['max_requests'] // 10 if jitter is None else jitter
+    return options
+
+
+class PreforkServer(BaseApplication):
+    def __init__(self, app, options):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        for hook in ('on_starting', 'pre_fork', 'post_fork', 'worker_exit'):
+            self.cfg.set(hook, getattr(self, f'_{hook}'))
+
+    def load(self):
+        return self.application
+
+    # Hooks, run by gunicorn's arbiter (the master) and its workers
+
+    def _on_starting(self, server):
+        # USR2 re-executes the master; start it the way this one was started (python -m ...)
+        server.START_CTX['args'] = [sys.executable, *sys.orig_argv[1:]]
+        logger.info('Starting %s workers x %s threads on %s',
+                    self.cfg.workers, self.cfg.threads, ', '.join(self.cfg.bind))
+
+    def _pre_fork(self, server, worker):
+        # Objects the master already has are never collected, so workers keep sharing their pages
+        gc.freeze()
+
+    def _post_fork(self, server, worker):
+        with self.application.app_context():
+            for engine in db.engines.values():
+                # The master's connections belong to the master; open new ones on first use
+                engine.dispose(close=False)
+        start_background_tasks(self.application)
+
+    def _worker_exit(self, server, worker):
+        with self.application.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+def serve(app, **overrides):
+    """Serve ``app`` with forked workers until the master is stopped."""
+    PreforkServer(app, server_options(app, **overrides)).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.server', description='Run the API with forked workers.')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'production'),
+                        help='Config name (default: FLASK_ENV or production)')
+    parser.add_argument('--bind', action='append', help='Address to listen on (repeatable; default SERVER_BIND)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default SERVER_WORKERS, or one per core)')
+    parser.add_argument('--threads', type=int, help='Threads per worker (default SERVER_THREADS)')
+    parser.add_argument('--max-requests', type=int, help='Requests before a worker is replaced (0 = never)')
+    parser.add_argument('--timeout', type=int, help='Seconds a silent worker is given before it is killed')
+    parser.add_argument('--pid', help='Write the master pid to this file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=os.environ.get('SERVER_LOG_LEVEL', 'info').upper(),
+        format='%(asctime)s [%(process)d] [%(levelname)s] %(name)s: %(message)s',
+    )
+    app = create_app(args.config, start_background=False)
+    serve(
+        app, bind=args.bind, workers=args.workers, threads=args.threads, max_requests=args.max_requests,
+        timeout=args.timeout, pidfile=args.pid,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Signed, expiring bearer tokens.
+
+``POST /api/auth/login`` checks a user's password and returns an access token
+holding the user's id, active status, issue time and a random token id
+(``jti``), signed with ``SECRET_KEY`` by itsdangerous and valid for
+``AUTH_TOKEN_TTL_SECONDS``. Clients send it as ``Authorization: Bearer
+<token>``.
+
+A ``before_request`` hook verifies the token without the database: verified
+tokens are kept in an LRU of ``AUTH_TOKEN_CACHE_SIZE`` entries, and revoked
+ones are looked up in an in-memory denylist. Revocations (logout, a user
+deactivated or deleted) are also written to the ``token_revocations`` table of
+the main database, which every process re-reads for recent rows at most every
+``AUTH_DENYLIST_REFRESH_SECONDS``; entries are dropped once the tokens they
+revoke have expired.
+
+With a token the request acts for the token's user: a ``user_id`` query or URL
+argument naming anyone else is refused with a 403, handlers read the user with
+``current_user_id()`` and rows of other users are not found. Without one,
+``user_id`` comes from the query string as before, unless ``AUTH_REQUIRED``.
+"""
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import partial
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import delete, insert, select
+
+from app.config.extensions import db
+from app.models.token_revocation import TokenRevocation
+from app.utils.responses import error_response
+
+logger = logging.getLogger(__name__)
+
+# Reachable without a token when AUTH_REQUIRED is set
+PUBLIC_ENDPOINTS = {'api.auth.login', 'api.users.create_user', 'static'}
+PUBLIC_BLUEPRINTS = {'health'}
+
+Principal = namedtuple('Principal', 'user_id is_active jti issued_at expires_at')
+
+
+class TokenError(Exception):
+    pass
+
+
+def _utc(timestamp):
+    # The table's DateTime columns hold naive UTC
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def _timestamp(value):
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TokenDenylist:
+    def __init__(self, refresh_seconds=2, overlap_seconds=60):
+        self.refresh_seconds = refresh_seconds
+        self.overlap_seconds = overlap_seconds
+        self._tokens = {}       # jti -> expires at
+        self._users = {}        # user_id -> (tokens issued before this are revoked, expires at)
+        self._last_refresh = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, principal):
+        self._refresh_if_due()
+        if principal.jti in self._tokens:
+            return True
+        revoked = self._users.get(principal.user_id)
+        return revoked is not None and principal.issued_at <= revoked[0]
+
+    def revoke_token(self, principal):
+        self._write(jti=principal.jti, expires_at=principal.expires_at)
+
+    def revoke_user(self, user_id, ttl, in_transaction=False):
+        """Revoke every token issued to the user so far.
+
+        ``in_transaction`` ties the revocation to the request's write: it is
+        undone if that write rolls back.
+        """
+        self._write(user_id=user_id, expires_at=time.time() + ttl, in_transaction=in_transaction)
+
+    @staticmethod
+    @contextmanager
+    def _writes(in_transaction=False):
+        """A connection to the main database, and whether it is the request's own transaction."""
+        from app.services.sharding import DEFAULT_SHARD, current_shard
+        uow = db.session.info.get('unit_of_work') if has_app_context() else None
+        if uow is not None and uow.shard == DEFAULT_SHARD:
+            # Part of the atomic batch's transaction, which may already hold SQLite's write lock
+            yield uow.session.connection(), True
+            return
+        if in_transaction and uow is None and current_shard() == DEFAULT_SHARD:
+            # The request's transaction, which may hold SQLite's write lock for the rows it updated
+            yield db.session.connection(), True
+            return
+        with db.engines[None].begin() as connection:
+            yield connection, False
+
+    def _write(self, expires_at, jti=None, user_id=None, in_transaction=False):
+        now = time.time()
+        with self._writes(in_transaction) as (connection, joined):
+            connection.execute(delete(TokenRevocation).where(TokenRevocation.expires_at < _utc(now)))
+            (row_id,) = connection.execute(insert(TokenRevocation).values(
+                jti=jti, user_id=user_id, revoked_at=_utc(now), expires_at=_utc(expires_at),
+            )).inserted_primary_key
+        with self._lock:
+            previous = self._users.get(user_id)
+            self._add(jti, user_id, now, expires_at)
+        if joined or in_transaction:
+            from app.utils.unit_of_work import on_rollback
+            on_rollback(partial(self._undo, None if joined else row_id, jti, user_id, previous))
+
+    def _undo(self, row_id, jti, user_id, previous):
+        # The write this revocation belonged to rolled back; a joined row went with it
+        if row_id is not None:
+            with db.engines[None].begin() as connection:
+                connection.execute(delete(TokenRevocation).where(TokenRevocation.id == row_id))
+        with self._lock:
+            if jti is not None:
+                self._tokens.pop(jti, None)
+            if user_id is not None:
+                if previous is None:
+                    self._users.pop(user_id, None)
+                else:
+                    self._users[user_id] = previous
+
+    def _add(self, jti, user_id, revoked_at, expires_at):
+        if jti is not None:
+            self._tokens[jti] = expires_at
+        if user_id is not None:
+            previous = self._users.get(user_id)
+            if previous is None or previous[0] < revoked_at:
+                self._users[user_id] = (revoked_at, expires_at)
+
+    def _refresh_if_due(self):
+        now = time.time()
+        if now < self._next_refresh or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_refresh = now + self.refresh_seconds
+            query = select(
+                TokenRevocation.jti, TokenRevocation.user_id, TokenRevocation.revoked_at, TokenRevocation.expires_at,
+            ).where(TokenRevocation.expires_at >= _utc(now))
+            if self._last_refresh is not None:
+                # Ids and revoked_at are taken at insert but show at commit: a row can turn up behind
+                # ones already read, so the last overlap_seconds are read again (_add ignores repeats)
+                query = query.where(TokenRevocation.revoked_at >= _utc(self._last_refresh - self.overlap_seconds))
+            with db.engines[None].connect() as connection:
+                rows = connection.execute(query).all()
+            for jti, user_id, revoked_at, expires_at in rows:
+                self._add(jti, user_id, _timestamp(revoked_at), _timestamp(expires_at))
+            self._last_refresh = now
+            # Expired tokens are refused anyway
+            self._tokens = {jti: expires for jti, expires in self._tokens.items() if expires >= now}
+            self._users = {user_id: entry for user_id, entry in self._users.items() if entry[1] >= now}
+        except Exception:
+            # Keep answering from what is known; the next request tries again
+            logger.exception('Could not refresh the token denylist')
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        return len(self._tokens) + len(self._users)
+
+
+class TokenAuth:
+    def __init__(self, app):
+        self.ttl = app.config['AUTH_TOKEN_TTL_SECONDS']
+        self.cache_size = app.config['AUTH_TOKEN_CACHE_SIZE']
+        self.serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='access-token')
+        self.denylist = TokenDenylist(
+            app.config['AUTH_DENYLIST_REFRESH_SECONDS'], app.config['AUTH_DENYLIST_OVERLAP_SECONDS'],
+        )
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+
+    def issue(self, user):
+        """A new access token for ``user``."""
+        return self.serializer.dumps({
+            'sub': user.id,
+            'act': bool(user.is_active),
+            'iat': round(time.time(), 3),
+            'jti': secrets.token_hex(8),
+        })
+
+    def verify(self, token):
+        """The token's ``Principal``; raises TokenError for a bad, expired or revoked token."""
+        with self._lock:
+            principal = self._verified.get(token)
+            if principal is not None:
+                self._verified.move_to_end(token)
+        if principal is None:
+            try:
+                claims = self.serializer.loads(token, max_age=self.ttl)
+                principal = Principal(claims['sub'], claims['act'], claims['jti'], claims['iat'],
+                                      claims['iat'] + self.ttl)
+            except SignatureExpired:
+                raise TokenError("Token has expired")
+            except (BadSignature, KeyError, TypeError):
+                raise TokenError("Invalid token")
+            with self._lock:
+                self._verified[token] = principal
+                while len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+        if principal.expires_at <= time.time():
+            raise TokenError("Token has expired")
+        if self.denylist.is_revoked(principal):
+            raise TokenError("Token has been revoked")
+        return principal
+
+    def revoke_user(self, user_id, in_transaction=False):
+        self.denylist.revoke_user(user_id, self.ttl, in_transaction)
+
+
+def get_token_auth():
+    return current_app.extensions['token_auth']
+
+
+def current_principal():
+    """The verified token's ``Principal``, or None for a request without a token."""
+    return g.get('principal') if has_request_context() else None
+
+
+def current_user_id():
+    """The token's user, or the ``user_id`` query argument of a request without a token."""
+    principal = current_principal()
+    if principal is not None:
+        return principal.user_id
+    return request.args.get('user_id', type=int)
+
+
+def owned_rows(model):
+    """Criteria limiting ``model``'s rows to the token's user (none without a token)."""
+    principal = current_principal()
+    return (model.user_id == principal.user_id,) if principal is not None else ()
+
+
+def may_read(owner_id):
+    """Whether the request may see a row of ``owner_id`` (None for shared rows)."""
+    principal = current_principal()
+    return principal is None or owner_id is None or owner_id == principal.user_id
+
+
+def _unauthorized(message):
+    response, status_code = error_response(message, status_code=401)
+    response.headers['WWW-Authenticate'] = 'Bearer'
+    return response, status_code
+
+
+def _authenticate():
+    g.principal = None
+    header = request.headers.get('Authorization')
+    if not header:
+        if current_app.config['AUTH_REQUIRED'] and request.endpoint not in PUBLIC_ENDPOINTS \
+                and request.blueprint not in PUBLIC_BLUEPRINTS:
+            return _unauthorized("Authentication required")
+        return None
+
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return _unauthorized("Authorization must be a Bearer token")
+    try:
+        principal = get_token_auth().verify(token.strip())
+    except TokenError as e:
+        return _unauthorized(str(e))
+    if not principal.is_active:
+        return error_response("User is inactive", status_code=403)
+
+    claimed = (request.view_args or {}).get('user_id') or request.args.get('user_id', type=int)
+    if claimed is not None and claimed != principal.user_id:
+        return error_response("Token does not grant access to this user", status_code=403)
+    g.principal = principal
+
+
+def init_auth(app):
+    """Register token verification; call before ``init_sharding`` so routing sees the token's user."""
+    app.extensions['token_auth'] = TokenAuth(app)
+    app.before_request(_authenticate)
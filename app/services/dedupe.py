@@ -0,0 +1,169 @@
+"""
+Duplicate expense detection.
+
+Candidates are blocked by (user_id, amount in cents, date bucket) so only rows
+with the same amount within ``window_days`` of each other are ever compared.
+Within a block, descriptions are compared by the Jaccard similarity of their
+character trigram signatures. Matching pairs are merged into clusters with a
+union-find, so a whole scan is roughly linear in the number of expenses.
+"""
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from app.config.extensions import db
+from app.models.expense import Expense
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def signature(text):
+    """Character trigram set of the normalized text."""
+    normalized = f" {' '.join(_WORD.findall((text or '').lower()))} "
+    return frozenset(normalized[i:i + 3] for i in range(len(normalized) - 2))
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+class DuplicateDetector:
+    """Incremental blocking index; feed it expenses with ``add`` and read ``clusters``."""
+
+    def __init__(self, window_days=None, threshold=None):
+        config = current_app.config
+        self.window_days = window_days if window_days is not None else config.get('DEDUPE_WINDOW_DAYS', 3)
+        self.threshold = threshold if threshold is not None else config.get('DEDUPE_SIMILARITY_THRESHOLD', 0.6)
+        self._bucket_width = max(self.window_days, 1)
+        self._blocks = defaultdict(list)
+        self._parent = {}
+
+    def _find(self, key):
+        root = key
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[key] != root:
+            self._parent[key], key = root, self._parent[key]
+        return root
+
+    def _union(self, new, existing):
+        root_new, root_existing = self._find(new), self._find(existing)
+        if root_new != root_existing:
+            self._parent[root_new] = root_existing
+
+    def add(self, key, user_id, cents, day, description):
+        """Index one expense and return the keys of earlier entries it duplicates.
+
+        ``day`` is a date ordinal; ``key`` is any sortable identifier (expense id,
+        or a placeholder for rows that are not inserted yet).
+        """
+        sig = signature(description)
+        bucket = day // self._bucket_width
+        matches = []
+        for neighbour in (bucket - 1, bucket, bucket + 1):
+            for other_key, other_day, other_sig in self._blocks.get((user_id, cents, neighbour), ()):
+                if abs(other_day - day) <= self.window_days and similarity(sig, other_sig) >= self.threshold:
+                    matches.append(other_key)
+        self._parent.setdefault(key, key)
+        for other_key in matches:
+            self._union(key, other_key)
+        self._blocks[(user_id, cents, bucket)].append((key, day, sig))
+        return matches
+
+    def index(self, key, user_id, cents, day, description):
+        """Index one expense without comparing it to the others, for rows only matched against.
+
+        Indexed entries are not clustered with each other; later ``add`` calls
+        still compare against them.
+        """
+        self._parent.setdefault(key, key)
+        self._blocks[(user_id, cents, day // self._bucket_width)].append((key, day, signature(description)))
+
+    def clusters(self):
+        groups = defaultdict(list)
+        for key in self._parent:
+            groups[self._find(key)].append(key)
+        return sorted((sorted(keys) for keys in groups.values() if len(keys) > 1), key=lambda keys: keys[0])
+
+
+def _projected_rows(query):
+    return query.with_entities(Expense.id, Expense.user_id, Expense.amount_cents, Expense.expense_date, Expense.description)
+
+
+def find_duplicates_for_batch(user_id, rows, exclude_ids=(), window_days=None, threshold=None):
+    """Find existing (and in-batch) duplicates for a batch of new expenses.
+
+    ``rows`` are dicts with ``amount_cents``, ``expense_date`` and ``description``.
+    Issues a single query covering the batch's amounts and date span, then
+    matches in memory: existing rows are only indexed, so the work is the new
+    rows times their blocks. Returns one list per row: ids of existing expenses
+    plus ``('batch', index)`` markers for earlier rows of the same batch.
+    """
+    if not rows:
+        return []
+    detector = DuplicateDetector(window_days, threshold)
+    window = timedelta(days=detector.window_days)
+    cents = {row['amount_cents'] for row in rows}
+    dates = [row['expense_date'] for row in rows]
+
+    existing = _projected_rows(Expense.query).filter(
+        Expense.user_id == user_id,
+        Expense.amount_cents.in_(cents),
+        Expense.expense_date >= min(dates) - window,
+        Expense.expense_date <= max(dates) + window,
+    )
+    if exclude_ids:
+        existing = existing.filter(Expense.id.notin_(exclude_ids))
+    for expense_id, owner_id, amount_cents, expense_date, description in existing:
+        detector.index(expense_id, owner_id, amount_cents, expense_date.toordinal(), description)
+
+    return [
+        detector.add(('batch', index), user_id, row['amount_cents'],
+                     row['expense_date'].toordinal(), row['description'])
+        for index, row in enumerate(rows)
+    ]
+
+
+def find_duplicates(expense):
+    """Ids of existing expenses that look like duplicates of ``expense``."""
+    expense_date = expense.expense_date or datetime.now(timezone.utc).replace(tzinfo=None)
+    (matches,) = find_duplicates_for_batch(
+        expense.user_id,
+        [{'amount_cents': expense.amount_cents, 'expense_date': expense_date, 'description': expense.description}],
+        exclude_ids=[expense.id] if expense.id else (),
+    )
+    return matches
+
+
+def scan_user(user_id, window_days=None, threshold=None):
+    """Return duplicate clusters (lists of expense ids) for one user."""
+    detector = DuplicateDetector(window_days, threshold)
+    rows = _projected_rows(Expense.query).filter(Expense.user_id == user_id).order_by(Expense.expense_date)
+    for expense_id, owner_id, amount_cents, expense_date, description in rows.yield_per(10_000):
+        detector.add(expense_id, owner_id, amount_cents, expense_date.toordinal(), description)
+    return detector.clusters()
+
+
+def scan_all(window_days=None, threshold=None, batch_size=10_000):
+    """Yield (user_id, clusters) for every user, streaming one user at a time."""
+    detector, current_user = None, None
+    rows = _projected_rows(Expense.query).order_by(Expense.user_id, Expense.expense_date)
+    for expense_id, user_id, amount_cents, expense_date, description in db.session.execute(
+        rows.statement.execution_options(yield_per=batch_size)
+    ):
+        if user_id != current_user:
+            if detector is not None:
+                clusters = detector.clusters()
+                if clusters:
+                    yield current_user, clusters
+            detector, current_user = DuplicateDetector(window_days, threshold), user_id
+        detector.add(expense_id, user_id, amount_cents, expense_date.toordinal(), description)
+    if detector is not None:
+        clusters = detector.clusters()
+        if clusters:
+            yield current_user, clusters
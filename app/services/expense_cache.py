@@ -0,0 +1,238 @@
+"""
+In-process columnar cache of each user's expenses for analytics.
+
+A user's expenses are held as parallel NumPy arrays (id, amount in cents, day
+number, category id, payment method code) so dashboards can aggregate them
+with vectorized operations instead of re-scanning the database. Entries are
+loaded on first use, evicted least-recently-used under ``EXPENSE_CACHE_MAX_MB``
+and tagged with the user's data version:
+
+- commits in this process apply their expense changes to the cached arrays and
+  advance the entry's version by the number of bumps they made;
+- any other writer (another worker process, Core bulk writes) leaves the
+  stored version behind, and the entry is reloaded on its next use.
+
+Arrays are replaced rather than modified in place, so readers never need the lock.
+"""
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import get_args
+
+import numpy as np
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, select
+
+from app.config.extensions import db
+from app.models.data_version import UserDataVersion
+from app.models.expense import Expense
+from app.services.shared_cache import cached_versions
+from app.schemas.expense_schema import PaymentMethod
+
+# Payment method codes; 0 means none
+PAYMENT_METHODS = (None, *get_args(PaymentMethod))
+_PAYMENT_CODES = {name: code for code, name in enumerate(PAYMENT_METHODS)}
+
+_EPOCH_DAY = np.datetime64('1970-01-01', 'D')
+_ENTRY_OVERHEAD = 512
+
+
+@dataclass(frozen=True)
+class UserColumns:
+    version: int
+    ids: np.ndarray
+    cents: np.ndarray
+    days: np.ndarray
+    categories: np.ndarray
+    payment_methods: np.ndarray
+
+    @property
+    def nbytes(self):
+        return _ENTRY_OVERHEAD + sum(
+            array.nbytes for array in (self.ids, self.cents, self.days, self.categories, self.payment_methods)
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def to_day(value):
+    return int((np.datetime64(value, 'D') - _EPOCH_DAY).astype(np.int64))
+
+
+def _columns(version, rows):
+    ids, cents, days, categories, methods = [], [], [], [], []
+    for expense_id, amount_cents, expense_date, category_id, payment_method in rows:
+        ids.append(expense_id)
+        cents.append(amount_cents)
+        days.append(expense_date)
+        categories.append(category_id)
+        methods.append(_PAYMENT_CODES.get(payment_method, 0))
+    return UserColumns(
+        version=version,
+        ids=np.array(ids, dtype=np.int64),
+        cents=np.array(cents, dtype=np.int64),
+        days=(np.array(days, dtype='datetime64[D]') - _EPOCH_DAY).astype(np.int32),
+        categories=np.array(categories, dtype=np.int32),
+        payment_methods=np.array(methods, dtype=np.int8),
+    )
+
+
+def load_columns(user_id, version=None):
+    if version is None:
+        version = UserDataVersion.get_many([user_id])[user_id][0]
+    rows = db.session.execute(
+        select(Expense.id, Expense.amount_cents, Expense.expense_date, Expense.category_id, Expense.payment_method)
+        .where(Expense.user_id == user_id)
+        .order_by(Expense.id)
+    )
+    return _columns(version, rows)
+
+
+class ExpenseCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evictions = self.updates = 0
+
+    def get(self, user_id):
+        # Read the version before the rows so an entry is never tagged newer than its data
+        version = cached_versions([user_id])[user_id][0]
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry
+            if entry is None:
+                self.misses += 1
+            else:
+                self.stale += 1
+
+        entry = load_columns(user_id, version)
+        self._store(user_id, entry)
+        return entry
+
+    def _store(self, user_id, entry):
+        with self._lock:
+            old = self._entries.pop(user_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[user_id] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            for user_id in list(self._entries) if user_ids is None else user_ids:
+                entry = self._entries.pop(user_id, None)
+                if entry is not None:
+                    self._bytes -= entry.nbytes
+
+    def apply(self, bumped_versions, changes):
+        """Apply committed expense changes: ``changes`` maps user_id -> {expense_id: row or None}."""
+        with self._lock:
+            for user_id, bumps in bumped_versions.items():
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                user_changes = changes.get(user_id, {})
+                keep = ~np.isin(entry.ids, list(user_changes))
+                upserts = [(expense_id, *row) for expense_id, row in user_changes.items() if row is not None]
+                added = _columns(entry.version + bumps, upserts)
+                updated = UserColumns(
+                    version=added.version,
+                    ids=np.concatenate([entry.ids[keep], added.ids]),
+                    cents=np.concatenate([entry.cents[keep], added.cents]),
+                    days=np.concatenate([entry.days[keep], added.days]),
+                    categories=np.concatenate([entry.categories[keep], added.categories]),
+                    payment_methods=np.concatenate([entry.payment_methods[keep], added.payment_methods]),
+                )
+                self._entries[user_id] = updated
+                self._bytes += updated.nbytes - entry.nbytes
+                self.updates += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                'entries': len(self._entries),
+                'expenses': sum(len(entry) for entry in self._entries.values()),
+                'memory_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'memory_usage_percentage': round(self._bytes / self.max_bytes * 100, 2) if self.max_bytes else 0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_reloads': self.stale,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'incremental_updates': self.updates,
+            }
+
+
+def init_expense_cache(app):
+    if app.config.get('EXPENSE_CACHE_ENABLED'):
+        app.extensions['expense_cache'] = ExpenseCache(app.config['EXPENSE_CACHE_MAX_MB'] * 1024 * 1024)
+
+
+def get_expense_cache():
+    return current_app.extensions.get('expense_cache') if has_app_context() else None
+
+
+def get_user_columns(user_id):
+    """Columns for ``user_id`` from the cache when enabled, otherwise straight from the database."""
+    cache = get_expense_cache()
+    return cache.get(user_id) if cache else load_columns(user_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_expense_changes(session, flush_context):
+    if get_expense_cache() is None:
+        return
+    changes = session.info.setdefault('expense_cache_changes', defaultdict(dict))
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Expense) and (obj in session.new or session.is_modified(obj)):
+            for old_user_id in inspect(obj).attrs.user_id.history.deleted:
+                if old_user_id is not None and old_user_id != obj.user_id:
+                    changes[old_user_id][obj.id] = None
+            changes[obj.user_id][obj.id] = (obj.amount_cents, obj.expense_date, obj.category_id, obj.payment_method)
+    for obj in session.deleted:
+        if isinstance(obj, Expense):
+            changes[obj.user_id][obj.id] = None
+
+
+def record_expense_writes(session, rows, deleted=False):
+    """Note expenses written by an INSERT/UPDATE/DELETE statement, which the flush hook above never sees."""
+    if get_expense_cache() is None:
+        return
+    changes = session.info.setdefault('expense_cache_changes', defaultdict(dict))
+    for row in rows:
+        changes[row.user_id][row.id] = (
+            None if deleted else (row.amount_cents, row.expense_date, row.category_id, row.payment_method)
+        )
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_expense_changes(session):
+    changes = session.info.pop('expense_cache_changes', None)
+    cache = get_expense_cache()
+    if cache is None:
+        return
+    bumped = session.info.get('bumped_versions') or {}
+    if changes:
+        # A user whose expenses moved away without a version bump can't be advanced safely
+        cache.invalidate([user_id for user_id in changes if user_id not in bumped])
+    cache.apply(bumped, changes or {})
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_expense_changes(session):
+    session.info.pop('expense_cache_changes', None)
@@ -0,0 +1,225 @@
+"""
+Budget forecasting.
+
+For every active budget, the current period runs from ``start_date`` in steps of
+``period`` (clipped to ``end_date``). Daily expense totals for all the budgets'
+users are loaded with one grouped query into a (series x day) matrix, where a
+series is a (user, category) pair or a user's all-category total. Every
+projection is then computed with array operations over all budgets at once:
+
+- linear: spend so far / days elapsed in the period
+- ewma: exponentially weighted mean of daily spend over ``lookback_days``
+
+Each model projects end-of-period spend and the date the budget is exceeded.
+"""
+import multiprocessing
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+
+from app.models.budget import Budget
+from app.models.expense import Expense
+
+# Per-process engine used by batch workers
+_worker_engine = None
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+def _shift_months(starts, months):
+    """Shift datetime64[D] ``starts`` by ``months``, clamping to the end of shorter months."""
+    start_months = starts.astype('datetime64[M]')
+    day_offset = starts - start_months.astype('datetime64[D]')
+    target = start_months + months
+    last_day = (target + 1).astype('datetime64[D]') - 1
+    return np.minimum(target.astype('datetime64[D]') + day_offset, last_day)
+
+
+def current_periods(starts, periods, today):
+    """Vectorized [period_start, period_end) containing ``today`` for budgets anchored at ``starts``."""
+    today = np.datetime64(today, 'D')
+    period_start = np.full(starts.shape, today)
+    period_end = period_start + 1
+
+    weekly = periods == 'weekly'
+    weeks = (today - starts[weekly]).astype(int) // 7
+    period_start[weekly] = starts[weekly] + weeks * 7
+    period_end[weekly] = period_start[weekly] + 7
+
+    for name, step in (('monthly', 1), ('yearly', 12)):
+        mask = periods == name
+        anchors = starts[mask]
+        elapsed = (today.astype('datetime64[M]') - anchors.astype('datetime64[M]')).astype(int) // step
+        candidate = _shift_months(anchors, elapsed * step)
+        elapsed = np.where(candidate > today, elapsed - 1, elapsed)
+        period_start[mask] = _shift_months(anchors, elapsed * step)
+        period_end[mask] = _shift_months(anchors, (elapsed + 1) * step)
+
+    return period_start, period_end
+
+
+def _load_budgets(connection, user_ids, today):
+    today_start = datetime.combine(today, datetime.min.time())
+    query = select(
+        Budget.id, Budget.name, Budget.user_id, Budget.category_id, Budget.amount_cents, Budget.period,
+        Budget.start_date, Budget.end_date, Budget.alert_threshold,
+    ).where(
+        Budget.is_active.is_(True),
+        Budget.start_date < today_start + timedelta(days=1),
+        (Budget.end_date.is_(None)) | (Budget.end_date >= today_start),
+    ).order_by(Budget.id)
+    if user_ids is not None:
+        query = query.where(Budget.user_id.in_(user_ids))
+    return connection.execute(query).all()
+
+
+def _load_daily_totals(connection, user_ids, origin, today):
+    day = func.date(Expense.expense_date)
+    query = select(Expense.user_id, Expense.category_id, day, func.sum(Expense.amount_cents)).where(
+        Expense.user_id.in_(user_ids),
+        Expense.expense_date >= datetime.combine(origin, datetime.min.time()),
+        Expense.expense_date < datetime.combine(today + timedelta(days=1), datetime.min.time()),
+    ).group_by(Expense.user_id, Expense.category_id, day)
+    return connection.execute(query).all()
+
+
+def _crossing_day(daily, first_day, threshold):
+    """Index of the first day whose running total reaches ``threshold`` (-1 if none)."""
+    cumulative = np.cumsum(np.where(np.arange(daily.shape[1]) >= first_day[:, None], daily, 0.0), axis=1)
+    reached = cumulative >= threshold[:, None]
+    return np.where(reached.any(axis=1), reached.argmax(axis=1), -1)
+
+
+def forecast_budgets(connection, user_ids=None, today=None, lookback_days=90, halflife_days=7):
+    """Return one forecast dict per active budget of ``user_ids`` (all users when None)."""
+    today = today or _today()
+    budgets = _load_budgets(connection, user_ids, today)
+    if not budgets:
+        return []
+
+    (ids, names, owners, categories, amounts, periods,
+     start_dates, end_dates, thresholds) = zip(*budgets)
+    owners = np.array(owners)
+    amounts = np.array(amounts, dtype=np.int64) / 100
+    periods = np.array(periods)
+    thresholds = np.array([t if t is not None else 80 for t in thresholds], dtype=float)
+    starts = np.array([s.date() for s in start_dates], dtype='datetime64[D]')
+    ends = np.array([e.date() + timedelta(days=1) if e else date.max for e in end_dates], dtype='datetime64[D]')
+
+    period_start, period_end = current_periods(starts, periods, today)
+    period_start = np.maximum(period_start, starts)
+    period_end = np.minimum(period_end, ends)
+
+    # Day axis covers every current period and the EWMA lookback
+    today64 = np.datetime64(today, 'D')
+    origin = min(period_start.min(), today64 - (lookback_days - 1))
+    n_days = int((today64 - origin).astype(int)) + 1
+
+    # Series: one per (user, category) plus one per user across all categories
+    series = {}
+    for user_id, category_id in zip(owners.tolist(), categories):
+        series.setdefault((user_id, category_id), len(series))
+    rows = _load_daily_totals(connection, sorted(set(owners.tolist())), origin.astype(date), today)
+    daily = np.zeros((len(series), n_days))
+    if rows:
+        row_users, row_categories, row_days, row_totals = zip(*rows)
+        day_index = (np.array(row_days, dtype='datetime64[D]') - origin).astype(int)
+        totals = np.array(row_totals, dtype=np.int64) / 100
+        for key in ('category', 'all'):
+            keys = zip(row_users, row_categories if key == 'category' else [None] * len(rows))
+            index = np.array([series.get(k, -1) for k in keys])
+            hit = index >= 0
+            np.add.at(daily, (index[hit], day_index[hit]), totals[hit])
+
+    budget_daily = daily[[series[(u, c)] for u, c in zip(owners.tolist(), categories)]]
+
+    first_day = (period_start - origin).astype(int)
+    in_period = np.arange(n_days) >= first_day[:, None]
+    spent = (budget_daily * in_period).sum(axis=1)
+    elapsed = (today64 - period_start).astype(int) + 1
+    remaining = np.maximum((period_end - today64).astype(int) - 1, 0)
+
+    halflife = max(halflife_days, 1)
+    weights = 0.5 ** (np.arange(lookback_days)[::-1] / halflife)
+    rates = {
+        'linear': spent / elapsed,
+        'ewma': budget_daily[:, -lookback_days:] @ weights / weights.sum(),
+    }
+
+    already_over = _crossing_day(budget_daily, first_day, amounts)
+    alert_levels = amounts * thresholds / 100
+
+    projections = {}
+    for model, rate in rates.items():
+        projected = spent + rate * remaining
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_left = np.ceil((amounts - spent) / rate)
+        projected_over = np.where((rate > 0) & (days_left <= remaining), days_left, np.nan)
+        # Days from today (<= 0 when the budget is already exceeded, NaN when it won't be this period)
+        overrun_day = np.where(already_over >= 0, already_over - (n_days - 1), projected_over)
+        projections[model] = (rate, projected, overrun_day)
+
+    forecasts = []
+    for i, budget_id in enumerate(ids):
+        forecast = {
+            'budget_id': budget_id,
+            'name': names[i],
+            'user_id': int(owners[i]),
+            'category_id': categories[i],
+            'period': str(periods[i]),
+            'amount': float(amounts[i]),
+            'alert_threshold': int(thresholds[i]),
+            'period_start': period_start[i].astype(date).isoformat(),
+            'period_end': (period_end[i] - 1).astype(date).isoformat(),
+            'spent_amount': round(float(spent[i]), 2),
+            'days_elapsed': int(elapsed[i]),
+            'days_remaining': int(remaining[i]),
+        }
+        for model, (rate, projected, overrun_day) in projections.items():
+            over = overrun_day[i]
+            forecast[model] = {
+                'daily_rate': round(float(rate[i]), 2),
+                'projected_spend': round(float(projected[i]), 2),
+                'projected_usage_percentage': round(float(projected[i] / amounts[i] * 100), 2) if amounts[i] else 0,
+                'will_exceed': bool(projected[i] > amounts[i]),
+                'will_reach_alert': bool(projected[i] >= alert_levels[i]),
+                'overrun_date': None if np.isnan(over) else (today + timedelta(days=int(over))).isoformat(),
+            }
+        forecasts.append(forecast)
+    return forecasts
+
+
+def _forecast_chunk(task):
+    """Worker entry point: forecast the budgets of one chunk of users."""
+    global _worker_engine
+    url, user_ids, today, lookback_days, halflife_days = task
+    if _worker_engine is None:
+        _worker_engine = create_engine(url)
+    with _worker_engine.connect() as connection:
+        return forecast_budgets(connection, user_ids, today, lookback_days, halflife_days)
+
+
+def forecast_all(engine, workers=None, chunk_users=500, today=None, lookback_days=90, halflife_days=7):
+    """Yield forecast lists for every user with an active budget, chunked across a process pool."""
+    today = today or _today()
+    with engine.connect() as connection:
+        user_ids = connection.execute(
+            select(Budget.user_id).where(Budget.is_active.is_(True)).distinct().order_by(Budget.user_id)
+        ).scalars().all()
+    chunks = [user_ids[i:i + chunk_users] for i in range(0, len(user_ids), chunk_users)]
+    workers = workers or multiprocessing.cpu_count()
+
+    if workers <= 1 or len(chunks) <= 1 or engine.dialect.name == 'sqlite':
+        with engine.connect() as connection:
+            for chunk in chunks:
+                yield forecast_budgets(connection, chunk, today, lookback_days, halflife_days)
+        return
+
+    url = engine.url.render_as_string(hide_password=False)
+    tasks = [(url, chunk, today, lookback_days, halflife_days) for chunk in chunks]
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers) as pool:
+        yield from pool.imap_unordered(_forecast_chunk, tasks)
@@ -0,0 +1,209 @@
+"""
+Group commit for ``BaseModel.save()`` and ``insert_returning()``.
+
+With ``GROUP_COMMIT_ENABLED`` each process runs one writer thread. Saving or
+inserting a new object hands it to the writer instead of committing on its own. The
+writer collects the objects of concurrent requests until it has
+``GROUP_COMMIT_MAX_BATCH`` of them or ``GROUP_COMMIT_MAX_WAIT_MS`` have passed
+since the first, inserts them in one flush and commits once, so a burst of
+writes shares one WAL flush. Every caller blocks until its batch is committed:
+an acknowledged save is exactly as durable as before. When a batch fails, its
+objects are retried with one commit each, so a bad row only fails its own
+request.
+
+Only a plain insert is grouped: a transient object with no related objects
+attached, saved from a session with nothing else pending and outside a unit of
+work. Everything else commits in the request's session as before.
+
+With sharding there is one writer per shard, each fed the inserts of the
+requests routed to its shard.
+"""
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.pool import StaticPool
+
+from app.config.extensions import db
+from app.services.sharding import current_shard, shard_engine, shard_names
+from app.utils.unit_of_work import ConnectionSession
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    __slots__ = ('obj', 'queued_at', 'done', 'error')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.error = None
+
+
+class GroupCommitWriter:
+    def __init__(self, app, max_batch=100, max_wait=0.002, shard=None):
+        self.app = app
+        self.shard = shard
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches': 0, 'rows': 0, 'failed_batches': 0, 'max_batch_rows': 0,
+            'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'commit_seconds': 0.0,
+        }
+
+    def accepts(self, obj):
+        session = db.session()
+        state = inspect(obj)
+        return (
+            state.transient
+            and 'unit_of_work' not in session.info
+            and not (session.new or session.deleted or any(session.is_modified(o) for o in session.dirty))
+            and not any(rel.key in state.dict for rel in state.mapper.relationships)
+        )
+
+    def submit(self, obj):
+        """Queue ``obj`` for insertion and block until its batch is committed (or re-raise its error)."""
+        self._ensure_started()
+        pending = _Pending(obj)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return obj
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches, rows = stats['batches'], stats['rows']
+        return {
+            'batches': batches,
+            'rows': rows,
+            'failed_batches': stats['failed_batches'],
+            'avg_batch_rows': round(rows / batches, 2) if batches else 0,
+            'max_batch_rows': stats['max_batch_rows'],
+            'avg_wait_ms': round(stats['wait_seconds'] / rows * 1000, 3) if rows else 0,
+            'max_wait_ms': round(stats['max_wait_seconds'] * 1000, 3),
+            'avg_commit_ms': round(stats['commit_seconds'] / batches * 1000, 3) if batches else 0,
+            'queued': self._queue.qsize(),
+        }
+
+    def _ensure_started(self):
+        # Started on first use, so a forking server gets one writer per worker
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                name = f'group-commit-writer-{self.shard}' if self.shard else 'group-commit-writer'
+                self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            session = None
+            while True:
+                batch = self._collect()
+                try:
+                    if session is None:
+                        session = ConnectionSession(db, bind=self._connect(), expire_on_commit=False)
+                    self._commit(session, batch)
+                except BaseException as e:  # never leave a caller waiting
+                    for pending in batch:
+                        if not pending.done.is_set():
+                            pending.error = e
+                            pending.done.set()
+                    logger.exception('Group commit failed')
+
+    def _connect(self):
+        engine = shard_engine(self.shard) if self.shard else db.engine
+        if not isinstance(engine.pool, StaticPool):  # in-memory SQLite has a single connection
+            # A pool of its own: the callers waiting on the writer may hold every pooled connection
+            engine = create_engine(engine.url, pool=engine.pool.recreate())
+        return engine.connect()
+
+    def _commit(self, session, batch):
+        started = time.perf_counter()
+        try:
+            session.add_all(pending.obj for pending in batch)
+            session.commit()
+        except Exception:
+            session.rollback()
+            with self._stats_lock:
+                self._stats['failed_batches'] += 1
+            # One commit each, so only the offending rows fail
+            for pending in batch:
+                try:
+                    session.add(pending.obj)
+                    session.commit()
+                except Exception as e:
+                    session.rollback()
+                    pending.error = e
+        committed = time.perf_counter()
+        # Detached with their attributes loaded; the caller adds them to its own session
+        session.expunge_all()
+
+        waits = [committed - pending.queued_at for pending in batch]
+        with self._stats_lock:
+            stats = self._stats
+            stats['batches'] += 1
+            stats['rows'] += len(batch)
+            stats['max_batch_rows'] = max(stats['max_batch_rows'], len(batch))
+            stats['wait_seconds'] += sum(waits)
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], *waits)
+            stats['commit_seconds'] += committed - started
+        for pending in batch:
+            pending.done.set()
+
+
+def init_group_commit(app):
+    if not app.config.get('GROUP_COMMIT_ENABLED'):
+        return
+    shards = shard_names(app)
+    writers = {
+        shard: GroupCommitWriter(
+            app,
+            max_batch=app.config['GROUP_COMMIT_MAX_BATCH'],
+            max_wait=app.config['GROUP_COMMIT_MAX_WAIT_MS'] / 1000,
+            shard=shard if len(shards) > 1 else None,
+        )
+        for shard in shards
+    }
+    app.extensions['group_commit'] = writers[shards[0]]
+    if len(shards) > 1:
+        app.extensions['group_commit_shards'] = writers
+
+
+def get_group_commit_writer():
+    if not has_app_context():
+        return None
+    writers = current_app.extensions.get('group_commit_shards')
+    if writers is not None:
+        return writers[current_shard()]
+    return current_app.extensions.get('group_commit')
+
+
+def group_commit_writers():
+    """{shard: writer} of the app; a single ``None`` key without sharding."""
+    writers = current_app.extensions.get('group_commit_shards')
+    if writers is not None:
+        return writers
+    writer = current_app.extensions.get('group_commit')
+    return {None: writer} if writer is not None else {}
@@ -0,0 +1,423 @@
+"""
+Schema changes that don't lock big tables, for use from ``migrations/versions``.
+
+Alembic runs a migration in one transaction, and on PostgreSQL everything it
+touches stays locked until that commits: an ``UPDATE`` over all of ``expenses``
+blocks every write for as long as it runs. The helpers here step out of that
+transaction (Alembic's ``autocommit_block``) and work in small pieces:
+
+- ``create_index_concurrently`` builds an index with ``CREATE INDEX
+  CONCURRENTLY``; on the partitioned ``expenses`` table, partition by
+  partition, attaching each to an index created ``ON ONLY`` the parent.
+- ``Backfill`` fills derived columns in batches ordered by an integer key, each
+  in its own short transaction, pausing between them. Its position is saved in
+  ``backfill_checkpoints`` with every batch, so an interrupted upgrade
+  continues where it stopped. ``Backfill.estimate`` (``flask backfills
+  estimate``) reports the work ahead without writing anything.
+- ``set_not_null`` makes a backfilled column ``NOT NULL`` after validating a
+  check constraint, so the table is never scanned under an exclusive lock.
+
+Everything committed before the helper is run stays committed, including the
+revision stamps of earlier migrations; keep a backfill in a revision of its own,
+after the one adding its columns, so re-running the upgrade only repeats the
+backfill. SQLite has no concurrent index builds and a database-wide write
+lock, so there the statements just run as they are, still in batches.
+"""
+import logging
+import math
+import time
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+from alembic import op
+from flask import current_app, has_app_context
+from sqlalchemy.exc import OperationalError
+
+from app.services import partitions
+
+# A child of Alembic's logger, so progress shows up next to the migration's own output
+logger = logging.getLogger('alembic.backfill')
+
+_metadata = sa.MetaData()
+
+checkpoints = sa.Table(
+    'backfill_checkpoints', _metadata,
+    sa.Column('name', sa.String(128), primary_key=True),
+    sa.Column('table_name', sa.String(128), nullable=False),
+    sa.Column('last_key', sa.BigInteger()),
+    sa.Column('rows_updated', sa.BigInteger(), nullable=False, default=0),
+    sa.Column('batches', sa.Integer(), nullable=False, default=0),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime()),
+)
+
+# Not part of the models: kept out of autogenerate, like alembic_version
+INTERNAL_TABLES = {checkpoints.name}
+
+PROGRESS_INTERVAL_SECONDS = 5
+# Consecutive failures of a batch (lock timeouts) before the backfill gives up
+MAX_RETRIES = 10
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _setting(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def _outside_transaction():
+    """Alembic's autocommit block: commits what the migration did so far."""
+    return op.get_context().autocommit_block()
+
+
+# Indexes
+
+def _index_sql(name, table, columns, unique=False, using=None, include=(), where=None,
+               concurrently=False, only=False, dialect='postgresql'):
+    sql = f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+    sql += f"ON {'ONLY ' if only else ''}{table} "
+    if using and dialect == 'postgresql':
+        sql += f"USING {using} "
+    sql += f"({', '.join(columns)})"
+    if include and dialect == 'postgresql':
+        sql += f" INCLUDE ({', '.join(include)})"
+    if where:
+        sql += f" WHERE {where}"
+    return sql
+
+
+def _index_state(connection, name):
+    """None when the index doesn't exist, else whether it is valid."""
+    return connection.execute(sa.text(
+        "SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(:name)"
+    ), {'name': name}).scalar()
+
+
+def _child_index_name(name, table, partition):
+    child = name.replace(table, partition, 1) if table in name else f'{partition}_{name}'
+    # PostgreSQL truncates identifiers to 63 bytes
+    return child[:63]
+
+
+def _create_concurrently(connection, name, sql):
+    # A failed concurrent build leaves an invalid index behind; drop it and start over
+    if _index_state(connection, name) is False:
+        logger.info('Dropping invalid index %s left by an earlier attempt', name)
+        connection.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    connection.exec_driver_sql(sql)
+
+
+def create_index_concurrently(name, table, columns, unique=False, using=None, include=(), where=None):
+    """Create an index without blocking writes to ``table``; safe to run again after a failure.
+
+    ``columns`` (and ``include``, ``where``) are SQL: column names or
+    expressions. ``using`` and ``include`` only apply on PostgreSQL.
+    """
+    options = dict(unique=unique, using=using, include=include, where=where)
+    if op.get_context().as_sql:
+        op.execute(_index_sql(name, table, columns, concurrently=True, **options))
+        return
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        op.execute(_index_sql(name, table, columns, dialect=connection.dialect.name, **options))
+        return
+
+    with _outside_transaction():
+        if table != partitions.PARENT or not partitions.is_partitioned(connection):
+            started = time.monotonic()
+            _create_concurrently(connection, name, _index_sql(name, table, columns, concurrently=True, **options))
+            logger.info('Created index %s on %s in %.1fs', name, table, time.monotonic() - started)
+            return
+
+        # CONCURRENTLY isn't supported on a partitioned table: build the parent's index
+        # empty and invalid, then each partition's concurrently, and attach them. The
+        # parent's index becomes valid once every partition has one attached.
+        connection.exec_driver_sql(_index_sql(name, table, columns, only=True, **options))
+        for partition, _, _ in partitions.list_partitions(connection):
+            child = _child_index_name(name, table, partition)
+            started = time.monotonic()
+            _create_concurrently(connection, child, _index_sql(child, partition, columns, concurrently=True, **options))
+            connection.exec_driver_sql(f'ALTER INDEX {name} ATTACH PARTITION {child}')
+            logger.info('Created index %s on %s in %.1fs', child, partition, time.monotonic() - started)
+        if not _index_state(connection, name):
+            raise RuntimeError(f'Index {name} is still invalid after indexing every partition of {table}')
+
+
+def drop_index_concurrently(name, table):
+    """Drop an index created by ``create_index_concurrently``."""
+    connection = None if op.get_context().as_sql else op.get_bind()
+    if connection is not None and connection.dialect.name == 'postgresql':
+        with _outside_transaction():
+            # Indexes of partitioned tables can't be dropped concurrently; dropping the parent's drops them all
+            partitioned = table == partitions.PARENT and partitions.is_partitioned(connection)
+            connection.exec_driver_sql(f"DROP INDEX {'' if partitioned else 'CONCURRENTLY '}IF EXISTS {name}")
+        return
+    op.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+# Constraints
+
+def set_not_null(table, column):
+    """``SET NOT NULL`` on ``column`` without a full scan of ``table`` under an exclusive lock.
+
+    On PostgreSQL a ``CHECK (column IS NOT NULL)`` is added ``NOT VALID`` and
+    validated, which reads the table while writes go on; ``SET NOT NULL`` then
+    takes the validated check as proof instead of scanning, and the check is
+    dropped. Elsewhere this is a plain ``ALTER COLUMN`` (SQLite can't alter a
+    column at all; rebuild the table with ``batch_alter_table`` there).
+    """
+    connection = None if op.get_context().as_sql else op.get_bind()
+    if connection is None or connection.dialect.name != 'postgresql':
+        op.alter_column(table, column, nullable=False)
+        return
+
+    check = f'{table}_{column}_not_null'[:63]
+    with _outside_transaction():
+        nullable = connection.execute(sa.text(
+            "SELECT is_nullable FROM information_schema.columns WHERE table_name = :table AND column_name = :column"
+        ), {'table': table, 'column': column}).scalar()
+        if nullable == 'NO':
+            return
+        # Left behind if an earlier attempt stopped half way
+        connection.exec_driver_sql(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}')
+        connection.exec_driver_sql(f'ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID')
+        started = time.monotonic()
+        connection.exec_driver_sql(f'ALTER TABLE {table} VALIDATE CONSTRAINT {check}')
+        connection.exec_driver_sql(f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL')
+        connection.exec_driver_sql(f'ALTER TABLE {table} DROP CONSTRAINT {check}')
+        logger.info('Set %s.%s NOT NULL in %.1fs', table, column, time.monotonic() - started)
+
+
+# Backfills
+
+class Backfill:
+    """Set ``values`` on the rows of ``table`` matching ``where``, a batch of keys at a time.
+
+    ``values`` maps column names to SQL expressions and ``where`` is an
+    optional SQL condition. Batches cover ``batch_size`` consecutive values of
+    the integer ``key`` column and must be idempotent: a batch interrupted
+    before its checkpoint was saved is done again. ``where`` should exclude
+    rows already filled (``amount_cents IS NULL``), so that rows written by
+    the application meanwhile are left alone.
+    """
+
+    def __init__(self, name, table, values, where=None, key='id', batch_size=None, pause=None):
+        self.name = name
+        self.table = table
+        self.values = values
+        self.where = where
+        self.key = key
+        self.batch_size = batch_size or _setting('BACKFILL_BATCH_SIZE', 5000)
+        self.pause = _setting('BACKFILL_PAUSE_SECONDS', 0.1) if pause is None else pause
+        self.lock_timeout = _setting('BACKFILL_LOCK_TIMEOUT_SECONDS', 5)
+
+    def __repr__(self):
+        return f'<Backfill {self.name} on {self.table}>'
+
+    # Statements
+
+    def _update_sql(self):
+        assignments = ', '.join(f'{column} = {expression}' for column, expression in self.values.items())
+        where = f' AND ({self.where})' if self.where else ''
+        return sa.text(
+            f'UPDATE {self.table} SET {assignments} WHERE {self.key} > :lower AND {self.key} <= :upper{where}'
+        )
+
+    def _next_upper(self, connection, lower):
+        """The last key of the batch after ``lower``, found on the key's index."""
+        upper = connection.execute(sa.text(
+            f'SELECT {self.key} FROM {self.table} WHERE {self.key} > :lower ORDER BY {self.key} LIMIT 1 OFFSET :offset'
+        ), {'lower': lower, 'offset': self.batch_size - 1}).scalar()
+        if upper is None:
+            upper = connection.execute(sa.text(
+                f'SELECT max({self.key}) FROM {self.table} WHERE {self.key} > :lower'
+            ), {'lower': lower}).scalar()
+        return upper
+
+    def _key_range(self, connection):
+        return connection.execute(sa.text(f'SELECT min({self.key}), max({self.key}) FROM {self.table}')).one()
+
+    # Checkpoints
+
+    def checkpoint(self, connection):
+        """This backfill's row of ``backfill_checkpoints``, or None before it first ran."""
+        if not sa.inspect(connection).has_table(checkpoints.name):
+            return None
+        return connection.execute(sa.select(checkpoints).where(checkpoints.c.name == self.name)).first()
+
+    def _start(self, connection):
+        checkpoints.create(connection, checkfirst=True)
+        row = self.checkpoint(connection)
+        if row is None:
+            now = _now()
+            connection.execute(checkpoints.insert().values(
+                name=self.name, table_name=self.table, rows_updated=0, batches=0, started_at=now, updated_at=now,
+            ))
+            row = self.checkpoint(connection)
+        return row
+
+    def reset(self):
+        """Forget the checkpoint, e.g. from the migration's ``downgrade()``."""
+        if op.get_context().as_sql:
+            op.execute(checkpoints.delete().where(checkpoints.c.name == self.name))
+            return
+        if sa.inspect(op.get_bind()).has_table(checkpoints.name):
+            op.execute(checkpoints.delete().where(checkpoints.c.name == self.name))
+
+    # Running
+
+    def run(self):
+        """Run (or resume) the backfill from a migration's ``upgrade()``."""
+        if op.get_context().as_sql:
+            # Offline (--sql) scripts can't be batched; print the one statement instead
+            assignments = ', '.join(f'{column} = {expression}' for column, expression in self.values.items())
+            op.execute(f"UPDATE {self.table} SET {assignments}{f' WHERE {self.where}' if self.where else ''}")
+            return
+        with _outside_transaction():
+            self.run_on(op.get_bind().engine)
+
+    def run_on(self, engine):
+        """Run (or resume) the backfill on ``engine``; returns the number of rows updated."""
+        with engine.connect() as connection:
+            with connection.begin():
+                state = self._start(connection)
+            if state.finished_at is not None:
+                logger.info('%s: already finished on %s', self.name, state.finished_at)
+                return 0
+
+            lowest, highest = self._key_range(connection)
+            connection.rollback()
+            if highest is None:
+                return self._finish(connection, state.rows_updated)
+            lower = state.last_key if state.last_key is not None else lowest - 1
+            rows_updated, batches = state.rows_updated, state.batches
+            updated_now = 0
+            started = last_report = time.monotonic()
+            if state.last_key is not None:
+                logger.info('%s: resuming after %s=%s (%s rows updated so far)',
+                            self.name, self.key, lower, f'{rows_updated:,}')
+
+            update = self._update_sql()
+            failures = 0
+            while True:
+                batch_started = time.monotonic()
+                try:
+                    with connection.begin():
+                        if connection.dialect.name == 'postgresql':
+                            # Give way to the application instead of queueing writes behind the batch
+                            connection.exec_driver_sql(f"SET LOCAL lock_timeout = '{int(self.lock_timeout * 1000)}ms'")
+                        upper = self._next_upper(connection, lower)
+                        if upper is None:
+                            break
+                        count = connection.execute(update, {'lower': lower, 'upper': upper}).rowcount
+                        rows_updated += count
+                        updated_now += count
+                        batches += 1
+                        connection.execute(checkpoints.update().where(checkpoints.c.name == self.name).values(
+                            last_key=upper, rows_updated=rows_updated, batches=batches, updated_at=_now(),
+                        ))
+                except OperationalError as e:
+                    # A lock timeout (or a busy SQLite database): back off and retry the batch
+                    failures += 1
+                    if failures > MAX_RETRIES:
+                        raise
+                    logger.warning('%s: batch after %s=%s failed (%s), retrying', self.name, self.key, lower,
+                                   str(e.orig).strip())
+                    time.sleep(max(self.pause, 1))
+                    continue
+                lower = upper
+                failures = 0
+
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_INTERVAL_SECONDS or upper >= highest:
+                    last_report = now
+                    self._report(lowest, highest, upper, rows_updated, updated_now, now - started)
+                if self.pause:
+                    # Idle at least as long as the batch took, so a slow database gets slower batches less often
+                    time.sleep(max(self.pause, time.monotonic() - batch_started))
+
+            return self._finish(connection, rows_updated)
+
+    def _report(self, lowest, highest, upper, rows_updated, updated_now, elapsed):
+        done = (upper - lowest + 1) / (highest - lowest + 1) if highest > lowest else 1.0
+        rate = updated_now / elapsed if elapsed else 0
+        left = elapsed * (1 - done) / done if done and elapsed else 0
+        logger.info('%s: %.1f%% of %s (%s=%s), %s rows updated, %s rows/s, ~%s left',
+                    self.name, done * 100, self.table, self.key, upper, f'{rows_updated:,}',
+                    f'{rate:,.0f}', format_duration(left))
+
+    def _finish(self, connection, rows_updated):
+        with connection.begin():
+            connection.execute(checkpoints.update().where(checkpoints.c.name == self.name).values(
+                finished_at=_now(), updated_at=_now(),
+            ))
+        logger.info('%s: done, %s rows updated', self.name, f'{rows_updated:,}')
+        return rows_updated
+
+    # Dry run
+
+    def estimate(self, engine):
+        """What running the backfill on ``engine`` would take, without changing anything.
+
+        Times one batch inside a transaction that is rolled back.
+        """
+        with engine.connect() as connection:
+            state = self.checkpoint(connection)
+            lowest, highest = self._key_range(connection)
+            estimate = {
+                'name': self.name,
+                'table': self.table,
+                'rows': _estimated_rows(connection, self.table),
+                'pending_rows': _estimated_rows(connection, self.table, self.where),
+                'finished': state is not None and state.finished_at is not None,
+                'resumes_after': state.last_key if state is not None else None,
+                'batch_size': self.batch_size,
+                'batches': 0,
+                'seconds_per_batch': None,
+                'estimated_seconds': 0,
+            }
+            connection.rollback()
+            if highest is None or estimate['finished']:
+                return estimate
+
+            lower = state.last_key if state is not None and state.last_key is not None else lowest - 1
+            with connection.begin() as transaction:
+                started = time.monotonic()
+                upper = self._next_upper(connection, lower)
+                if upper is not None:
+                    connection.execute(self._update_sql(), {'lower': lower, 'upper': upper})
+                seconds = time.monotonic() - started
+                transaction.rollback()
+            if upper is None:
+                return estimate
+
+            # Keys are assumed to be spread evenly over their range
+            remaining = (highest - lower) / (highest - lowest + 1) * estimate['rows']
+            batches = max(math.ceil(remaining / self.batch_size), 1)
+            estimate.update(
+                batches=batches,
+                seconds_per_batch=round(seconds, 4),
+                estimated_seconds=round(batches * (seconds + max(self.pause, seconds if self.pause else 0)), 1),
+            )
+            return estimate
+
+
+def _estimated_rows(connection, table, where=None):
+    if connection.dialect.name == 'postgresql':
+        # The planner's estimate; counting would read the whole table
+        plan = connection.execute(sa.text(
+            f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table}{f' WHERE {where}' if where else ''}"
+        )).scalar()
+        return int(plan[0]['Plan']['Plan Rows'])
+    return connection.execute(sa.text(
+        f"SELECT count(*) FROM {table}{f' WHERE {where}' if where else ''}"
+    )).scalar()
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h{minutes:02d}m' if hours else f'{minutes}m{seconds:02d}s' if minutes else f'{seconds}s'
@@ -0,0 +1,198 @@
+"""
+Monthly range partitions of ``expenses`` on ``expense_date`` (PostgreSQL only).
+
+Partitions are named ``expenses_pYYYYMM`` and cover ``[month start, next month
+start)``. A default partition catches anything outside the created ranges so
+inserts never fail; ``ensure_partitions`` moves such rows into their month once
+it exists. With ``PARTITION_MAINTENANCE_ENABLED`` every process keeps
+``PARTITION_MONTHS_AHEAD`` months created from a thread, so new expenses don't
+pile up in the default partition.
+"""
+import logging
+import re
+import threading
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+PARENT = 'expenses'
+DEFAULT_PARTITION = 'expenses_default'
+# Created on the parent by the partitioning migration, not declared on the model
+PARENT_INDEXES = ('ix_expenses_user_id_expense_date', 'ix_expenses_category_id')
+
+_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+_PARTITION_NAME = re.compile(rf'{PARENT}_(p\d{{6}}|default)')
+# Advisory lock key: one process at a time creates partitions
+_MAINTENANCE_LOCK = 0x65787061
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    years, month = divmod(value.month - 1 + months, 12)
+    return date(value.year + years, month + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT}_p{month.year}{month.month:02d}'
+
+
+def is_partition_name(name):
+    """Whether ``name`` is a partition of ``expenses`` (attached, or detached by retention)."""
+    return _PARTITION_NAME.fullmatch(name) is not None
+
+
+def is_partitioned(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"
+    ), {'name': PARENT}).first() is not None
+
+
+def list_partitions(connection):
+    """Return [(name, lower, upper)] ordered by range; the default partition has no bounds."""
+    rows = connection.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:name)
+    """), {'name': PARENT})
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND.search(bound or '')
+        if match:
+            lower, upper = (datetime.fromisoformat(v).date() for v in match.groups())
+            partitions.append((name, lower, upper))
+        else:
+            partitions.append((name, None, None))
+    return sorted(partitions, key=lambda p: (p[1] is None, p[1] or date.min))
+
+
+def create_partition(connection, month):
+    """Create the partition for ``month``, moving matching rows out of the default partition."""
+    name, lower, upper = partition_name(month), month, add_months(month, 1)
+    bounds = {'lower': lower, 'upper': upper}
+    has_default = connection.execute(text(
+        "SELECT 1 FROM pg_class WHERE relname = :name"
+    ), {'name': DEFAULT_PARTITION}).first() is not None
+    stranded = has_default and connection.execute(text(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE expense_date >= :lower AND expense_date < :upper LIMIT 1"
+    ), bounds).first() is not None
+
+    if stranded:
+        connection.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}"))
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    ))
+    if stranded:
+        # Generated columns (e.g. search_vector) cannot be inserted into
+        columns = ', '.join(connection.execute(text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = :name AND is_generated = 'NEVER' ORDER BY ordinal_position"
+        ), {'name': PARENT}).scalars())
+        connection.execute(text(
+            f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION} "
+            "WHERE expense_date >= :lower AND expense_date < :upper"
+        ), bounds)
+        connection.execute(text(
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE expense_date >= :lower AND expense_date < :upper"
+        ), bounds)
+        connection.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    return name
+
+
+def ensure_partitions(connection, months_ahead=3, start=None, today=None):
+    """Create any missing monthly partitions from ``start`` (default: this month) to ``months_ahead``."""
+    today = today or datetime.now(timezone.utc).date()
+    month = month_start(start or today)
+    last = add_months(month_start(today), months_ahead)
+    existing = {name for name, _, _ in list_partitions(connection)}
+    created = []
+    while month <= last:
+        if partition_name(month) not in existing:
+            created.append(create_partition(connection, month))
+        month = add_months(month, 1)
+    return created
+
+
+def lock_maintenance(connection, wait=True):
+    """Take the transaction's partition maintenance lock; without ``wait``, False when another process has it."""
+    if not wait:
+        return connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': _MAINTENANCE_LOCK}).scalar()
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _MAINTENANCE_LOCK})
+    return True
+
+
+def maintain(engine, months_ahead):
+    """Create the partitions missing up to ``months_ahead`` unless another process is at it; returns their names."""
+    with engine.begin() as connection:
+        if not is_partitioned(connection) or not lock_maintenance(connection, wait=False):
+            return []
+        return ensure_partitions(connection, months_ahead=months_ahead)
+
+
+def start_maintenance_thread(app, interval=None, months_ahead=None):
+    """Run ``maintain`` on every shard now and then in a daemon thread of this process; returns (thread, stop_event)."""
+    from app.services.sharding import shard_engine, shard_names
+    interval = interval or app.config.get('PARTITION_MAINTENANCE_INTERVAL_SECONDS', 3600)
+    months_ahead = months_ahead or app.config.get('PARTITION_MONTHS_AHEAD', 3)
+    stop_event = threading.Event()
+
+    def target():
+        with app.app_context():
+            while not stop_event.is_set():
+                for shard in shard_names(app):
+                    try:
+                        created = maintain(shard_engine(shard), months_ahead)
+                        if created:
+                            logger.info('Created partitions %s on %s', ', '.join(created), shard)
+                    except Exception:
+                        logger.exception('Partition maintenance failed on %s', shard)
+                stop_event.wait(interval)
+
+    thread = threading.Thread(target=target, name='partition-maintenance', daemon=True)
+    thread.start()
+    return thread, stop_event
+
+
+def apply_retention(connection, keep_months, drop=False, dry_run=False, today=None):
+    """Detach (and optionally drop) partitions that end before the retention window.
+
+    Detached partitions keep their data as standalone tables for archiving.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = add_months(month_start(today), -keep_months)
+    expired = [name for name, _, upper in list_partitions(connection) if upper and upper <= cutoff]
+    if not dry_run:
+        for name in expired:
+            connection.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+            if drop:
+                connection.execute(text(f"DROP TABLE {name}"))
+    return expired
+
+
+def _scanned_relations(plan, found):
+    if plan.get('Relation Name', '').startswith(f'{PARENT}_'):
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        _scanned_relations(child, found)
+    return found
+
+
+def explain_pruning(connection, statement):
+    """EXPLAIN a SQLAlchemy statement/query and report which partitions it would scan."""
+    statement = getattr(statement, 'statement', statement)
+    compiled = statement.compile(dialect=connection.dialect)
+    (plan_doc,) = connection.exec_driver_sql(
+        f'EXPLAIN (FORMAT JSON) {compiled.string}', compiled.params
+    ).scalar()
+    scanned = sorted(set(_scanned_relations(plan_doc['Plan'], [])))
+    return {
+        'scanned': scanned,
+        'total': len(list_partitions(connection)),
+    }
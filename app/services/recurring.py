@@ -0,0 +1,286 @@
+"""
+Materialize recurring expenses.
+
+A recurring template is an expense with ``is_recurring`` set and no
+``recurring_parent_id``; its ``expense_date`` anchors the schedule. Each
+occurrence after the anchor becomes an instance row pointing back at the
+template through ``recurring_parent_id``.
+
+``RecurringScheduler`` keeps one ``(due, template_id, n)`` entry per template in
+a heap, so a tick only touches templates that are actually due. Stale entries
+(template deleted, rescheduled or no longer recurring) are dropped when they are
+popped instead of being searched for. Instances are written with one multi-row
+``INSERT ... ON CONFLICT DO NOTHING`` per batch against the unique
+(recurring_parent_id, expense_date) index, so catching up after downtime, or
+several schedulers running at once, never creates duplicates.
+"""
+import calendar
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.config.extensions import db
+from app.models.data_version import UserDataVersion
+from app.models.expense import Expense
+from app.services.sharding import shard_engine
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly')
+
+# Templates changed within this window are re-read on every refresh, to cover
+# transactions that commit after a later updated_at has already been seen
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _timestamp(value):
+    # Heap keys are int seconds: far smaller than datetimes with millions of entries
+    return int((value.replace(tzinfo=None) - _EPOCH).total_seconds())
+
+
+def _shift_months(value, months):
+    years, month = divmod(value.month - 1 + months, 12)
+    year = value.year + years
+    return value.replace(year=year, month=month + 1, day=min(value.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def occurrence(anchor, frequency, n):
+    """Date of the n-th occurrence after ``anchor`` (always computed from the anchor, so month ends don't drift)."""
+    if frequency == 'daily':
+        return anchor + timedelta(days=n)
+    if frequency == 'weekly':
+        return anchor + timedelta(weeks=n)
+    if frequency == 'monthly':
+        return _shift_months(anchor, n)
+    if frequency == 'yearly':
+        return _shift_months(anchor, 12 * n)
+    raise ValueError(f'Unknown recurring frequency: {frequency}')
+
+
+def first_index_after(anchor, frequency, moment):
+    """Smallest n >= 1 whose occurrence is after ``moment``."""
+    if moment is None or moment < anchor:
+        return 1
+    if frequency in ('daily', 'weekly'):
+        n = (moment - anchor).days // (1 if frequency == 'daily' else 7)
+    else:
+        n = (moment.year - anchor.year) * 12 + moment.month - anchor.month
+        if frequency == 'yearly':
+            n //= 12
+    n = max(n, 1)
+    while occurrence(anchor, frequency, n) <= moment:
+        n += 1
+    while n > 1 and occurrence(anchor, frequency, n - 1) > moment:
+        n -= 1
+    return n
+
+
+def _template_query(*criteria):
+    instances = Expense.__table__.alias('instances')
+    last_instance = (
+        select(func.max(instances.c.expense_date))
+        .where(instances.c.recurring_parent_id == Expense.id)
+        .scalar_subquery()
+    )
+    return select(Expense.id, Expense.expense_date, Expense.recurring_frequency, Expense.updated_at,
+                  last_instance).where(
+        Expense.is_recurring,
+        Expense.recurring_parent_id.is_(None),
+        Expense.recurring_frequency.in_(FREQUENCIES),
+        *criteria,
+    )
+
+
+def _insert_ignoring_duplicates(connection, rows):
+    table = Expense.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows).on_conflict_do_nothing(
+            index_elements=[table.c.recurring_parent_id, table.c.expense_date]
+        )
+        return connection.execute(stmt).rowcount
+
+    existing = set(connection.execute(
+        select(table.c.recurring_parent_id, table.c.expense_date)
+        .where(table.c.recurring_parent_id.in_({row['recurring_parent_id'] for row in rows}))
+    ))
+    rows = [row for row in rows if (row['recurring_parent_id'], row['expense_date']) not in existing]
+    if rows:
+        connection.execute(table.insert().values(rows))
+    return len(rows)
+
+
+class RecurringScheduler:
+    def __init__(self, batch_size=500, shard=None):
+        self.batch_size = batch_size
+        self.shard = shard
+        self._heap = []
+        self._loaded = False
+        self._watermark = None
+        self._recent = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def engine(self):
+        # Each shard has a scheduler of its own (see app.services.sharding)
+        return shard_engine(self.shard) if self.shard else db.engine
+
+    def _track(self, template_id, updated_at):
+        if updated_at is not None:
+            self._recent[template_id] = updated_at
+            if self._watermark is None or updated_at > self._watermark:
+                self._watermark = updated_at
+
+    def load(self):
+        """Build the heap from every template (run once at start-up)."""
+        entries, watermark = [], utcnow()
+        with self.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=10_000).execute(_template_query())
+            for template_id, anchor, frequency, updated_at, last_date in result:
+                n = first_index_after(anchor, frequency, last_date)
+                entries.append((_timestamp(occurrence(anchor, frequency, n)), template_id, n))
+                if updated_at and updated_at > watermark:
+                    watermark = updated_at
+        heapq.heapify(entries)
+        self._heap = entries
+        self._loaded = True
+        self._watermark = watermark
+        self._recent = {}
+        logger.info('Loaded %d recurring templates', len(entries))
+        return len(entries)
+
+    def refresh(self, connection):
+        """Schedule templates created or changed since the last refresh (uses the partial updated_at index)."""
+        since = self._watermark - REFRESH_OVERLAP
+        self._recent = {tid: seen for tid, seen in self._recent.items() if seen > since}
+        pushed = 0
+        for template_id, anchor, frequency, updated_at, last_date in connection.execute(
+            _template_query(Expense.updated_at > since)
+        ):
+            if self._recent.get(template_id) == updated_at:
+                continue
+            self._track(template_id, updated_at)
+            n = first_index_after(anchor, frequency, last_date)
+            heapq.heappush(self._heap, (_timestamp(occurrence(anchor, frequency, n)), template_id, n))
+            pushed += 1
+        return pushed
+
+    def _pop_due(self, now_ts):
+        due = {}
+        while self._heap and self._heap[0][0] <= now_ts and len(due) < self.batch_size:
+            due_ts, template_id, n = heapq.heappop(self._heap)
+            due.setdefault(template_id, set()).add((due_ts, n))
+        return due
+
+    def _materialize(self, connection, due, now_ts):
+        templates = connection.execute(
+            select(Expense.__table__).where(Expense.id.in_(due), Expense.recurring_parent_id.is_(None))
+        ).mappings()
+        rows, user_ids, created_at = [], set(), utcnow()
+        for template in templates:
+            frequency = template['recurring_frequency']
+            if not template['is_recurring'] or frequency not in FREQUENCIES:
+                continue
+            anchor = template['expense_date']
+            valid = [n for due_ts, n in due[template['id']]
+                     if _timestamp(occurrence(anchor, frequency, n)) == due_ts]
+            if not valid:
+                continue  # rescheduled since this entry was pushed; refresh() queued the new one
+
+            n = min(valid)
+            while _timestamp(when := occurrence(anchor, frequency, n)) <= now_ts:
+                rows.append({
+                    'amount': template['amount'],
+                    'amount_cents': template['amount_cents'],
+                    'description': template['description'],
+                    'notes': template['notes'],
+                    'expense_date': when,
+                    'payment_method': template['payment_method'],
+                    'receipt_url': template['receipt_url'],
+                    'is_recurring': False,
+                    'recurring_frequency': None,
+                    'recurring_parent_id': template['id'],
+                    'user_id': template['user_id'],
+                    'category_id': template['category_id'],
+                    'created_at': created_at,
+                    'updated_at': created_at,
+                })
+                n += 1
+            heapq.heappush(self._heap, (_timestamp(when), template['id'], n))
+            user_ids.add(template['user_id'])
+
+        inserted = 0
+        for start in range(0, len(rows), self.batch_size):
+            inserted += _insert_ignoring_duplicates(connection, rows[start:start + self.batch_size])
+        if inserted:
+            # Core inserts skip the ORM flush hook that normally bumps data versions
+            UserDataVersion.bump(user_ids, connection=connection)
+        return inserted
+
+    def tick(self, now=None):
+        """Refresh changed templates and insert every instance due by ``now``. Returns rows inserted."""
+        now = (now or utcnow()).replace(microsecond=0)
+        now_ts = _timestamp(now)
+        if not self._loaded:
+            self.load()
+        else:
+            with self.engine.begin() as connection:
+                self.refresh(connection)
+
+        inserted = 0
+        while due := self._pop_due(now_ts):
+            try:
+                with self.engine.begin() as connection:
+                    inserted += self._materialize(connection, due, now_ts)
+            except Exception:
+                for template_id, entries in due.items():
+                    for due_ts, n in entries:
+                        heapq.heappush(self._heap, (due_ts, template_id, n))
+                raise
+        return inserted
+
+    def seconds_until_due(self, now=None):
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - _timestamp(now or utcnow()), 0)
+
+    def run_forever(self, interval=60, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                inserted = self.tick()
+                if inserted:
+                    logger.info('Materialized %d recurring expenses', inserted)
+            except Exception:
+                logger.exception('Recurring expense tick failed')
+            wait = self.seconds_until_due()
+            stop_event.wait(interval if wait is None else min(interval, max(wait, 1)))
+
+
+def start_scheduler_thread(app, interval=None, batch_size=None, shard=None):
+    """Run a scheduler (of ``shard``) in a daemon thread of this process; returns (thread, stop_event)."""
+    scheduler = RecurringScheduler(batch_size or app.config.get('RECURRING_BATCH_SIZE', 500), shard)
+    stop_event = threading.Event()
+
+    def target():
+        with app.app_context():
+            scheduler.run_forever(interval or app.config.get('RECURRING_INTERVAL_SECONDS', 60), stop_event)
+
+    thread = threading.Thread(target=target, name=f"recurring-scheduler{f'-{shard}' if shard else ''}", daemon=True)
+    thread.start()
+    return thread, stop_event
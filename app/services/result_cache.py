@@ -0,0 +1,147 @@
+"""
+Per-process cache of computed analytics and budget results.
+
+With ``RESULT_CACHE_ENABLED`` the data of ``/api/analytics/*``,
+``GET /api/budgets/`` and ``/api/budgets/forecast`` is kept under
+``(shard, endpoint, normalized query, data versions)``, so the dashboards of
+the same user (web, mobile and widgets refreshing together) compute each
+aggregate once. A write bumps the user's version, which changes the key: stale
+results are never served and simply age out, least recently used first under
+``RESULT_CACHE_MAX_ENTRIES`` or after ``RESULT_CACHE_TTL_SECONDS``.
+
+Identical requests arriving while the result is being computed wait for that
+computation instead of starting their own (single flight), and get its result
+or its exception.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context, request
+
+from app.config.extensions import db
+from app.services.shared_cache import cached_versions
+from app.services.sharding import current_shard
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = self.expired = self.evictions = self.errors = 0
+
+    def get_or_compute(self, key, compute):
+        """The cached result for ``key``, else ``compute()``'s, computed once for concurrent callers."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expired += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        else:
+            self._store(key, flight.value)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._flights),
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'errors': self.errors,
+            }
+
+
+def init_result_cache(app):
+    if app.config.get('RESULT_CACHE_ENABLED'):
+        app.extensions['result_cache'] = ResultCache(
+            app.config['RESULT_CACHE_MAX_ENTRIES'], app.config['RESULT_CACHE_TTL_SECONDS'],
+        )
+
+
+def get_result_cache():
+    return current_app.extensions.get('result_cache') if has_app_context() else None
+
+
+def normalized_query():
+    """The request's query arguments, sorted and without blank values."""
+    return tuple(sorted(
+        (name, tuple(values)) for name, values in request.args.lists() if any(value != '' for value in values)
+    ))
+
+
+def cached_result(user_id, compute, extra=()):
+    """``compute()``'s result for the current request of ``user_id``, through the result cache.
+
+    ``extra`` adds whatever else the result depends on (e.g. today's date).
+    """
+    cache = get_result_cache()
+    # A session holding uncommitted writes must see them
+    if cache is None or db.session.info.get('bumped_versions') or 'unit_of_work' in db.session.info:
+        return compute()
+    # The versions conditional_get read, so the key is never newer than the data computed under it
+    versions = g.get('data_versions') or {}
+    version = versions[user_id][0] if user_id in versions else cached_versions([user_id])[user_id][0]
+    key = (current_shard(), request.endpoint, normalized_query(), user_id, version, *extra)
+    return cache.get_or_compute(key, compute)
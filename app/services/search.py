@@ -0,0 +1,92 @@
+"""
+Full-text search over expense descriptions and notes.
+
+PostgreSQL matches against the generated ``expenses.search_vector`` column
+(GIN indexed) and ranks with ``ts_rank_cd``; SQLite uses the ``expenses_fts``
+FTS5 table and ``bm25``. Every query term is prefix-matched and all terms must
+match. Results are ordered by (score desc, id desc) and paginated with an
+opaque keyset cursor, so deep pages cost the same as the first.
+"""
+import base64
+import json
+import re
+
+from sqlalchemy import Float, cast, column, func, literal_column, select, table, tuple_
+
+from app.config.extensions import db
+from app.models.expense import Expense
+
+TEXT_SEARCH_CONFIG = 'english'
+MAX_TERMS = 8
+
+# Created by migrations and DDL, not mapped on the model (so autogenerate leaves them alone)
+SEARCH_VECTOR_COLUMN = 'search_vector'
+SEARCH_VECTOR_INDEX = 'ix_expenses_search_vector'
+FTS_TABLE = 'expenses_fts'
+# FTS5 keeps its index in shadow tables named after the virtual table
+FTS_TABLES = (FTS_TABLE, *(f'{FTS_TABLE}_{suffix}' for suffix in ('data', 'idx', 'config', 'docsize', 'content')))
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+_fts = table(FTS_TABLE, column('rowid'))
+
+
+def parse_terms(q):
+    return _TERM.findall(q or '')[:MAX_TERMS]
+
+
+def encode_cursor(score, expense_id):
+    return base64.urlsafe_b64encode(json.dumps([score, expense_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, expense_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(score), int(expense_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def _postgres_matches(terms):
+    query = func.to_tsquery(TEXT_SEARCH_CONFIG, ' & '.join(f'{term}:*' for term in terms))
+    vector = literal_column('expenses.search_vector')
+    # float8 so the score survives the round trip through the cursor exactly
+    score = cast(func.ts_rank_cd(vector, query), Float)
+    return select(Expense, score.label('score')).where(vector.op('@@')(query)), score
+
+
+def _sqlite_matches(terms):
+    match = ' '.join('"{}"*'.format(term.replace('"', '')) for term in terms)
+    score = -func.bm25(literal_column('expenses_fts'))
+    stmt = (
+        select(Expense, score.label('score'))
+        .select_from(_fts)
+        .join(Expense, Expense.id == _fts.c.rowid)
+        .where(literal_column('expenses_fts').op('MATCH')(match))
+    )
+    return stmt, score
+
+
+def search_expenses(q, user_id=None, category_id=None, start_date=None, end_date=None, limit=20, cursor=None):
+    """Return (rows, next_cursor) where rows are (Expense, score) ordered by relevance."""
+    terms = parse_terms(q)
+    if not terms:
+        return [], None
+
+    dialect = db.session.get_bind().dialect.name
+    stmt, score = _postgres_matches(terms) if dialect == 'postgresql' else _sqlite_matches(terms)
+    stmt = Expense.apply_filters(
+        stmt, user_id=user_id, category_id=category_id, start_date=start_date, end_date=end_date
+    )
+    if cursor:
+        last_score, last_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(score, Expense.id) < tuple_(last_score, last_id))
+    stmt = stmt.order_by(score.desc(), Expense.id.desc()).limit(limit + 1)
+
+    rows = db.session.execute(stmt).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        expense, last_score = rows[-1]
+        next_cursor = encode_cursor(last_score, expense.id)
+    return rows, next_cursor
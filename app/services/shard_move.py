@@ -0,0 +1,183 @@
+"""
+Move a user's data to another shard while they keep using the app.
+
+``ShardMove`` copies the user's rows in passes. Each pass compares ids and
+``updated_at`` on both shards and only inserts, updates or deletes the rows
+that differ, so later passes (and a re-run after a failure) copy little. Once
+a pass writes at most one batch the user is marked ``moving_to`` in the
+directory, which makes every process answer their writes with a 503 for the
+few seconds left. After the directory TTL a last pass catches up, the user is
+re-homed on the target and, another TTL later when no process reads the old
+copy any more, the source copy is deleted with ``UserPurge``.
+
+Shared categories (``user_id`` NULL) are on every shard already, under the
+same ids (``ShardRouter.copy_shared_rows``); the moved expenses and budgets
+point at the target's shared category of the same name, created if missing.
+The last pass touches ``updated_at`` of the recurring templates so that the
+target shard's scheduler picks them up.
+"""
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from app.models.budget import Budget
+from app.models.data_version import UserDataVersion
+from app.models.expense import Expense
+from app.models.role import Category
+from app.models.user import User
+from app.services.user_purge import UserPurge
+
+logger = logging.getLogger(__name__)
+
+# (table, column naming the owner, key column) in foreign key order
+MOVED_TABLES = (
+    (User.__table__, 'id', 'id'),
+    (UserDataVersion.__table__, 'user_id', 'user_id'),
+    (Category.__table__, 'user_id', 'id'),
+    (Expense.__table__, 'user_id', 'id'),
+    (Budget.__table__, 'user_id', 'id'),
+)
+REMAPPED_TABLES = ('expenses', 'budgets')
+
+# Added to the directory TTL for requests that read the directory just before it changed
+GRACE_SECONDS = 1
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class ShardMove:
+    def __init__(self, router, user_id, target, batch_size=1000, max_passes=5, progress=None):
+        self.router = router
+        self.user_id = user_id
+        self.target = target
+        self.batch_size = batch_size
+        self.max_passes = max_passes
+        self.progress = progress or (lambda message: logger.info('User %d: %s', user_id, message))
+        self.source = None
+
+    def run(self):
+        """Copy, switch and clean up; returns the number of rows the passes wrote."""
+        placement = self.router.placement(self.user_id, fresh=True)
+        if placement is None:
+            raise ValueError(f'User {self.user_id} is not in the directory')
+        if self.target not in self.router.shards:
+            raise ValueError(f'Unknown shard {self.target}')
+        if placement.shard == self.target:
+            raise ValueError(f'User {self.user_id} is already on {self.target}')
+        if placement.moving_to not in (None, self.target):
+            raise ValueError(f'User {self.user_id} is being moved to {placement.moving_to}')
+        self.source = placement.shard
+
+        written = 0
+        for number in range(1, self.max_passes + 1):
+            copied = self.sync()
+            written += copied
+            self.progress(f'pass {number}: {copied} rows written to {self.target}')
+            if copied <= self.batch_size:
+                break
+
+        self.router.set_moving(self.user_id, self.target)
+        try:
+            # Every process now refuses the user's writes
+            time.sleep(self.router.ttl + GRACE_SECONDS)
+            copied = self.sync(final=True)
+        except BaseException:
+            self.router.set_moving(self.user_id, None)
+            raise
+        written += copied
+        self.progress(f'final pass: {copied} rows written to {self.target}')
+        self.router.place(self.user_id, self.target)
+
+        # Until every process has seen the new home, reads may still go to the source
+        time.sleep(self.router.ttl + GRACE_SECONDS)
+        deleted = UserPurge(self.user_id, self.batch_size, engine=self.router.engine(self.source)).run()
+        self.progress(f'removed the copy on {self.source}: {deleted}')
+        return written
+
+    def sync(self, final=False):
+        """Make the target's copy of the user's rows match the source; returns rows written."""
+        source_engine = self.router.engine(self.source)
+        if source_engine.dialect.name == 'postgresql':
+            # One snapshot, so no row references one the pass didn't see
+            source_engine = source_engine.execution_options(isolation_level='REPEATABLE READ')
+        with source_engine.connect() as source, self.router.engine(self.target).begin() as target:
+            with source.begin():
+                categories = self._shared_categories(source, target)
+                written, gone = 0, []
+                for table, owner, key in MOVED_TABLES:
+                    copied, stale = self._sync_table(source, target, table, owner, key, categories)
+                    written += copied
+                    gone.append((table, key, stale))
+            # Children first: expenses and budgets before the categories they reference
+            for table, key, stale in reversed(gone):
+                for chunk in _chunks(stale, self.batch_size):
+                    target.execute(delete(table).where(table.c[key].in_(chunk)))
+                written += len(stale)
+            if final:
+                self._finish(target)
+        return written
+
+    def _shared_categories(self, source, target):
+        """{source shared category id: target id}, creating the target's missing ones."""
+        table = Category.__table__
+        shared = source.execute(select(table).where(table.c.user_id.is_(None))).mappings().all()
+        existing = dict(target.execute(select(table.c.name, table.c.id).where(table.c.user_id.is_(None))).all())
+        mapping = {}
+        for row in shared:
+            if row['name'] not in existing:
+                existing[row['name']] = target.execute(
+                    insert(table).values({k: v for k, v in row.items() if k != 'id'}).returning(table.c.id)
+                ).scalar_one()
+            mapping[row['id']] = existing[row['name']]
+        return mapping
+
+    def _sync_table(self, source, target, table, owner, key, categories):
+        where = table.c[owner] == self.user_id
+        wanted = dict(source.execute(select(table.c[key], table.c.updated_at).where(where)).all())
+        present = dict(target.execute(select(table.c[key], table.c.updated_at).where(where)).all())
+        missing = [k for k in wanted if k not in present]
+        changed = [k for k in wanted if k in present and present[k] != wanted[k]]
+
+        for keys, write in ((missing, self._insert), (changed, self._update)):
+            for chunk in _chunks(keys, self.batch_size):
+                rows = [dict(row) for row in source.execute(select(table).where(table.c[key].in_(chunk))).mappings()]
+                if table.name in REMAPPED_TABLES:
+                    for row in rows:
+                        row['category_id'] = categories.get(row['category_id'], row['category_id'])
+                write(target, table, key, rows)
+        return len(missing) + len(changed), [k for k in present if k not in wanted]
+
+    @staticmethod
+    def _insert(connection, table, key, rows):
+        connection.execute(insert(table), rows)
+
+    @staticmethod
+    def _update(connection, table, key, rows):
+        connection.execute(
+            update(table).where(table.c[key] == bindparam('_key')),
+            [{**{k: v for k, v in row.items() if k != key}, '_key': row[key]} for row in rows],
+        )
+
+    def _finish(self, target):
+        expenses = Expense.__table__
+        target.execute(
+            update(expenses)
+            .where(expenses.c.user_id == self.user_id, expenses.c.is_recurring.is_(True),
+                   expenses.c.recurring_parent_id.is_(None))
+            .values(updated_at=datetime.now(timezone.utc))
+        )
+        # Newer than any version handed out by the source, so no client keeps a stale ETag
+        UserDataVersion.bump([self.user_id], connection=target)
+
+
+def drop_copy(router, user_id, shard, batch_size=1000):
+    """Delete what a failed or abandoned move left of the user on ``shard``."""
+    placement = router.placement(user_id, fresh=True)
+    if placement is not None and shard in (placement.shard, placement.moving_to):
+        raise ValueError(f'{shard} holds the live copy of user {user_id}, or is being moved to')
+    return UserPurge(user_id, batch_size, engine=router.engine(shard)).run()
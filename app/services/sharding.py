@@ -0,0 +1,390 @@
+"""
+Multi-tenant sharding: each user's data lives in one of several databases.
+
+With ``SHARD_DATABASE_URLS`` set, the main database is ``shard0`` and every
+extra URL becomes a Flask-SQLAlchemy bind ``shard1``, ``shard2``, ... All of
+them hold the full schema (``flask shards upgrade``). The ``user_directory``
+table of the main database records each user's shard: new users are placed by
+consistent hashing of their id over ``SHARD_VIRTUAL_NODES`` points per shard,
+and ``flask shards move`` / ``rebalance`` re-place them online.
+
+A ``before_request`` hook routes every request to one shard: the user comes
+from the ``user_id`` view or query argument, or, for ``/<expense_id>``-style
+URLs, from the row's owner (looked up on every shard once, then cached). The
+session's ``get_bind`` then sends all of the request's statements to that
+shard. Processes cache directory entries for ``SHARD_DIRECTORY_TTL_SECONDS``;
+moves wait that long before relying on every process having seen a change.
+
+Queries across users (``GET /api/users/``) fan out to all shards in parallel
+with ``ShardRouter.fan_out``; other listings need a ``user_id`` when sharded.
+
+Shared categories (``user_id`` NULL) are written on the main database and
+copied under the same id to every other shard (``copy_shared_rows``), so any
+user's expenses and budgets can reference them.
+"""
+import bisect
+import hashlib
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import delete, func, insert, select, update
+
+from app.config.extensions import db
+from app.models.budget import Budget
+from app.models.data_version import SHARED_SCOPE, UserDataVersion
+from app.models.expense import Expense
+from app.models.role import Category
+from app.models.user_directory import UserDirectory
+from app.services.auth import current_user_id
+from app.utils.responses import error_response
+
+DEFAULT_SHARD = 'shard0'
+
+# View arguments naming a row whose owner decides the shard
+ROUTED_ROW_ARGS = {'expense_id': Expense, 'budget_id': Budget, 'category_id': Category}
+
+# Listings that read every user's rows without a user_id; they can't be answered from one shard
+USER_SCOPED_ENDPOINTS = {
+    'api.expenses.get_expenses', 'api.expenses.search', 'api.expenses.bulk_update_expenses',
+    'api.expenses.bulk_delete_expenses', 'api.budgets.get_budgets', 'api.analytics.get_summary',
+    'api.analytics.get_histogram', 'api.analytics.get_top',
+}
+
+_READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+_OWNER_CACHE_SIZE = 100_000
+
+Placement = namedtuple('Placement', 'shard moving_to')
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hashing of user ids: adding a shard only moves the users it takes over."""
+
+    def __init__(self, shards, vnodes=64):
+        points = sorted((_hash(f'{shard}#{i}'), shard) for shard in shards for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, user_id):
+        return self._shards[bisect.bisect(self._points, _hash(str(user_id))) % len(self._points)]
+
+
+class ShardRouter:
+    def __init__(self, app):
+        self.app = app
+        self.shards = [DEFAULT_SHARD] + [f'shard{i}' for i in range(1, len(app.config['SHARD_DATABASE_URLS']) + 1)]
+        self.ring = HashRing(self.shards, app.config['SHARD_VIRTUAL_NODES'])
+        self.ttl = app.config['SHARD_DIRECTORY_TTL_SECONDS']
+        self._placements = {}
+        self._owners = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['SHARD_FAN_OUT_WORKERS'], thread_name_prefix='shard-fan-out',
+        )
+
+    @staticmethod
+    def engine(shard):
+        return db.engines[None if shard == DEFAULT_SHARD else shard]
+
+    @staticmethod
+    def _directory():
+        return db.engines[None]
+
+    @contextmanager
+    def _directory_writes(self):
+        uow = db.session.info.get('unit_of_work') if has_app_context() else None
+        if uow is not None and uow.shard == DEFAULT_SHARD:
+            # Part of the atomic batch's transaction, which already holds SQLite's write lock
+            yield uow.session.connection()
+            return
+        with self._directory().begin() as connection:
+            yield connection
+
+    # Directory
+
+    def placement(self, user_id, fresh=False):
+        """The user's ``Placement``, or None for a user the directory doesn't know."""
+        cached = None if fresh else self._placements.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        with self._directory().connect() as connection:
+            row = connection.execute(
+                select(UserDirectory.shard, UserDirectory.moving_to).where(UserDirectory.user_id == user_id)
+            ).first()
+        placement = Placement(*row) if row is not None else None
+        self._placements[user_id] = (time.monotonic() + self.ttl, placement)
+        return placement
+
+    def shard_of(self, user_id):
+        placement = self.placement(user_id)
+        # Unknown users are routed where they would be placed; their requests end in a 404
+        return placement.shard if placement is not None else self.ring.shard_for(user_id)
+
+    def find_user(self, login):
+        """The id of the user with this email or username, or None."""
+        with self._directory().connect() as connection:
+            return connection.scalar(
+                select(UserDirectory.user_id)
+                .where((UserDirectory.email == login) | (UserDirectory.username == login))
+            )
+
+    def placements(self):
+        """{user_id: shard} of every user, read from the directory."""
+        with self._directory().connect() as connection:
+            return dict(connection.execute(select(UserDirectory.user_id, UserDirectory.shard)).all())
+
+    def reserve(self, email, username):
+        """Allocate a user id and shard for a new user; returns ``(user_id, shard)``.
+
+        Raises IntegrityError when the email or username is taken on any shard.
+        Inside a unit of work the user is placed on its shard.
+        """
+        uow = db.session.info.get('unit_of_work')
+        with self._directory_writes() as connection:
+            user_id = connection.execute(
+                insert(UserDirectory).values(email=email, username=username, shard=DEFAULT_SHARD)
+                .returning(UserDirectory.user_id)
+            ).scalar_one()
+            shard = uow.shard if uow is not None else self.ring.shard_for(user_id)
+            if shard != DEFAULT_SHARD:
+                connection.execute(
+                    update(UserDirectory).where(UserDirectory.user_id == user_id).values(shard=shard)
+                )
+        self._placements[user_id] = (time.monotonic() + self.ttl, Placement(shard, None))
+        return user_id, shard
+
+    def identity(self, user_id):
+        """The ``{'email': ..., 'username': ...}`` the directory holds for the user."""
+        with self._directory().connect() as connection:
+            row = connection.execute(
+                select(UserDirectory.email, UserDirectory.username).where(UserDirectory.user_id == user_id)
+            ).first()
+        return dict(row._mapping) if row is not None else None
+
+    def rename(self, user_id, values):
+        """Change the user's email and/or username; raises IntegrityError when taken."""
+        with self._directory_writes() as connection:
+            connection.execute(update(UserDirectory).where(UserDirectory.user_id == user_id).values(**values))
+
+    def release(self, user_id):
+        """Forget a deleted user, freeing their email and username."""
+        with self._directory_writes() as connection:
+            connection.execute(delete(UserDirectory).where(UserDirectory.user_id == user_id))
+        self._placements.pop(user_id, None)
+
+    def set_moving(self, user_id, target):
+        """Mark the user as moving to ``target`` (or clear the mark with None); their writes are refused."""
+        with self._directory().begin() as connection:
+            connection.execute(
+                update(UserDirectory).where(UserDirectory.user_id == user_id)
+                .values(moving_to=target, updated_at=datetime.now(timezone.utc))
+            )
+        self._placements.pop(user_id, None)
+
+    def place(self, user_id, shard):
+        """Make ``shard`` the user's home and clear any move in progress."""
+        with self._directory().begin() as connection:
+            connection.execute(
+                update(UserDirectory).where(UserDirectory.user_id == user_id)
+                .values(shard=shard, moving_to=None, updated_at=datetime.now(timezone.utc))
+            )
+        self._placements.pop(user_id, None)
+
+    # Shared rows
+
+    def shared_row_id(self, table):
+        """An id no shard uses yet for a new shared row of ``table``, or None to let the main database's
+        sequence pick one (once ``flask shards init`` strided them, no other shard hands it out)."""
+        if self.engine(DEFAULT_SHARD).dialect.name == 'postgresql':
+            return None
+        highest = 0
+        for shard in self.shards:
+            with self.engine(shard).connect() as connection:
+                highest = max(highest, connection.scalar(select(func.coalesce(func.max(table.c.id), 0))))
+        return highest + 1
+
+    def copy_shared_rows(self, table, ids, source=None):
+        """Make rows ``ids`` of ``table`` on every other shard match the main database's, inserting,
+        updating or deleting them.
+
+        ``source`` reads the main database; by default the session, with the
+        request's uncommitted writes. The shards' transactions commit only if
+        all of them succeeded; a foreign key still pointing at a deleted row
+        raises IntegrityError.
+        """
+        source = source if source is not None else db.session.connection()
+        rows = [dict(row) for row in source.execute(select(table).where(table.c.id.in_(ids))).mappings()]
+        gone = set(ids) - {row['id'] for row in rows}
+        with ExitStack() as stack:
+            for shard in self.shards:
+                if shard == DEFAULT_SHARD:
+                    continue
+                connection = stack.enter_context(self.engine(shard).begin())
+                present = set(connection.scalars(select(table.c.id).where(table.c.id.in_(ids))))
+                if gone:
+                    connection.execute(delete(table).where(table.c.id.in_(gone)))
+                for row in rows:
+                    if row['id'] in present:
+                        connection.execute(update(table).where(table.c.id == row['id']).values(row))
+                    else:
+                        connection.execute(insert(table).values(row))
+                # Every user's cached category listings on the shard include them
+                UserDataVersion.bump([SHARED_SCOPE], connection=connection)
+
+    def restore_shared_rows(self, table, ids):
+        """Copy the main database's committed rows ``ids`` again, after a write to them rolled back."""
+        with self.engine(DEFAULT_SHARD).connect() as source:
+            self.copy_shared_rows(table, ids, source)
+
+    def sync_shared_categories(self):
+        """Copy every shared category to every shard; returns how many there are.
+
+        Shared categories a shard got under another id (by an earlier move)
+        are replaced by the copy of the same name.
+        """
+        table = Category.__table__
+        with self.engine(DEFAULT_SHARD).connect() as source:
+            shared = dict(source.execute(select(table.c.name, table.c.id).where(table.c.user_id.is_(None))).all())
+            self.copy_shared_rows(table, list(shared.values()), source)
+        for shard in self.shards:
+            if shard == DEFAULT_SHARD:
+                continue
+            with self.engine(shard).begin() as connection:
+                strays = connection.execute(
+                    select(table.c.id, table.c.name)
+                    .where(table.c.user_id.is_(None), table.c.id.not_in(list(shared.values())))
+                ).all()
+                for stray_id, name in strays:
+                    if name not in shared:
+                        continue
+                    for model in (Expense, Budget):
+                        UserDataVersion.bump(
+                            connection.scalars(select(model.user_id.distinct()).where(model.category_id == stray_id)),
+                            connection=connection,
+                        )
+                        connection.execute(
+                            update(model).where(model.category_id == stray_id).values(category_id=shared[name])
+                        )
+                    connection.execute(delete(table).where(table.c.id == stray_id))
+        return len(shared)
+
+    # Fan-out
+
+    def fan_out(self, fn, shards=None):
+        """Run ``fn(shard)`` on each shard in parallel with the session routed there; returns {shard: result}.
+
+        Each call has an app context (and so a session) of its own.
+        """
+        app = current_app._get_current_object()
+
+        def run(shard):
+            with app.app_context():
+                route_to(shard)
+                return fn(shard)
+
+        futures = {shard: self._executor.submit(run, shard) for shard in shards or self.shards}
+        return {shard: future.result() for shard, future in futures.items()}
+
+    def owner_of(self, model, row_id):
+        """The user owning a row, looked up on every shard; None for a missing or shared row."""
+        key = (model.__tablename__, row_id)
+        owner = self._owners.get(key)
+        if owner is not None:
+            return owner
+
+        found = self.fan_out(
+            lambda shard: db.session.execute(select(model.user_id).where(model.id == row_id)).first()
+        )
+        owners = [(shard, row[0]) for shard, row in found.items() if row is not None]
+        if not owners:
+            return None
+        # A user being moved (or the leftovers of a move) has rows on two shards; the home copy counts
+        home = [user_id for shard, user_id in owners if user_id is not None and self.shard_of(user_id) == shard]
+        owner = home[0] if home else owners[0][1]
+        if owner is not None:
+            # Rows never change owner
+            if len(self._owners) >= _OWNER_CACHE_SIZE:
+                self._owners.clear()
+            self._owners[key] = owner
+        return owner
+
+
+def get_shard_router():
+    """The app's ``ShardRouter``, or None when sharding is off."""
+    return current_app.extensions.get('shard_router') if has_app_context() else None
+
+
+def shard_names(app=None):
+    """Every shard's name; just the main database when sharding is off."""
+    router = (app or current_app).extensions.get('shard_router')
+    return list(router.shards) if router is not None else [DEFAULT_SHARD]
+
+
+def shard_engine(shard):
+    return ShardRouter.engine(shard or DEFAULT_SHARD)
+
+
+def current_shard():
+    return g.get('shard', DEFAULT_SHARD) if has_app_context() else DEFAULT_SHARD
+
+
+def current_engine():
+    return (g.get('shard_engine') if has_app_context() else None) or db.engine
+
+
+def route_to(shard):
+    """Send the app context's further queries to ``shard``."""
+    g.shard = shard
+    g.shard_engine = None if shard == DEFAULT_SHARD else ShardRouter.engine(shard)
+
+
+def _route_request():
+    router = current_app.extensions['shard_router']
+    view_args = request.view_args or {}
+
+    user_id = view_args.get('user_id') or current_user_id()
+    if user_id is None:
+        for arg, model in ROUTED_ROW_ARGS.items():
+            if arg in view_args:
+                user_id = router.owner_of(model, view_args[arg])
+                break
+
+    uow = db.session.info.get('unit_of_work')
+    if user_id is None:
+        if request.endpoint in USER_SCOPED_ENDPOINTS:
+            return error_response("user_id is required when data is sharded", status_code=400)
+        # Users created in an atomic batch are placed on its shard
+        shard = uow.shard if uow is not None else DEFAULT_SHARD
+    else:
+        placement = router.placement(user_id)
+        shard = placement.shard if placement is not None else router.ring.shard_for(user_id)
+        if placement is not None and placement.moving_to and request.method not in _READ_METHODS:
+            response, status_code = error_response(
+                "User is being moved to another shard, retry shortly", status_code=503
+            )
+            response.headers['Retry-After'] = str(max(int(router.ttl), 1))
+            return response, status_code
+
+    if uow is not None and uow.shard != shard:
+        return error_response(
+            "An atomic batch can only touch one shard; pass its user_id to /api/batch", status_code=409
+        )
+    route_to(shard)
+
+
+def init_sharding(app):
+    """Register the shard binds and request routing; call before ``db.init_app``."""
+    urls = app.config.get('SHARD_DATABASE_URLS')
+    if not urls:
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds.update({f'shard{i}': url for i, url in enumerate(urls, 1)})
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['shard_router'] = ShardRouter(app)
+    app.before_request(_route_request)
@@ -0,0 +1,490 @@
+"""
+Cache shared by every worker process of a host, in a memory-mapped file.
+
+With ``SHARED_CACHE_ENABLED`` the hot read-side aggregates (users' data
+versions, category lists, budget spending) are kept in one fixed-size hash
+table in ``SHARED_CACHE_PATH`` (``/dev/shm`` when available), so the 8-16
+workers of a host compute each of them once instead of once per worker.
+
+The table has ``SHARED_CACHE_SLOTS`` slots of ``SHARED_CACHE_SLOT_BYTES``. A
+key may sit in any of the ``PROBE_SLOTS`` slots after its hash; values that
+don't fit a slot are not cached. Readers take no lock: every slot starts with
+a sequence number that a writer makes odd while it rewrites the slot, and a
+read is retried when the number was odd or changed while the slot was copied
+(a seqlock). Writers serialize on a ``lockf`` lock of the file plus a thread
+lock. When a key's slots are full, the CLOCK policy evicts the first one not
+read since the hand last passed it.
+
+Versions are invalidated when a transaction that bumped them commits, on any
+engine of this host. Other entries need no invalidation: their keys contain
+the versions they were computed from. The invalidation leaves a tombstone that
+refuses values read before it (plus ``INVALIDATION_HOLD_SECONDS``, as the
+commit event fires just before the database commits), so a reader racing the
+writer can't put the old version back. Writes made on other hosts are only
+seen once a version expires, after ``SHARED_CACHE_VERSION_TTL_SECONDS``.
+
+Hits and misses are counted per namespace in a row of the file owned by each
+process, so ``GET /health/shared-cache`` reports the whole host.
+
+Whatever can write the file decides what every worker reads, so it must be
+this user's alone: the default path is in a directory only the user can enter,
+and a file owned by someone else, or open to other users, is refused. Values
+are stored as JSON (tuples come back as lists, datetimes as datetimes), never
+as anything that runs code when it is decoded.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config.extensions import db
+from app.models.data_version import UserDataVersion
+from app.services.sharding import current_shard, shard_names
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the shared cache stays off there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+NAMESPACES = ('versions', 'categories', 'budget_spend')
+PROBE_SLOTS = 8
+INVALIDATION_HOLD_SECONDS = 1.0
+
+_MAGIC = b'ETSC'
+_LAYOUT_VERSION = 2
+_HEADER = struct.Struct('<4sIIIQQ')       # magic, layout, slots, slot bytes, clock hand, evictions
+_HEADER_BYTES = 64
+_CLOCK_HAND, _EVICTIONS = 4, 5
+_STATS_ROWS = 256
+_COUNTERS = ('hits', 'misses', 'invalidations')
+_STATS_ROW = struct.Struct(f'<Q{len(NAMESPACES) * len(_COUNTERS)}Q')   # pid, counters
+_SLOT = struct.Struct('<QQdBBHI')         # seq, key hash, expires, state, referenced, key length, value length
+_SEQ = struct.Struct('<Q')
+_REFERENCED = 25                          # offset of the reference bit, set by readers without the lock
+_EMPTY, _VALUE, _TOMBSTONE = 0, 1, 2
+_READ_RETRIES = 16
+
+MISSING = object()
+
+
+def _key_bytes(namespace, key):
+    return f'{namespace}|{key!r}'.encode()
+
+
+def _hash(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    raise TypeError(f'{type(value).__name__} values cannot be kept in the shared cache')
+
+
+def _decode_object(value):
+    if len(value) == 1:
+        if '$datetime' in value:
+            return datetime.fromisoformat(value['$datetime'])
+        if '$date' in value:
+            return date.fromisoformat(value['$date'])
+    return value
+
+
+def _dumps(value):
+    return json.dumps(value, default=_encode_default, separators=(',', ':')).encode()
+
+
+def _loads(data):
+    return json.loads(data, object_hook=_decode_object)
+
+
+def _check_private(fd, path, kind):
+    """Refuse ``path`` unless this user owns it and no one else may write (or read) it."""
+    info = os.fstat(fd)
+    if info.st_uid != os.geteuid():
+        raise PermissionError(f'Shared cache {kind} {path} is owned by another user (uid {info.st_uid})')
+    if info.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError(f'Shared cache {kind} {path} is open to other users (mode {stat.filemode(info.st_mode)})')
+
+
+def private_directory(parent):
+    """This user's directory for cache files under ``parent``, created 0700 and checked."""
+    path = os.path.join(parent, f'expense-tracker-{os.geteuid()}')
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    # O_NOFOLLOW: a symlink planted in its place is refused, not followed
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+    try:
+        _check_private(fd, path, 'directory')
+    finally:
+        os.close(fd)
+    return path
+
+
+def default_path(app):
+    """A file per database and table layout, in this user's private directory of ``/dev/shm`` when the
+    host has it."""
+    parent = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    digest = hashlib.blake2b(repr((
+        app.config['SQLALCHEMY_DATABASE_URI'], app.config['SHARED_CACHE_SLOTS'],
+        app.config['SHARED_CACHE_SLOT_BYTES'], NAMESPACES, _LAYOUT_VERSION,
+    )).encode(), digest_size=6).hexdigest()
+    return os.path.join(private_directory(parent), f'{digest}.cache')
+
+
+class SharedCache:
+    def __init__(self, path, slots=16384, slot_bytes=1024):
+        if slot_bytes <= _SLOT.size:
+            raise ValueError(f'slot_bytes must be larger than {_SLOT.size}')
+        self.path = path
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._stats_offset = _HEADER_BYTES
+        self._slots_offset = _HEADER_BYTES + _STATS_ROWS * _STATS_ROW.size
+        size = self._slots_offset + slots * slot_bytes
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            _check_private(self._fd, path, 'file')
+            if not stat.S_ISREG(os.fstat(self._fd).st_mode):
+                raise PermissionError(f'Shared cache file {path} is not a regular file')
+        except PermissionError:
+            os.close(self._fd)
+            raise
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats_row = None
+        self._stats_pid = None
+        with self._locked():
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, _LAYOUT_VERSION, slots, slot_bytes, 0, 0), 0)
+            elif os.fstat(self._fd).st_size != size:
+                raise ValueError(f'{path} holds a cache of another size')
+        self._buf = mmap.mmap(self._fd, size)
+        magic, layout, file_slots, file_slot_bytes, _, _ = _HEADER.unpack_from(self._buf, 0)
+        if (magic, layout, file_slots, file_slot_bytes) != (_MAGIC, _LAYOUT_VERSION, slots, slot_bytes):
+            raise ValueError(f'{path} holds a cache of another layout')
+        # A forked worker gets fresh locks and a stats row of its own
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats_row = None
+
+    @contextmanager
+    def _locked(self):
+        # lockf excludes other processes, the thread lock this one's other threads
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _advance_header(self, field):
+        header = list(_HEADER.unpack_from(self._buf, 0))
+        header[field] += 1
+        _HEADER.pack_into(self._buf, 0, *header)
+        return header[field] - 1
+
+    # Slots
+
+    def _window(self, key_hash):
+        start = key_hash % self.slots
+        return [self._slots_offset + (start + i) % self.slots * self.slot_bytes for i in range(PROBE_SLOTS)]
+
+    def _read_slot(self, offset):
+        """A consistent ``(header, payload)`` copy of the slot, or None when writers kept changing it."""
+        buf = self._buf
+        limit = self.slot_bytes - _SLOT.size
+        for _ in range(_READ_RETRIES):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            header = _SLOT.unpack_from(buf, offset)
+            length = min(header[5] + header[6], limit)
+            payload = buf[offset + _SLOT.size:offset + _SLOT.size + length]
+            if _SEQ.unpack_from(buf, offset)[0] == seq:
+                return header, payload
+        return None
+
+    def _write_slot(self, offset, key_hash, expires, state, key=b'', value=b''):
+        # Callers hold the write lock
+        seq = _SEQ.unpack_from(self._buf, offset)[0]
+        _SEQ.pack_into(self._buf, offset, seq + 1)
+        self._buf[offset + _SLOT.size:offset + _SLOT.size + len(key) + len(value)] = key + value
+        _SLOT.pack_into(self._buf, offset, seq + 1, key_hash, expires, state, 0, len(key), len(value))
+        _SEQ.pack_into(self._buf, offset, seq + 2)
+
+    def _find(self, window, key_hash, key):
+        for offset in window:
+            _, slot_hash, expires, state, _, key_length, _ = _SLOT.unpack_from(self._buf, offset)
+            if state != _EMPTY and slot_hash == key_hash and \
+                    self._buf[offset + _SLOT.size:offset + _SLOT.size + key_length] == key:
+                return offset, state, expires
+        return None, _EMPTY, 0.0
+
+    def _victim(self, window, now):
+        """An empty or expired slot of the window, else the CLOCK choice (None if all are held tombstones)."""
+        for offset in window:
+            _, _, expires, state, _, _, _ = _SLOT.unpack_from(self._buf, offset)
+            if state == _EMPTY or expires <= now:
+                return offset
+        hand = self._advance_header(_CLOCK_HAND)
+        order = [window[(hand + i) % PROBE_SLOTS] for i in range(PROBE_SLOTS)]
+        # Second chance: clear the reference bits on the way round, evict the first one already clear
+        for offset in order + order:
+            _, _, _, state, referenced, _, _ = _SLOT.unpack_from(self._buf, offset)
+            if state == _TOMBSTONE:
+                continue
+            if referenced:
+                self._buf[offset + _REFERENCED] = 0
+                continue
+            self._advance_header(_EVICTIONS)
+            return offset
+        return None
+
+    # Entries
+
+    def get(self, namespace, key):
+        """The cached value, or ``MISSING``."""
+        key = _key_bytes(namespace, key)
+        key_hash = _hash(key)
+        now = time.time()
+        for offset in self._window(key_hash):
+            copied = self._read_slot(offset)
+            if copied is None:
+                continue
+            (_, slot_hash, expires, state, referenced, key_length, value_length), payload = copied
+            if state != _VALUE or slot_hash != key_hash or expires <= now or payload[:key_length] != key:
+                continue
+            try:
+                value = _loads(payload[key_length:key_length + value_length])
+            except ValueError:  # torn by an eviction after the copy was checked; treat as a miss
+                return MISSING
+            if not referenced:
+                self._buf[offset + _REFERENCED] = 1
+            return value
+        return MISSING
+
+    def set(self, namespace, key, value, ttl, read_at=None):
+        """Cache ``value`` for ``ttl`` seconds; False when it doesn't fit or was invalidated after ``read_at``."""
+        key = _key_bytes(namespace, key)
+        value = _dumps(value)
+        if _SLOT.size + len(key) + len(value) > self.slot_bytes:
+            return False
+        key_hash = _hash(key)
+        window = self._window(key_hash)
+        with self._locked():
+            now = time.time()
+            offset, state, expires = self._find(window, key_hash, key)
+            if state == _TOMBSTONE and read_at is not None and expires > read_at:
+                return False
+            if offset is None:
+                offset = self._victim(window, now)
+                if offset is None:
+                    return False
+            self._write_slot(offset, key_hash, now + ttl, _VALUE, key, value)
+        return True
+
+    def invalidate(self, namespace, keys, hold=INVALIDATION_HOLD_SECONDS):
+        """Drop ``keys`` of ``namespace``; values read up to ``hold`` seconds from now are refused."""
+        keys = [_key_bytes(namespace, key) for key in keys]
+        if not keys:
+            return
+        with self._locked():
+            until = time.time() + hold
+            for key in keys:
+                key_hash = _hash(key)
+                window = self._window(key_hash)
+                offset, _, _ = self._find(window, key_hash, key)
+                if offset is None:
+                    offset = self._victim(window, until - hold)
+                if offset is not None:
+                    self._write_slot(offset, key_hash, until, _TOMBSTONE, key)
+        self.count(namespace, 'invalidations', len(keys))
+
+    def get_or_load(self, namespace, key, loader, ttl):
+        value = self.get(namespace, key)
+        if value is not MISSING:
+            self.count(namespace, 'hits')
+            return value
+        self.count(namespace, 'misses')
+        read_at = time.time()
+        value = loader()
+        self.set(namespace, key, value, ttl, read_at)
+        return value
+
+    # Statistics
+
+    def count(self, namespace, counter, amount=1):
+        with self._stats_lock:
+            row = self._own_stats_row()
+            if row is None:
+                return
+            offset = row + 8 * (1 + NAMESPACES.index(namespace) * len(_COUNTERS) + _COUNTERS.index(counter))
+            _SEQ.pack_into(self._buf, offset, _SEQ.unpack_from(self._buf, offset)[0] + amount)
+
+    def _own_stats_row(self):
+        pid = os.getpid()
+        if self._stats_row is not None and self._stats_pid == pid:
+            return self._stats_row
+        with self._locked():
+            rows = [self._stats_offset + i * _STATS_ROW.size for i in range(_STATS_ROWS)]
+            # The row of a process that has exited is taken over, counters included
+            free = next((row for row in rows if not _alive(_SEQ.unpack_from(self._buf, row)[0])), None)
+            if free is not None:
+                _SEQ.pack_into(self._buf, free, pid)
+        self._stats_row, self._stats_pid = free, pid
+        if free is None:
+            logger.warning('Shared cache %s has no statistics row left for process %d', self.path, pid)
+        return free
+
+    def stats(self):
+        totals = {namespace: dict.fromkeys(_COUNTERS, 0) for namespace in NAMESPACES}
+        workers = 0
+        for i in range(_STATS_ROWS):
+            pid, *counters = _STATS_ROW.unpack_from(self._buf, self._stats_offset + i * _STATS_ROW.size)
+            workers += _alive(pid)
+            for n, namespace in enumerate(NAMESPACES):
+                for c, counter in enumerate(_COUNTERS):
+                    totals[namespace][counter] += counters[n * len(_COUNTERS) + c]
+        for counters in totals.values():
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_rate'] = round(counters['hits'] / lookups, 4) if lookups else None
+
+        used = tombstones = 0
+        now = time.time()
+        for i in range(self.slots):
+            _, _, expires, state, _, _, _ = _SLOT.unpack_from(self._buf, self._slots_offset + i * self.slot_bytes)
+            if state == _VALUE and expires > now:
+                used += 1
+            elif state == _TOMBSTONE and expires > now:
+                tombstones += 1
+        return {
+            'path': self.path,
+            'slots': self.slots,
+            'slot_bytes': self.slot_bytes,
+            'entries': used,
+            'tombstones': tombstones,
+            'usage_percentage': round(used / self.slots * 100, 2),
+            'evictions': _HEADER.unpack_from(self._buf, 0)[_EVICTIONS],
+            'workers': workers,
+            'namespaces': totals,
+        }
+
+
+def _alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def init_shared_cache(app):
+    if not app.config.get('SHARED_CACHE_ENABLED'):
+        return
+    if fcntl is None:
+        logger.warning('SHARED_CACHE_ENABLED is ignored: file locks are not available on this platform')
+        return
+    try:
+        app.extensions['shared_cache'] = SharedCache(
+            app.config.get('SHARED_CACHE_PATH') or default_path(app),
+            slots=app.config['SHARED_CACHE_SLOTS'],
+            slot_bytes=app.config['SHARED_CACHE_SLOT_BYTES'],
+        )
+    except OSError as e:
+        # Refused (someone else's file could feed every worker its values; a symlink isn't
+        # followed) or unusable: run without the cache instead
+        logger.error('Shared cache disabled: %s', e)
+
+
+def get_shared_cache():
+    """The host's shared cache when enabled and usable by the current session, else None.
+
+    A session that bumped versions in its open transaction reads its own
+    uncommitted data, which must neither come from nor go into the cache.
+    """
+    if not has_app_context():
+        return None
+    cache = current_app.extensions.get('shared_cache')
+    if cache is None or db.session.info.get('bumped_versions') or 'unit_of_work' in db.session.info:
+        return None
+    return cache
+
+
+def cached_versions(user_ids):
+    """``UserDataVersion.get_many`` through the shared cache."""
+    cache = get_shared_cache()
+    if cache is None:
+        return UserDataVersion.get_many(user_ids)
+    shard = current_shard()
+    versions, missing = {}, []
+    for user_id in set(user_ids):
+        value = cache.get('versions', (shard, user_id))
+        if value is MISSING:
+            missing.append(user_id)
+        else:
+            versions[user_id] = tuple(value)
+    if versions:
+        cache.count('versions', 'hits', len(versions))
+    if missing:
+        cache.count('versions', 'misses', len(missing))
+        read_at = time.time()
+        loaded = UserDataVersion.get_many(missing)
+        ttl = current_app.config['SHARED_CACHE_VERSION_TTL_SECONDS']
+        for user_id, value in loaded.items():
+            cache.set('versions', (shard, user_id), value, ttl, read_at)
+        versions.update(loaded)
+    return versions
+
+
+def cached(namespace, key, loader, scopes=()):
+    """``loader()``, cached under ``key`` and the current data versions of the users in ``scopes``."""
+    cache = get_shared_cache()
+    if cache is None:
+        return loader()
+    versions = cached_versions(scopes)
+    key = (current_shard(), *key, *(versions[scope][0] for scope in sorted(versions)))
+    return cache.get_or_load(namespace, key, loader, current_app.config['SHARED_CACHE_TTL_SECONDS'])
+
+
+@event.listens_for(Engine, 'commit')
+def _invalidate_committed_versions(connection):
+    user_ids = connection.info.pop('bumped_versions', None)
+    if not user_ids or not has_app_context():
+        return
+    cache = current_app.extensions.get('shared_cache')
+    if cache is not None:
+        # The connection's shard isn't known here; the user's key on every shard goes
+        cache.invalidate('versions', [(shard, user_id) for shard in shard_names() for user_id in user_ids])
+
+
+@event.listens_for(Engine, 'rollback')
+def _forget_rolled_back_versions(connection):
+    connection.info.pop('bumped_versions', None)
@@ -0,0 +1,132 @@
+"""
+Delete a user and everything they own without loading any of it.
+
+The foreign keys to ``users`` are ``ON DELETE CASCADE``, so deleting the user
+row removes its expenses, budgets and categories inside the database. For a
+large account that is still one long statement and transaction, so
+``UserPurge`` first deletes expenses and budgets in bounded batches, each in
+its own short transaction, and only then deletes the user row (cascading to
+whatever is left: the categories). Callers deactivate the user first; a purge
+that stops halfway leaves an inactive user and can simply be run again.
+"""
+import logging
+import threading
+
+from sqlalchemy import delete, func, select
+
+from app.config.extensions import db
+from app.models.budget import Budget
+from app.models.data_version import UserDataVersion
+from app.models.expense import Expense
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+PURGED_MODELS = (Expense, Budget)
+
+# In-process purges by user id, so a second DELETE doesn't start another and GET can report progress
+_running = {}
+_running_lock = threading.Lock()
+
+
+def owned_counts(user_id, connection=None):
+    """Rows still owned by the user, per table name."""
+    executor = connection if connection is not None else db.session
+    return {
+        model.__tablename__: executor.execute(
+            select(func.count()).select_from(model).where(model.user_id == user_id)
+        ).scalar()
+        for model in PURGED_MODELS
+    }
+
+
+class UserPurge:
+    def __init__(self, user_id, batch_size=5000, progress=None, engine=None):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.progress = progress
+        # The user's shard; also how a shard move deletes the copy it left behind
+        self.engine = engine
+        self.status = 'pending'
+        self.deleted = {model.__tablename__: 0 for model in PURGED_MODELS}
+        self.remaining = {}
+
+    def to_dict(self):
+        return {'status': self.status, 'deleted': dict(self.deleted), 'remaining': dict(self.remaining)}
+
+    def _delete_batch(self, connection, model):
+        batch = select(model.id).where(model.user_id == self.user_id).limit(self.batch_size)
+        deleted = connection.execute(
+            delete(model).where(model.user_id == self.user_id, model.id.in_(batch.scalar_subquery()))
+        ).rowcount
+        if deleted:
+            # Core deletes skip the ORM flush hook that normally bumps data versions
+            UserDataVersion.bump([self.user_id], connection=connection)
+        return deleted
+
+    def run(self):
+        """Delete the user's rows batch by batch, then the user. Returns the per-table deleted counts."""
+        self.status = 'running'
+        engine = self.engine if self.engine is not None else db.engine
+        try:
+            with engine.connect() as connection:
+                self.remaining = owned_counts(self.user_id, connection)
+            for model in PURGED_MODELS:
+                table = model.__tablename__
+                while True:
+                    with engine.begin() as connection:
+                        deleted = self._delete_batch(connection, model)
+                    if not deleted:
+                        break
+                    self.deleted[table] += deleted
+                    self.remaining[table] = max(self.remaining[table] - deleted, 0)
+                    if self.progress:
+                        self.progress(table, self.deleted[table], self.deleted[table] + self.remaining[table])
+
+            with engine.begin() as connection:
+                connection.execute(delete(User).where(User.id == self.user_id))
+                UserDataVersion.bump([self.user_id], connection=connection)
+        except Exception:
+            self.status = 'failed'
+            raise
+        self.status = 'completed'
+        return self.deleted
+
+
+def running_purge(user_id):
+    """The purge of ``user_id`` running in this process, if any."""
+    with _running_lock:
+        return _running.get(user_id)
+
+
+def start_purge_thread(app, user_id, batch_size=None, engine=None, on_complete=None):
+    """Purge ``user_id`` in a daemon thread of this process; returns the ``UserPurge``.
+
+    ``on_complete`` is called (in the app context) once the user is gone.
+    """
+    with _running_lock:
+        if user_id in _running:
+            return _running[user_id]
+
+        def progress(table, deleted, total):
+            logger.info('User %d: deleted %d/%d %s', user_id, deleted, total, table)
+
+        purge = _running[user_id] = UserPurge(
+            user_id, batch_size or app.config.get('USER_PURGE_BATCH_SIZE', 5000), progress, engine,
+        )
+
+    def target():
+        try:
+            with app.app_context():
+                purge.run()
+                if on_complete is not None:
+                    on_complete()
+            logger.info('User %d purged: %s', user_id, purge.deleted)
+        except Exception:
+            logger.exception('Purge of user %d failed', user_id)
+        finally:
+            with _running_lock:
+                _running.pop(user_id, None)
+
+    threading.Thread(target=target, name=f'user-purge-{user_id}', daemon=True).start()
+    return purge
@@ -0,0 +1,48 @@
+"""
+Column-oriented list payloads (``?format=columnar``).
+
+Instead of one object per row, a list is sent as one array per column::
+
+    {"columns": ["id", "amount"], "row_count": 2,
+     "data": {"id": [1, 2], "amount": [12.5, 3.0]}, "dictionaries": {}}
+
+Columns named in ``dictionary`` are dictionary-encoded: ``data`` holds integer
+codes into ``dictionaries[column]``, so repeated values are sent only once.
+"""
+
+
+def parse_column_list(value, allowed, default):
+    """Validate a comma-separated ``?columns=`` style argument; raises ValueError."""
+    if not value:
+        return tuple(default)
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return names
+
+
+def dictionary_encode(values):
+    """Return (distinct values in first-seen order, per-row codes)."""
+    codes_by_value = {}
+    codes = [codes_by_value.setdefault(value, len(codes_by_value)) for value in values]
+    return list(codes_by_value), codes
+
+
+def columnar_data(rows, columns, converters=None, dictionary=()):
+    """Transpose projected result ``rows`` (tuples in ``columns`` order) into a columnar payload.
+
+    ``converters`` maps a column name to a function applied to each of its
+    values (e.g. datetime to ISO string).
+    """
+    converters = converters or {}
+    data, dictionaries = {}, {}
+    row_count = 0
+    for name, values in zip(columns, zip(*rows) if rows else ((),) * len(columns)):
+        row_count = len(values)
+        convert = converters.get(name)
+        values = list(map(convert, values)) if convert else list(values)
+        if name in dictionary:
+            dictionaries[name], values = dictionary_encode(values)
+        data[name] = values
+    return {'columns': list(columns), 'row_count': row_count, 'data': data, 'dictionaries': dictionaries}
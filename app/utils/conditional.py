@@ -0,0 +1,99 @@
+import re
+import zlib
+from flask import current_app, g, request
+from app.config.extensions import db
+from app.models.data_version import SHARED_SCOPE
+from app.services.auth import may_read
+from app.services.shared_cache import cached_versions
+from app.utils.responses import vary_on_accept, wants_msgpack
+
+_TAG_USER = re.compile(r'^u(\d+)\.')
+
+
+def validator_scopes(user_id, shared=False):
+    return {user_id, SHARED_SCOPE} if shared else {user_id}
+
+
+def build_validators(user_id, versions, full_path, shared=False, msgpack=False):
+    """(etag, last_modified) for ``user_id`` given its data ``versions`` and the request's full path.
+
+    JSON and MessagePack bodies of the same data get different tags.
+    """
+    tag = f'u{user_id}.v{versions[user_id][0]}'
+    if shared:
+        tag += f'.s{versions[SHARED_SCOPE][0]}'
+    tag += f'-{zlib.crc32(full_path.encode()):08x}'
+    if msgpack:
+        tag += '-msgpack'
+    last_modified = max((updated_at for _, updated_at in versions.values() if updated_at), default=None)
+    return tag, last_modified
+
+
+def _validators(user_id, shared=False):
+    """Build (etag, last_modified) for ``user_id`` from the current data versions."""
+    versions = cached_versions(validator_scopes(user_id, shared))
+    # Reused by the result cache, whose keys must not be newer than the ETag
+    g.data_versions = {**g.get('data_versions', {}), **versions}
+    return build_validators(user_id, versions, request.full_path, shared, msgpack=wants_msgpack())
+
+
+def _not_modified(tag, last_modified):
+    response = current_app.response_class(status=304)
+    _set_headers(response, tag, last_modified)
+    return response
+
+
+def _set_headers(response, tag, last_modified):
+    response.set_etag(tag, weak=True)
+    vary_on_accept(response)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+
+
+def conditional_get(user_id=None, owner_of=None, shared=False):
+    """Answer ``If-None-Match`` from the per-user data version.
+
+    Pass ``user_id`` for list endpoints, or ``owner_of=(Model, id)`` for detail
+    endpoints. Returns a ``304`` response when the client's ETag is current,
+    otherwise ``None`` and remembers the validators for ``with_cache_validators``.
+    Versions are read before the data so an ETag is never newer than its body.
+    """
+    uow = db.session.info.get('unit_of_work')
+    if uow is not None and (uow.touched_users or db.session.info.get('bumped_versions')):
+        # The atomic batch's bumps aren't committed: after a rollback the next write
+        # reuses the version, and a tag of this body would be answered with 304
+        return None
+    if user_id is None:
+        if owner_of is None:
+            return None
+        # The ETag names its owner, so a still-valid detail tag is answered
+        # from the versions table alone, without reading the row itself
+        for tag in request.if_none_match.as_set(include_weak=True):
+            match = _TAG_USER.match(tag)
+            if match and may_read(int(match.group(1))):
+                current, last_modified = _validators(int(match.group(1)), shared)
+                if request.if_none_match.contains_weak(current):
+                    return _not_modified(current, last_modified)
+        model, object_id = owner_of
+        row = db.session.query(model.user_id).filter(model.id == object_id).first()
+        if row is None or not may_read(row[0]):
+            return None
+        user_id = row[0] if row[0] is not None else SHARED_SCOPE
+
+    tag, last_modified = _validators(user_id, shared)
+    if request.if_none_match.contains_weak(tag):
+        return _not_modified(tag, last_modified)
+    g.cache_validators = (tag, last_modified)
+    return None
+
+
+def with_cache_validators(response):
+    """Attach the ETag/Last-Modified recorded by ``conditional_get`` to a response."""
+    validators = g.pop('cache_validators', None)
+    if validators is None:
+        return response
+    body, status_code = response if isinstance(response, tuple) else (response, 200)
+    if status_code == 200:
+        _set_headers(body, *validators)
+    return body, status_code
@@ -0,0 +1,57 @@
+"""
+Turn the IntegrityError of a write into the API's 404/409 responses.
+
+Write handlers don't look up the rows they reference or check uniqueness
+before writing; the foreign keys and unique indexes decide. Only a failed
+write pays for finding out which constraint it broke: PostgreSQL names the
+columns in the error detail, SQLite names them for unique indexes only, so a
+failed SQLite foreign key is found by probing the referenced tables.
+"""
+import re
+
+from app.config.extensions import db
+from app.utils.responses import error_response
+
+_PG_KEY = re.compile(r'Key \((?P<columns>[^)]+)\)=')
+_SQLITE_UNIQUE = re.compile(r'UNIQUE constraint failed: (?P<columns>.+)$')
+
+
+def _missing_references(table, values):
+    for key in table.foreign_keys:
+        value = values.get(key.parent.key)
+        if value is not None and db.session.execute(
+            db.select(key.column).where(key.column == value)
+        ).first() is None:
+            yield key.parent.key
+
+
+def violated_columns(error, table, values):
+    """Columns of the constraint behind ``error``, raised writing ``values`` to ``table``.
+
+    Call after rolling back. Returns an empty set when they can't be told.
+    """
+    detail = getattr(getattr(error.orig, 'diag', None), 'message_detail', None) or ''
+    match = _PG_KEY.search(detail)
+    if match:
+        return {column.strip().strip('"') for column in match['columns'].split(',')}
+    message = str(error.orig)
+    match = _SQLITE_UNIQUE.search(message)
+    if match:
+        return {column.rsplit('.', 1)[-1] for column in match['columns'].split(', ')}
+    if 'FOREIGN KEY constraint failed' in message:
+        return set(_missing_references(table, values))
+    return set()
+
+
+def integrity_error_response(error, model, values, responses):
+    """Roll back and answer with ``responses[columns]`` for the violated constraint.
+
+    ``responses`` maps a column, or a tuple of the columns of a composite key,
+    to ``(status_code, message)``; anything else is a 500 as before.
+    """
+    db.session.rollback()
+    columns = violated_columns(error, model.__table__, values)
+    for key, (status_code, message) in responses.items():
+        if columns == ({key} if isinstance(key, str) else set(key)):
+            return error_response(message, status_code=status_code)
+    return error_response(str(error), status_code=500)
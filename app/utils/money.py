@@ -0,0 +1,52 @@
+"""
+Integer minor-unit (cents) amounts.
+
+Amounts are stored, summed and optionally serialized as integer cents.
+Clients opt in with ``?amount_format=cents``; by default responses keep the
+original float ``amount`` fields, produced from the integer without going
+through ``Decimal``.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from flask import has_request_context, request
+
+_CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Exact integer cents for a Decimal/str/int/float amount (half-up to the cent)."""
+    if isinstance(value, int):
+        return value * 100
+    try:
+        amount = value if isinstance(value, Decimal) else Decimal(str(value))
+        return int(amount.quantize(_CENT, rounding=ROUND_HALF_UP) * 100)
+    except (InvalidOperation, ValueError) as e:
+        raise ValueError(f'Invalid amount: {value!r}') from e
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def resolve_cents(amount, amount_cents, required=True):
+    """Cents from whichever of ``amount`` / ``amount_cents`` a payload provided (schema helper)."""
+    if amount is not None and amount_cents is not None:
+        raise ValueError('Provide either amount or amount_cents, not both')
+    if amount is not None:
+        return to_cents(amount)
+    if amount_cents is None and required:
+        raise ValueError('amount or amount_cents is required')
+    return amount_cents
+
+
+def requested_amount_format():
+    if has_request_context() and request.args.get('amount_format') == 'cents':
+        return 'cents'
+    return 'decimal'
+
+
+def amount_fields(amount_format, **cents_by_name):
+    """Serialize ``name=cents`` pairs as ``{name}_cents`` integers or float ``name`` values."""
+    if amount_format == 'cents':
+        return {f'{name}_cents': cents for name, cents in cents_by_name.items()}
+    return {name: cents / 100 if cents is not None else 0 for name, cents in cents_by_name.items()}
@@ -1,5 +1,55 @@
-from flask import jsonify
-from typing import Any, Optional
+import zlib
+from flask import current_app, has_request_context, jsonify, request
+from functools import lru_cache
+from typing import Any, Generic, Optional, TypeVar
+from typing_extensions import TypedDict
+from pydantic import TypeAdapter
+
+try:
+    import brotli
+except ImportError:  # br is only offered when the optional brotli package is installed
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # without msgpack every response is JSON
+    msgpack = None
+
+T = TypeVar('T')
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/msgpack', 'text/csv', 'text/plain', 'text/html'}
+
+
+class Envelope(TypedDict, Generic[T]):
+    success: bool
+    message: str
+    data: T
+
+
+@lru_cache(maxsize=None)
+def envelope_adapter(data_type):
+    """TypeAdapter for the response envelope around ``data_type``, built once per type."""
+    return TypeAdapter(Envelope[data_type])
+
+def wants_msgpack():
+    """True when the client prefers MessagePack (``Accept: application/msgpack``) over JSON."""
+    if msgpack is None or not has_request_context():
+        return False
+    return request.accept_mimetypes.best_match(('application/json', *MSGPACK_MIMETYPES)) in MSGPACK_MIMETYPES
+
+def vary_on_accept(response):
+    """Mark ``response`` as chosen by ``Accept`` (JSON or MessagePack), for caches in between."""
+    if msgpack is not None:
+        response.vary.add('Accept')
+    return response
+
+def _msgpack_response(payload):
+    body = msgpack.packb(payload, default=current_app.json.default)
+    return current_app.response_class(body, mimetype='application/msgpack')
+
+def _render(payload):
+    return vary_on_accept(_msgpack_response(payload) if wants_msgpack() else jsonify(payload))
 
 def success_response(data: Any = None, message: str = "Success", status_code: int = 200):
     response = {
@@ -7,7 +57,16 @@ def success_response(data: Any = None, message: str = "Success", status_code: in
         "message": message,
         "data": data
     }
-    return jsonify(response), status_code
+    return _render(response), status_code
+
+def serialized_response(data_type, data: Any = None, message: str = "Success", status_code: int = 200):
+    """Like ``success_response``, but ``data`` (ORM objects) is read and encoded by
+    pydantic-core through the cached adapter for ``data_type``."""
+    adapter = envelope_adapter(data_type)
+    envelope = adapter.validate_python({'success': True, 'message': message, 'data': data}, from_attributes=True)
+    if wants_msgpack():
+        return vary_on_accept(_msgpack_response(adapter.dump_python(envelope, mode='json'))), status_code
+    return vary_on_accept(current_app.response_class(adapter.dump_json(envelope), mimetype='application/json')), status_code
 
 def error_response(message: str = "Error occurred", errors: Optional[dict] = None, status_code: int = 400):
     response = {
@@ -15,13 +74,107 @@ def error_response(message: str = "Error occurred", errors: Optional[dict] = Non
         "message": message,
         "errors": errors
     }
-    return jsonify(response), status_code
+    return _render(response), status_code
 
 def created_response(data: Any = None, message: str = "Resource created successfully"):
     return success_response(data, message, 201)
 
+def created_serialized_response(data_type, data: Any = None, message: str = "Resource created successfully"):
+    return serialized_response(data_type, data, message, 201)
+
 def not_found_response(message: str = "Resource not found"):
     return error_response(message, status_code=404)
 
+def _jsonable_error(error):
+    if error.get('ctx'):
+        error = {**error, 'ctx': {key: str(value) for key, value in error['ctx'].items()}}
+    if isinstance(error.get('input'), bytes):
+        error = {**error, 'input': error['input'].decode('utf-8', 'replace')}
+    return error
+
 def validation_error_response(errors: dict, message: str = "Validation failed"):
-    return error_response(message, errors, 422)
\ No newline at end of file
+    if isinstance(errors, list):
+        # Pydantic puts the exception raised by custom validators in ctx, and the raw
+        # body in input for invalid JSON; jsonify can encode neither
+        errors = [_jsonable_error(error) for error in errors]
+    return error_response(message, errors, 422)
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compressor(encoding, config):
+    if encoding == 'br':
+        return _BrotliCompressor(config['COMPRESSION_BROTLI_QUALITY'])
+    return _GzipCompressor(config['COMPRESSION_LEVEL'])
+
+def negotiate_encoding(accept_encodings):
+    """Content coding to use for a parsed ``Accept-Encoding`` header, or None."""
+    offered = ('br', 'gzip') if brotli is not None else ('gzip',)
+    return accept_encodings.best_match(offered)
+
+def compress_body(body, encoding, config):
+    compressor = _compressor(encoding, config)
+    return compressor.compress(body) + compressor.finish()
+
+def _compressed_stream(chunks, compressor):
+    # Compresses lazily as the wrapped iterable yields, so streamed bodies stay streamed
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if compressed:
+                yield compressed
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def compress_response(response):
+    """``after_request`` hook: gzip/br-encode the body when the client accepts it.
+
+    Fully built bodies are compressed only from ``COMPRESSION_MIN_SIZE`` bytes;
+    streamed bodies, whose size is unknown, are always compressed chunk by chunk.
+    """
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compressed_stream(response.response, _compressor(encoding, current_app.config))
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < current_app.config['COMPRESSION_MIN_SIZE']:
+            return response
+        response.set_data(compress_body(body, encoding, current_app.config))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_response_encoding(app):
+    if app.config.get('COMPRESSION_ENABLED'):
+        app.after_request(compress_response)
@@ -0,0 +1,140 @@
+"""
+All-or-nothing unit of work across several request handlers.
+
+Inside ``unit_of_work()`` the scoped ``db.session`` is replaced by a session
+joined to one outer database transaction. Handlers keep calling
+``db.session.commit()``; each commit only releases a SAVEPOINT. When the
+block ends, everything is committed together, or rolled back if the block
+raised or called ``uow.rollback()``.
+
+``transactional`` is the same idea for a single write handler: the handler
+only executes, and one commit follows its response.
+
+With sharding the unit of work runs on the shard its request is routed to.
+"""
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+from app.config.extensions import db
+from app.utils.responses import error_response
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionSession(Session):
+    # Flask-SQLAlchemy's session always picks the engine; this one stays on the joined connection
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return self.bind
+
+
+class UnitOfWork:
+    def __init__(self, session, shard):
+        self.session = session
+        self.shard = shard
+        self.rolled_back = False
+        self.touched_users = set()
+
+    def rollback(self):
+        """Discard everything done in this unit of work when it ends."""
+        self.rolled_back = True
+
+    def _record_commit(self, session):
+        self.touched_users.update(session.info.get('bumped_versions') or ())
+
+
+def on_rollback(callback):
+    """Call ``callback`` if the write in progress ends up rolled back.
+
+    For side effects outside the request's transaction (the sharding
+    directory); ``transactional`` and ``unit_of_work`` run or drop them.
+    """
+    db.session.info.setdefault('rollback_callbacks', []).append(callback)
+
+
+def _run_rollback_callbacks(session):
+    for callback in session.info.pop('rollback_callbacks', ()):
+        try:
+            callback()
+        except Exception:
+            logger.exception('Rollback callback failed')
+
+
+@contextmanager
+def unit_of_work():
+    from app.services.sharding import current_engine, current_shard
+    connection = current_engine().connect()
+    transaction = connection.begin()
+    if connection.dialect.name == 'sqlite':
+        # pysqlite only opens its transaction lazily, and a SAVEPOINT outside
+        # one would commit on release
+        connection.exec_driver_sql('BEGIN')
+    session = ConnectionSession(db, bind=connection, query_cls=db.Query, join_transaction_mode='create_savepoint')
+    uow = UnitOfWork(session, current_shard())
+    session.info['unit_of_work'] = uow
+    event.listen(session, 'after_commit', uow._record_commit)
+    registry = db.session.registry
+    previous = registry() if registry.has() else None
+    registry.set(session)
+    try:
+        yield uow
+        if uow.rolled_back:
+            transaction.rollback()
+        else:
+            session.commit()
+            transaction.commit()
+    except BaseException:
+        uow.rolled_back = True
+        transaction.rollback()
+        raise
+    finally:
+        if previous is not None:
+            registry.set(previous)
+        else:
+            registry.clear()
+        if uow.rolled_back:
+            _run_rollback_callbacks(session)
+        session.close()
+        connection.close()
+        if uow.rolled_back and uow.touched_users:
+            # The handlers' commits already reached the per-process expense cache
+            from app.services.expense_cache import get_expense_cache
+            cache = get_expense_cache()
+            if cache is not None:
+                cache.invalidate(uow.touched_users)
+
+
+def _rollback():
+    db.session.rollback()
+    _run_rollback_callbacks(db.session())
+
+
+def transactional(view):
+    """Commit once after ``view`` returns a success response, roll back otherwise.
+
+    The response is built before the commit, from the rows as written, so
+    nothing is reloaded after it.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            response = view(*args, **kwargs)
+        except BaseException:
+            _rollback()
+            raise
+        status_code = response[1] if isinstance(response, tuple) else 200
+        if status_code >= 400:
+            _rollback()
+            return response
+        try:
+            db.session.commit()
+        except Exception as e:
+            _rollback()
+            return error_response(str(e), status_code=500)
+        if 'unit_of_work' not in db.session.info:
+            db.session.info.pop('rollback_callbacks', None)
+        return response
+    return wrapper
@@ -0,0 +1,6 @@
+import os
+from app import create_app
+from app.asgi import create_asgi_app
+
+config_name = os.environ.get('FLASK_ENV', 'production')
+application = create_asgi_app(create_app(config_name))
@@ -0,0 +1,90 @@
+"""
+Run the benchmark suite.
+
+    python -m benchmarks run --output results.json
+    python -m benchmarks run --filter endpoints. --rounds 10
+    python -m benchmarks compare baseline.json results.json --threshold 10
+
+The database comes from the ``benchmark`` config (``BENCHMARK_DATABASE_URL``,
+SQLite by default).
+"""
+import argparse
+import fnmatch
+import json
+import sys
+
+from benchmarks import bench_analytics, bench_endpoints, bench_models, bench_schemas, bench_shared_cache  # noqa: F401 (registers benchmarks)
+from benchmarks.harness import REGISTRY, compare_results, load_results, run_benchmarks
+
+
+def _select(patterns):
+    if not patterns:
+        return sorted(REGISTRY)
+    return sorted(key for key in REGISTRY if any(
+        fnmatch.fnmatch(key, p) or key.startswith(p) for p in patterns
+    ))
+
+
+def cmd_list(args):
+    for key in _select(args.filter):
+        print(key)
+
+
+def cmd_run(args):
+    from benchmarks.env import build_env
+
+    selected = _select(args.filter)
+    if not selected:
+        sys.exit('No benchmarks match the given filter')
+    env = build_env(users=args.users, expenses_per_user=args.expenses_per_user, reuse=args.reuse)
+    print(f"⏱️  Running {len(selected)} benchmarks...")
+    results = run_benchmarks(env, selected, rounds=args.rounds, min_round_time=args.min_time)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+
+def cmd_compare(args):
+    rows = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    regressions = 0
+    for name, before, after, change, flag in rows:
+        before_text = f"{before * 1e6:>12.1f}" if before is not None else f"{'-':>12}"
+        change_text = f"{change:>+8.1f}%" if change is not None else f"{'':>9}"
+        print(f"{name:<48} {before_text} µs -> {after * 1e6:>12.1f} µs {change_text} {flag}")
+        regressions += flag == 'regression'
+    if regressions:
+        sys.exit(f"{regressions} benchmark(s) regressed by more than {args.threshold}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = sub.add_parser('list', help='List available benchmarks')
+    list_parser.add_argument('--filter', action='append', help='Glob or prefix of benchmark names')
+    list_parser.set_defaults(func=cmd_list)
+
+    run_parser = sub.add_parser('run', help='Run benchmarks')
+    run_parser.add_argument('--filter', action='append', help='Glob or prefix of benchmark names')
+    run_parser.add_argument('--output', help='Write JSON results to this file')
+    run_parser.add_argument('--rounds', type=int, default=20)
+    run_parser.add_argument('--min-time', type=float, default=0.05, help='Minimum seconds per round')
+    run_parser.add_argument('--users', type=int, default=20)
+    run_parser.add_argument('--expenses-per-user', type=int, default=500)
+    run_parser.add_argument('--reuse', action='store_true', help='Reuse an already seeded database')
+    run_parser.set_defaults(func=cmd_run)
+
+    compare_parser = sub.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help='Percent change reported as a regression/improvement')
+    compare_parser.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
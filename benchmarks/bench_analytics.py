@@ -0,0 +1,61 @@
+from app.api.analytics_controller import _group_totals
+from app.services.expense_cache import ExpenseCache, load_columns
+from app.services.result_cache import ResultCache
+from benchmarks.harness import benchmark
+
+
+def _analytics_request(env, url, cached, results=False):
+    cache = ExpenseCache(256 * 1024 * 1024) if cached else None
+    result_cache = ResultCache() if results else None
+
+    def fn():
+        if cache is not None:
+            env.app.extensions['expense_cache'] = cache
+        if result_cache is not None:
+            env.app.extensions['result_cache'] = result_cache
+        try:
+            response = env.client.get(url)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        finally:
+            env.app.extensions.pop('expense_cache', None)
+            env.app.extensions.pop('result_cache', None)
+    return fn
+
+
+@benchmark('analytics')
+def bench_summary_by_category_uncached(env):
+    return _analytics_request(env, f'/api/analytics/summary?user_id={env.user_id}&group_by=category', cached=False)
+
+
+@benchmark('analytics')
+def bench_summary_by_category_cached(env):
+    return _analytics_request(env, f'/api/analytics/summary?user_id={env.user_id}&group_by=category', cached=True)
+
+
+@benchmark('analytics')
+def bench_summary_by_category_result_cache(env):
+    return _analytics_request(
+        env, f'/api/analytics/summary?user_id={env.user_id}&group_by=category', cached=True, results=True,
+    )
+
+
+@benchmark('analytics')
+def bench_budgets_forecast_result_cache(env):
+    return _analytics_request(env, f'/api/budgets/forecast?user_id={env.user_id}', cached=False, results=True)
+
+
+@benchmark('analytics')
+def bench_top_expenses_cached(env):
+    return _analytics_request(env, f'/api/analytics/top?user_id={env.user_id}&n=10', cached=True)
+
+
+@benchmark('analytics')
+def bench_histogram_cached(env):
+    return _analytics_request(env, f'/api/analytics/histogram?user_id={env.user_id}&bins=20', cached=True)
+
+
+@benchmark('analytics')
+def bench_group_totals_columns(env):
+    with env.app.app_context():
+        columns = load_columns(env.user_id)
+    return lambda: _group_totals(columns.cents, columns.categories)
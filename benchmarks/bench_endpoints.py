@@ -0,0 +1,280 @@
+import itertools
+
+from app.config.extensions import db
+from app.models.budget import Budget
+from app.models.expense import Expense
+from app.models.role import Category
+from app.models.user import User
+from benchmarks.harness import benchmark
+
+_counter = itertools.count()
+
+
+def _request(env, method, url, **kwargs):
+    def fn():
+        response = env.client.open(url, method=method, **kwargs)
+        assert response.status_code < 500, response.get_data(as_text=True)
+    return fn
+
+
+def _insert_and_delete(env, model, url, **values):
+    # DELETE needs a fresh row every iteration, so the insert is part of the timing
+    def fn():
+        with env.app.app_context():
+            row = model(**values)
+            db.session.add(row)
+            db.session.commit()
+            row_id = row.id
+        response = env.client.delete(url.format(row_id))
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return fn
+
+
+@benchmark('endpoints')
+def bench_health(env):
+    return _request(env, 'GET', '/health')
+
+
+@benchmark('endpoints')
+def bench_get_users(env):
+    return _request(env, 'GET', '/api/users/')
+
+
+@benchmark('endpoints')
+def bench_get_user(env):
+    return _request(env, 'GET', f'/api/users/{env.user_id}')
+
+
+@benchmark('endpoints')
+def bench_create_user(env):
+    def fn():
+        n = next(_counter)
+        response = env.client.post('/api/users/', json={
+            'email': f'bench{n}@example.com', 'username': f'bench_{n}', 'password': 'bench123',
+        })
+        assert response.status_code == 201, response.get_data(as_text=True)
+    return fn
+
+
+@benchmark('endpoints')
+def bench_update_user(env):
+    return _request(env, 'PUT', f'/api/users/{env.user_id}', json={'first_name': 'Bench'})
+
+
+@benchmark('endpoints')
+def bench_delete_user(env):
+    def fn():
+        n = next(_counter)
+        with env.app.app_context():
+            user = User(email=f'del{n}@example.com', username=f'del_{n}', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+        response = env.client.delete(f'/api/users/{user_id}')
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return fn
+
+
+@benchmark('endpoints')
+def bench_get_categories(env):
+    return _request(env, 'GET', f'/api/categories/?user_id={env.user_id}')
+
+
+@benchmark('endpoints')
+def bench_get_category(env):
+    return _request(env, 'GET', f'/api/categories/{env.category_id}')
+
+
+@benchmark('endpoints')
+def bench_create_category(env):
+    def fn():
+        response = env.client.post(f'/api/categories/?user_id={env.user_id}',
+                                   json={'name': f'Bench {next(_counter)}', 'color': '#123456'})
+        assert response.status_code == 201, response.get_data(as_text=True)
+    return fn
+
+
+@benchmark('endpoints')
+def bench_update_category(env):
+    return _request(env, 'PUT', f'/api/categories/{env.category_id}', json={'icon': 'bench'})
+
+
+@benchmark('endpoints')
+def bench_delete_category(env):
+    def fn():
+        with env.app.app_context():
+            category = Category(name=f'Delete {next(_counter)}', user_id=env.user_id)
+            db.session.add(category)
+            db.session.commit()
+            category_id = category.id
+        response = env.client.delete(f'/api/categories/{category_id}')
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return fn
+
+
+@benchmark('endpoints')
+def bench_get_expenses(env):
+    return _request(env, 'GET', f'/api/expenses/?user_id={env.user_id}')
+
+
+@benchmark('endpoints')
+def bench_get_expenses_gzip(env):
+    return _request(env, 'GET', f'/api/expenses/?user_id={env.user_id}', headers={'Accept-Encoding': 'gzip'})
+
+
+@benchmark('endpoints')
+def bench_get_expenses_br(env):
+    return _request(env, 'GET', f'/api/expenses/?user_id={env.user_id}', headers={'Accept-Encoding': 'br'})
+
+
+@benchmark('endpoints')
+def bench_get_expenses_msgpack(env):
+    return _request(env, 'GET', f'/api/expenses/?user_id={env.user_id}', headers={'Accept': 'application/msgpack'})
+
+
+@benchmark('endpoints')
+def bench_get_expenses_columnar(env):
+    return _request(env, 'GET', f'/api/expenses/?user_id={env.user_id}&format=columnar')
+
+
+@benchmark('endpoints')
+def bench_get_expenses_columnar_chart(env):
+    return _request(env, 'GET', f'/api/expenses/?user_id={env.user_id}&format=columnar'
+                                '&columns=expense_date,amount,category_id&dictionary=category_id')
+
+
+@benchmark('endpoints')
+def bench_get_expenses_date_range(env):
+    return _request(env, 'GET', f'/api/expenses/?user_id={env.user_id}'
+                                '&start_date=2000-01-01T00:00:00&end_date=2100-01-01T00:00:00')
+
+
+@benchmark('endpoints')
+def bench_get_expense(env):
+    return _request(env, 'GET', f'/api/expenses/{env.expense_id}')
+
+
+@benchmark('endpoints')
+def bench_create_expense(env):
+    return _request(env, 'POST', f'/api/expenses/?user_id={env.user_id}', json={
+        'amount': 12.5, 'description': 'Benchmark lunch', 'category_id': env.category_id,
+        'payment_method': 'credit_card',
+    })
+
+
+@benchmark('endpoints')
+def bench_update_expense(env):
+    return _request(env, 'PUT', f'/api/expenses/{env.expense_id}', json={'notes': 'bench'})
+
+
+@benchmark('endpoints')
+def bench_delete_expense(env):
+    return _insert_and_delete(env, Expense, '/api/expenses/{}', amount=1, description='delete me',
+                              user_id=env.user_id, category_id=env.category_id)
+
+
+def _expense_ids(env, count):
+    with env.app.app_context():
+        return db.session.scalars(
+            db.select(Expense.id).where(Expense.user_id == env.user_id).order_by(Expense.id).limit(count)
+        ).all()
+
+
+@benchmark('endpoints')
+def bench_recategorize_100_put(env):
+    expense_ids = _expense_ids(env, 100)
+
+    def fn():
+        for expense_id in expense_ids:
+            response = env.client.put(f'/api/expenses/{expense_id}', json={'category_id': env.category_id})
+            assert response.status_code == 200, response.get_data(as_text=True)
+    return fn
+
+
+@benchmark('endpoints')
+def bench_recategorize_100_bulk(env):
+    ids = ','.join(map(str, _expense_ids(env, 100)))
+    return _request(env, 'PATCH', f'/api/expenses/?ids={ids}', json={'category_id': env.category_id})
+
+
+@benchmark('endpoints')
+def bench_get_budgets(env):
+    return _request(env, 'GET', f'/api/budgets/?user_id={env.user_id}')
+
+
+@benchmark('endpoints')
+def bench_get_budget(env):
+    return _request(env, 'GET', f'/api/budgets/{env.budget_id}')
+
+
+@benchmark('endpoints')
+def bench_create_budget(env):
+    return _request(env, 'POST', f'/api/budgets/?user_id={env.user_id}', json={
+        'name': 'Bench budget', 'amount': 500, 'period': 'monthly', 'category_id': env.category_id,
+    })
+
+
+@benchmark('endpoints')
+def bench_update_budget(env):
+    return _request(env, 'PUT', f'/api/budgets/{env.budget_id}', json={'alert_threshold': 85})
+
+
+@benchmark('endpoints')
+def bench_delete_budget(env):
+    return _insert_and_delete(env, Budget, '/api/budgets/{}', name='delete me', amount=1,
+                              period='monthly', user_id=env.user_id)
+
+
+def _launch_paths(env):
+    return [f'/api/users/{env.user_id}', f'/api/categories/?user_id={env.user_id}',
+            f'/api/budgets/?user_id={env.user_id}', f'/api/expenses/?user_id={env.user_id}']
+
+
+@benchmark('endpoints')
+def bench_launch_separate(env):
+    paths = _launch_paths(env)
+
+    def fn():
+        for path in paths:
+            response = env.client.get(path)
+            assert response.status_code == 200, response.get_data(as_text=True)
+    return fn
+
+
+@benchmark('endpoints')
+def bench_launch_batch(env):
+    return _request(env, 'POST', '/api/batch', json={'requests': [{'path': path} for path in _launch_paths(env)]})
+
+
+def _revalidate(env, url):
+    etag = env.client.get(url).headers['ETag']
+
+    def fn():
+        response = env.client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304, response.status_code
+    return fn
+
+
+@benchmark('endpoints')
+def bench_get_expenses_not_modified(env):
+    return _revalidate(env, f'/api/expenses/?user_id={env.user_id}')
+
+
+@benchmark('endpoints')
+def bench_get_budgets_not_modified(env):
+    return _revalidate(env, f'/api/budgets/?user_id={env.user_id}')
+
+
+@benchmark('endpoints')
+def bench_search_expenses(env):
+    return _request(env, 'GET', f'/api/expenses/search?q=lunch&user_id={env.user_id}&limit=20')
+
+
+@benchmark('endpoints')
+def bench_get_expense_duplicates(env):
+    return _request(env, 'GET', f'/api/expenses/duplicates?user_id={env.user_id}')
+
+
+@benchmark('endpoints')
+def bench_get_budget_forecast(env):
+    return _request(env, 'GET', f'/api/budgets/forecast?user_id={env.user_id}')
@@ -0,0 +1,196 @@
+import threading
+
+from app.config.extensions import db
+from app.models.budget import Budget
+from app.models.expense import Expense
+from app.models.role import Category
+from app.models.user import User
+from app.schemas.budget_schema import BudgetResponseSchema
+from app.schemas.expense_schema import ExpenseDetailResponseSchema, ExpenseResponseSchema
+from app.services.group_commit import GroupCommitWriter
+from app.utils.responses import serialized_response, success_response
+from benchmarks.harness import benchmark
+
+
+def _in_request(env, build):
+    """Like ``_in_context`` but with a request context, which the response helpers need."""
+    if 'request_context' not in env.extra:
+        env.extra['request_context'] = env.app.test_request_context()
+        env.extra['request_context'].push()
+    return build()
+
+
+def _in_context(env, build):
+    """Run ``build`` inside a (shared) pushed app context and time what it returns."""
+    if 'app_context' not in env.extra:
+        env.extra['app_context'] = env.app.app_context()
+        env.extra['app_context'].push()
+    return build()
+
+
+@benchmark('models')
+def bench_budget_get_spent_amount(env):
+    def build():
+        budget = Budget.query.filter_by(user_id=env.user_id, category_id=None).first()
+        return budget.get_spent_amount
+    return _in_context(env, build)
+
+
+@benchmark('models')
+def bench_budget_get_spent_amount_category(env):
+    def build():
+        budget = Budget.query.filter(Budget.user_id == env.user_id, Budget.category_id.isnot(None)).first()
+        return budget.get_spent_amount
+    return _in_context(env, build)
+
+
+@benchmark('models')
+def bench_user_total_numeric(env):
+    def build():
+        query = db.session.query(db.func.sum(Expense.amount)).filter(Expense.user_id == env.user_id)
+        return query.scalar
+    return _in_context(env, build)
+
+
+@benchmark('models')
+def bench_user_total_cents(env):
+    def build():
+        query = db.session.query(db.func.sum(Expense.amount_cents)).filter(Expense.user_id == env.user_id)
+        return query.scalar
+    return _in_context(env, build)
+
+
+SAVE_BURST_THREADS = 8
+SAVE_BURST_ROWS = 25
+
+
+def _save_burst(env, writer=None):
+    """SAVE_BURST_THREADS threads each ``save()`` SAVE_BURST_ROWS new expenses at once (200 inserts per call)."""
+    if 'burst_owner' not in env.extra:
+        # A user of its own, so the growing row count doesn't skew the other benchmarks
+        with env.app.app_context():
+            user = User(email='burst@example.com', username='save_burst', password_hash='x').save()
+            category = Category(name='Burst', user_id=user.id).save()
+            env.extra['burst_owner'] = (user.id, category.id)
+    user_id, category_id = env.extra['burst_owner']
+
+    def worker(errors):
+        try:
+            with env.app.app_context():
+                for _ in range(SAVE_BURST_ROWS):
+                    Expense(amount_cents=1250, description='Burst', user_id=user_id, category_id=category_id).save()
+        except Exception as e:
+            errors.append(e)
+
+    def fn():
+        errors = []
+        if writer is not None:
+            env.app.extensions['group_commit'] = writer
+        try:
+            threads = [threading.Thread(target=worker, args=(errors,)) for _ in range(SAVE_BURST_THREADS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            env.app.extensions.pop('group_commit', None)
+        assert not errors, errors[0]
+    return fn
+
+
+@benchmark('models')
+def bench_save_burst_per_row_commit(env):
+    return _save_burst(env)
+
+
+@benchmark('models')
+def bench_save_burst_group_commit(env):
+    return _save_burst(env, GroupCommitWriter(env.app, max_batch=100, max_wait=0.002))
+
+
+@benchmark('serialization')
+def bench_expense_to_dict_100(env):
+    def build():
+        expenses = Expense.query.filter_by(user_id=env.user_id).limit(100).all()
+        return lambda: [expense.to_dict() for expense in expenses]
+    return _in_context(env, build)
+
+
+@benchmark('serialization')
+def bench_expense_to_dict_100_cents(env):
+    def build():
+        expenses = Expense.query.filter_by(user_id=env.user_id).limit(100).all()
+        return lambda: [expense.to_dict(amount_format='cents') for expense in expenses]
+    return _in_context(env, build)
+
+
+@benchmark('serialization')
+def bench_expense_to_dict_relations(env):
+    def build():
+        expense = Expense.query.get(env.expense_id)
+        return lambda: expense.to_dict(include_relations=True)
+    return _in_context(env, build)
+
+
+@benchmark('serialization')
+def bench_budget_to_dict(env):
+    def build():
+        budget = Budget.query.get(env.budget_id)
+        return budget.to_dict
+    return _in_context(env, build)
+
+
+@benchmark('serialization')
+def bench_user_to_dict(env):
+    def build():
+        user = User.query.get(env.user_id)
+        return user.to_dict
+    return _in_context(env, build)
+
+
+@benchmark('serialization')
+def bench_category_to_dict(env):
+    def build():
+        category = Category.query.get(env.category_id)
+        return category.to_dict
+    return _in_context(env, build)
+
+
+@benchmark('serialization')
+def bench_expense_response_jsonify_100(env):
+    def build():
+        expenses = Expense.query.filter_by(user_id=env.user_id).limit(100).all()
+        return lambda: success_response([expense.to_dict() for expense in expenses])[0].get_data()
+    return _in_request(env, build)
+
+
+@benchmark('serialization')
+def bench_expense_response_adapter_100(env):
+    def build():
+        expenses = Expense.query.filter_by(user_id=env.user_id).limit(100).all()
+        return lambda: serialized_response(list[ExpenseResponseSchema], expenses)[0].get_data()
+    return _in_request(env, build)
+
+
+@benchmark('serialization')
+def bench_expense_detail_response_jsonify(env):
+    def build():
+        expense = Expense.query.get(env.expense_id)
+        return lambda: success_response(expense.to_dict(include_relations=True))[0].get_data()
+    return _in_request(env, build)
+
+
+@benchmark('serialization')
+def bench_expense_detail_response_adapter(env):
+    def build():
+        expense = Expense.query.get(env.expense_id)
+        return lambda: serialized_response(ExpenseDetailResponseSchema, expense)[0].get_data()
+    return _in_request(env, build)
+
+
+@benchmark('serialization')
+def bench_budget_list_response_adapter(env):
+    def build():
+        budgets = Budget.query.filter_by(user_id=env.user_id).all()
+        return lambda: serialized_response(list[BudgetResponseSchema], budgets)[0].get_data()
+    return _in_request(env, build)
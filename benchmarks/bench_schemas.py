@@ -0,0 +1,63 @@
+import json
+
+from app.schemas.budget_schema import BudgetCreateSchema, BudgetUpdateSchema
+from app.schemas.category_schema import CategoryCreateSchema
+from app.schemas.expense_schema import ExpenseCreateSchema, ExpenseUpdateSchema
+from app.schemas.user_schema import UserCreateSchema
+from benchmarks.harness import benchmark
+
+EXPENSE = {
+    'amount': 50.00, 'description': 'Lunch at restaurant', 'notes': 'Team lunch',
+    'expense_date': '2024-01-15T12:30:00', 'payment_method': 'credit_card', 'category_id': 1,
+}
+BUDGET = {
+    'name': 'Monthly Food Budget', 'amount': 500.00, 'period': 'monthly',
+    'start_date': '2024-01-01T00:00:00', 'alert_threshold': 80, 'category_id': 1,
+}
+USER = {
+    'email': 'john@example.com', 'username': 'john_doe', 'password': 'secure123',
+    'first_name': 'John', 'last_name': 'Doe',
+}
+CATEGORY = {'name': 'Food & Dining', 'description': 'Meals', 'icon': '🍔', 'color': '#ff5733'}
+EXPENSE_BODY = json.dumps(EXPENSE).encode()
+
+
+@benchmark('schemas')
+def bench_expense_create(env):
+    return lambda: ExpenseCreateSchema(**EXPENSE)
+
+
+@benchmark('schemas')
+def bench_expense_update(env):
+    return lambda: ExpenseUpdateSchema(amount=55.0, description='Updated')
+
+
+@benchmark('schemas')
+def bench_budget_create(env):
+    return lambda: BudgetCreateSchema(**BUDGET)
+
+
+@benchmark('schemas')
+def bench_budget_update(env):
+    return lambda: BudgetUpdateSchema(amount=600.0, alert_threshold=75)
+
+
+@benchmark('schemas')
+def bench_user_create(env):
+    return lambda: UserCreateSchema(**USER)
+
+
+@benchmark('schemas')
+def bench_category_create(env):
+    return lambda: CategoryCreateSchema(**CATEGORY)
+
+
+@benchmark('schemas')
+def bench_expense_create_from_dict_body(env):
+    # The previous request path: json.loads in Python, then keyword validation
+    return lambda: ExpenseCreateSchema(**json.loads(EXPENSE_BODY))
+
+
+@benchmark('schemas')
+def bench_expense_create_from_json_body(env):
+    return lambda: ExpenseCreateSchema.model_validate_json(EXPENSE_BODY)
@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+from app.services.shared_cache import SharedCache
+from benchmarks.harness import benchmark
+
+
+def _shared_cache():
+    path = os.path.join(tempfile.gettempdir(), f'expense-tracker-bench-{os.getpid()}.cache')
+    if os.path.exists(path):
+        os.remove(path)
+    return SharedCache(path, slots=4096, slot_bytes=4096)
+
+
+def _request(env, url, cached):
+    cache = _shared_cache() if cached else None
+
+    def fn():
+        if cache is not None:
+            env.app.extensions['shared_cache'] = cache
+        try:
+            response = env.client.get(url)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        finally:
+            env.app.extensions.pop('shared_cache', None)
+    return fn
+
+
+@benchmark('shared_cache')
+def bench_get_categories_uncached(env):
+    return _request(env, f'/api/categories/?user_id={env.user_id}', cached=False)
+
+
+@benchmark('shared_cache')
+def bench_get_categories_shared_cache(env):
+    return _request(env, f'/api/categories/?user_id={env.user_id}', cached=True)
+
+
+@benchmark('shared_cache')
+def bench_get_budgets_uncached(env):
+    return _request(env, f'/api/budgets/?user_id={env.user_id}', cached=False)
+
+
+@benchmark('shared_cache')
+def bench_get_budgets_shared_cache(env):
+    return _request(env, f'/api/budgets/?user_id={env.user_id}', cached=True)
+
+
+@benchmark('shared_cache')
+def bench_shared_cache_get(env):
+    cache = _shared_cache()
+    cache.set('versions', ('shard0', env.user_id), (42, None), 300)
+
+    def fn():
+        cache.get('versions', ('shard0', env.user_id))
+    return fn
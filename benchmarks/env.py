@@ -0,0 +1,31 @@
+from app import create_app
+from app.commands.seed import seed_database
+from app.config.extensions import db
+from app.models.budget import Budget
+from app.models.expense import Expense
+from app.models.role import Category
+from app.models.user import User
+from benchmarks.harness import BenchEnv
+
+
+def build_env(users=20, expenses_per_user=500, reuse=False, echo=print):
+    """Create the benchmark app and make sure it has a seeded dataset."""
+    app = create_app('benchmark')
+    with app.app_context():
+        if not reuse:
+            db.drop_all()
+        db.create_all()
+        if not reuse or User.query.count() == 0:
+            echo(f"🌱 Seeding {users} users x {expenses_per_user} expenses...")
+            seed_database(users=users, expenses_per_user=expenses_per_user, workers=1)
+        user = User.query.order_by(User.id).first()
+        env = BenchEnv(
+            app=app,
+            client=app.test_client(),
+            user_id=user.id,
+            category_id=Category.query.filter_by(user_id=user.id).first().id,
+            expense_id=Expense.query.filter_by(user_id=user.id).first().id,
+            budget_id=Budget.query.filter_by(user_id=user.id).first().id,
+            extra={'dataset': {'users': users, 'expenses_per_user': expenses_per_user}},
+        )
+    return env
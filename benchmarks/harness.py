@@ -0,0 +1,129 @@
+"""
+Minimal micro-benchmark harness.
+
+Benchmarks register themselves with ``@benchmark(group)``. Each benchmark
+function receives the shared ``BenchEnv`` and returns a zero-argument callable
+that is timed. Results are written as JSON so two runs can be compared.
+"""
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+REGISTRY = {}
+
+
+def benchmark(group, name=None):
+    def decorator(func):
+        key = f"{group}.{name or func.__name__.removeprefix('bench_')}"
+        REGISTRY[key] = func
+        return func
+    return decorator
+
+
+@dataclass
+class BenchEnv:
+    app: object
+    client: object
+    user_id: int
+    category_id: int
+    expense_id: int
+    budget_id: int
+    extra: dict = field(default_factory=dict)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def time_callable(fn, rounds=20, min_round_time=0.05, warmup=2):
+    """Time ``fn``; each round runs enough iterations to last ``min_round_time``."""
+    for _ in range(warmup):
+        fn()
+
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_round_time or iterations >= 1 << 20:
+            break
+        iterations *= 2
+
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - started) / iterations)
+
+    median = statistics.median(samples)
+    return {
+        'unit': 's',
+        'rounds': rounds,
+        'iterations': iterations,
+        'min': min(samples),
+        'median': median,
+        'mean': statistics.fmean(samples),
+        'p95': _percentile(samples, 95),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'ops': 1 / median if median else None,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(env, selected, rounds=20, min_round_time=0.05, echo=print):
+    results = []
+    for key in selected:
+        fn = REGISTRY[key](env)
+        stats = time_callable(fn, rounds=rounds, min_round_time=min_round_time)
+        results.append({'name': key, **stats})
+        echo(f"  {key:<48} median {stats['median'] * 1e6:>12.1f} µs   p95 {stats['p95'] * 1e6:>12.1f} µs")
+    return {
+        'meta': {
+            'revision': _git_revision(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'database': env.app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+            'dataset': env.extra.get('dataset'),
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, threshold=10.0):
+    """Return rows of (name, baseline median, current median, change %, flag)."""
+    before = {r['name']: r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None:
+            rows.append((result['name'], None, result['median'], None, 'new'))
+            continue
+        change = (result['median'] - old['median']) / old['median'] * 100
+        flag = 'regression' if change > threshold else 'improvement' if change < -threshold else ''
+        rows.append((result['name'], old['median'], result['median'], change, flag))
+    return rows
+
+
+def load_results(path):
+    with open(path) as fh:
+        return json.load(fh)
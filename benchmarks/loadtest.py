@@ -0,0 +1,536 @@
+"""
+End-to-end load generator for the running API (and the Socket.IO server).
+
+    # against an already running server
+    python -m benchmarks.loadtest run --base-url http://localhost:5004 --vus 32 --duration 30
+
+    # start a local server from a config first (SQLite or Postgres via BENCHMARK_DATABASE_URL)
+    python -m benchmarks.loadtest run --spawn-server benchmark --vus 32 \\
+        --mix expense_read=70,expense_create=20,budget_dashboard=10
+
+    # include Socket.IO clients against socket_app.py
+    python -m benchmarks.loadtest run --socket-url http://localhost:5003 --socket-clients 8
+
+    # concurrency per worker: 8 sync threads vs the async read path (asgi.py),
+    # with 5ms added to every database round trip
+    python -m benchmarks.loadtest run --spawn-server benchmark --server threaded --threads 8 \\
+        --db-latency-ms 5 --vus 64 --mix expense_read=50,budget_dashboard=25,analytics_summary=25
+    python -m benchmarks.loadtest run --spawn-server benchmark --server asgi --db-latency-ms 5 --vus 64 ...
+
+    # the production server (app/server.py): 4 forked workers x 8 threads
+    python -m benchmarks.loadtest run --spawn-server benchmark --server prefork --workers 4 --threads 8 --vus 64
+
+Each virtual user (VU) runs in a thread with its own keep-alive connection and
+picks operations according to the weighted mix. Latencies are reported per
+endpoint as throughput and p50/p95/p99. Everything runs against localhost,
+with no external services involved.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+DEFAULT_MIX = 'expense_read=70,expense_create=20,budget_dashboard=10'
+
+
+class Client:
+    """A tiny keep-alive HTTP/JSON client that records one sample per request."""
+
+    def __init__(self, base_url, samples, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.samples = samples
+        self.conn = None
+
+    def request(self, method, path, label, body=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+            if response.will_close:
+                self.conn.close()
+                self.conn = None
+        except (OSError, http.client.HTTPException):
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            data, status = b'', 0
+        self.samples.append((label, time.perf_counter() - started, status))
+        return status, data
+
+
+# --- operations ---------------------------------------------------------------
+# Each operation takes (client, account, rng) and issues one or more requests.
+
+def op_expense_read(client, account, rng):
+    since = (datetime.now() - timedelta(days=30)).replace(microsecond=0).isoformat()
+    if rng.random() < 0.5:
+        client.request('GET', f"/api/expenses/?user_id={account['user_id']}", 'GET /api/expenses/')
+    else:
+        client.request('GET', f"/api/expenses/?user_id={account['user_id']}&start_date={since}",
+                       'GET /api/expenses/?start_date')
+
+
+def op_expense_detail(client, account, rng):
+    if account['expense_ids']:
+        client.request('GET', f"/api/expenses/{rng.choice(account['expense_ids'])}", 'GET /api/expenses/<id>')
+
+
+def op_expense_create(client, account, rng):
+    status, data = client.request('POST', f"/api/expenses/?user_id={account['user_id']}", 'POST /api/expenses/', {
+        'amount': round(rng.lognormvariate(3, 0.7), 2),
+        'description': rng.choice(['Lunch', 'Taxi', 'Groceries', 'Coffee', 'Books']),
+        'payment_method': rng.choice(['cash', 'credit_card', 'debit_card']),
+        'category_id': rng.choice(account['category_ids']),
+    })
+    if status == 201 and len(account['expense_ids']) < 1000:
+        account['expense_ids'].append(json.loads(data)['data']['id'])
+
+
+def op_budget_dashboard(client, account, rng):
+    client.request('GET', f"/api/budgets/?user_id={account['user_id']}", 'GET /api/budgets/')
+    client.request('GET', f"/api/categories/?user_id={account['user_id']}", 'GET /api/categories/')
+
+
+def op_analytics_summary(client, account, rng):
+    client.request('GET', f"/api/analytics/summary?user_id={account['user_id']}&group_by=category",
+                   'GET /api/analytics/summary')
+
+
+def _launch_paths(account):
+    user_id = account['user_id']
+    return [f'/api/users/{user_id}', f'/api/categories/?user_id={user_id}', f'/api/budgets/?user_id={user_id}',
+            f'/api/expenses/?user_id={user_id}']
+
+
+def op_app_launch(client, account, rng):
+    # What the mobile app fetches at startup, one round trip per call...
+    for path in _launch_paths(account):
+        client.request('GET', path, 'launch (separate)')
+
+
+def op_app_launch_batch(client, account, rng):
+    # ...and the same calls in one POST /api/batch
+    client.request('POST', '/api/batch', 'launch (batch)', {
+        'requests': [{'path': path} for path in _launch_paths(account)],
+    })
+
+
+def op_user_profile(client, account, rng):
+    client.request('GET', f"/api/users/{account['user_id']}", 'GET /api/users/<id>')
+
+
+def op_health(client, account, rng):
+    client.request('GET', '/health', 'GET /health')
+
+
+OPERATIONS = {
+    'expense_read': op_expense_read,
+    'expense_detail': op_expense_detail,
+    'expense_create': op_expense_create,
+    'budget_dashboard': op_budget_dashboard,
+    'analytics_summary': op_analytics_summary,
+    'app_launch': op_app_launch,
+    'app_launch_batch': op_app_launch_batch,
+    'user_profile': op_user_profile,
+    'health': op_health,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# --- setup --------------------------------------------------------------------
+
+def bootstrap_accounts(base_url, count, user_ids=None):
+    """Create (or look up) the accounts the virtual users act as."""
+    client = Client(base_url, [])
+    tag = uuid.uuid4().hex[:8]
+    accounts = []
+    for n in range(count):
+        if user_ids:
+            user_id = user_ids[n % len(user_ids)]
+        else:
+            status, data = client.request('POST', '/api/users/', 'setup', {
+                'email': f'load_{tag}_{n}@example.com', 'username': f'load_{tag}_{n}', 'password': 'load1234',
+            })
+            if status != 201:
+                raise SystemExit(f"Could not create load test user: {status} {data[:200]!r}")
+            user_id = json.loads(data)['data']['id']
+            client.request('POST', f'/api/categories/?user_id={user_id}', 'setup', {'name': 'Load test'})
+            client.request('POST', f'/api/budgets/?user_id={user_id}', 'setup', {
+                'name': 'Monthly', 'amount': 1000, 'period': 'monthly',
+                'start_date': datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat(),
+            })
+        status, data = client.request('GET', f'/api/categories/?user_id={user_id}', 'setup')
+        category_ids = [c['id'] for c in json.loads(data)['data']] if status == 200 else []
+        if not category_ids:
+            raise SystemExit(f"User {user_id} has no categories to create expenses in")
+        accounts.append({'user_id': user_id, 'category_ids': category_ids, 'expense_ids': []})
+    return accounts
+
+
+# --- workers ------------------------------------------------------------------
+
+def _http_vu(base_url, accounts, mix, deadline, think_time, samples, seed):
+    rng = random.Random(seed)
+    client = Client(base_url, samples)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        OPERATIONS[rng.choices(names, weights)[0]](client, rng.choice(accounts), rng)
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+
+
+def _socket_vu(socket_url, deadline, samples):
+    import socketio
+
+    received = threading.Event()
+    sio = socketio.Client(reconnection=False)
+    sio.on('past_24_hours', lambda data: received.set())
+    while time.perf_counter() < deadline:
+        received.clear()
+        started = time.perf_counter()
+        try:
+            sio.connect(socket_url)
+            status = 200 if received.wait(timeout=10) else 0
+        except Exception:
+            status = 0
+        samples.append(('SOCKET connect+past_24_hours', time.perf_counter() - started, status))
+        if sio.connected:
+            sio.disconnect()
+
+
+def _run_process(args):
+    """Run a share of the VUs in this process and return the raw samples."""
+    base_url, socket_url, accounts, mix, vus, socket_clients, duration, think_time, seed = args
+    samples = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_http_vu, args=(base_url, accounts, mix, deadline, think_time, samples, seed + n))
+        for n in range(vus)
+    ]
+    threads += [
+        threading.Thread(target=_socket_vu, args=(socket_url, deadline, samples)) for _ in range(socket_clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+# --- reporting ----------------------------------------------------------------
+
+def _percentile(ordered, pct):
+    return ordered[max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1)] if ordered else None
+
+
+def summarize(samples, elapsed):
+    by_label = defaultdict(list)
+    errors = defaultdict(int)
+    for label, latency, status in samples:
+        by_label[label].append(latency)
+        if status == 0 or status >= 500:
+            errors[label] += 1
+    endpoints = {}
+    for label, latencies in sorted(by_label.items()):
+        latencies.sort()
+        endpoints[label] = {
+            'requests': len(latencies),
+            'errors': errors[label],
+            'throughput_rps': len(latencies) / elapsed,
+            'p50_ms': _percentile(latencies, 50) * 1000,
+            'p95_ms': _percentile(latencies, 95) * 1000,
+            'p99_ms': _percentile(latencies, 99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return {
+        'elapsed_s': elapsed,
+        'total_requests': total,
+        'total_errors': sum(errors.values()),
+        'throughput_rps': total / elapsed if elapsed else 0,
+        'endpoints': endpoints,
+    }
+
+
+def print_report(report):
+    print(f"\n{'endpoint':<36}{'reqs':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, e in report['endpoints'].items():
+        print(f"{label:<36}{e['requests']:>8}{e['errors']:>6}{e['throughput_rps']:>10.1f}"
+              f"{e['p50_ms']:>10.2f}{e['p95_ms']:>10.2f}{e['p99_ms']:>10.2f}")
+    print(f"\nTotal: {report['total_requests']} requests, {report['total_errors']} errors, "
+          f"{report['throughput_rps']:.1f} req/s over {report['elapsed_s']:.1f}s")
+
+
+# --- local server -------------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(base_url, timeout=30):
+    client = Client(base_url, [])
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.request('GET', '/health', 'setup')[0] == 200:
+            return
+        time.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} did not become healthy")
+
+
+class _DelayProxy:
+    """TCP proxy in front of the database that holds each reply for ``delay`` seconds.
+
+    Makes a local database answer like one across a network, so a benchmark
+    shows how a server behaves while its requests wait on I/O.
+    """
+
+    def __init__(self, upstream, delay):
+        self.upstream = upstream  # (host, port), or a Unix socket path
+        self.delay = delay
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _connect_upstream(self):
+        if isinstance(self.upstream, str):
+            upstream = socket.socket(socket.AF_UNIX)
+            upstream.connect(self.upstream)
+            return upstream
+        return socket.create_connection(self.upstream)
+
+    def _accept(self):
+        while True:
+            client, _ = self.listener.accept()
+            upstream = self._connect_upstream()
+            waiting = threading.Event()
+            threading.Thread(target=self._pump, args=(client, upstream, waiting, False), daemon=True).start()
+            threading.Thread(target=self._pump, args=(upstream, client, waiting, True), daemon=True).start()
+
+    def _pump(self, source, target, waiting, delayed):
+        try:
+            while data := source.recv(65536):
+                if not delayed:
+                    waiting.set()
+                elif waiting.is_set():
+                    # Once per round trip, not per chunk of a long reply
+                    waiting.clear()
+                    time.sleep(self.delay)
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            # shutdown() rather than close(): a socket another pump is blocked
+            # reading from would otherwise never send its FIN
+            try:
+                target.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            source.close()
+
+    @classmethod
+    def in_front_of(cls, database_url, delay):
+        """Start a proxy for a PostgreSQL URL; returns the URL to connect through it."""
+        from sqlalchemy.engine import make_url
+
+        url = make_url(database_url)
+        if url.get_backend_name() != 'postgresql':
+            raise SystemExit('--db-latency-ms needs a PostgreSQL BENCHMARK_DATABASE_URL')
+        host = url.query.get('host') or url.host or 'localhost'
+        port = url.port or 5432
+        upstream = f'{host}/.s.PGSQL.{port}' if host.startswith('/') else (host, port)
+        proxy = cls(upstream, delay)
+        return url.set(host='127.0.0.1', port=proxy.port, query={
+            key: value for key, value in url.query.items() if key != 'host'
+        }).render_as_string(hide_password=False)
+
+
+def _pooled_server(host, port, app, threads):
+    """A werkzeug server with a fixed pool of ``threads`` workers, like one threaded WSGI worker."""
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.pool = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    return PooledWSGIServer(host, port, app)
+
+
+def cmd_serve(args):
+    from werkzeug.serving import run_simple
+    from app import create_app
+    from app.config.extensions import db
+
+    app = create_app(args.config, start_background=args.server != 'prefork')
+    with app.app_context():
+        db.create_all()
+    if args.server == 'prefork':
+        from app.server import serve
+
+        serve(app, bind=[f'{args.host}:{args.port}'], workers=args.workers or None, threads=args.threads or None,
+              accesslog=None, loglevel='warning')
+    elif args.server == 'asgi':
+        import uvicorn
+        from app.asgi import create_asgi_app
+
+        uvicorn.run(create_asgi_app(app), host=args.host, port=args.port, log_level='warning')
+    elif args.threads:
+        _pooled_server(args.host, args.port, app, args.threads).serve_forever()
+    else:
+        run_simple(args.host, args.port, app, threaded=True, use_reloader=False, use_debugger=False)
+
+
+def cmd_run(args):
+    server = None
+    base_url = args.base_url
+    if args.spawn_server:
+        port = _free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ)
+        if args.db_latency_ms:
+            env['BENCHMARK_DATABASE_URL'] = _DelayProxy.in_front_of(
+                os.environ.get('BENCHMARK_DATABASE_URL', ''), args.db_latency_ms / 1000,
+            )
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.loadtest', 'serve', '--config', args.spawn_server, '--port', str(port),
+             '--server', args.server, '--threads', str(args.threads), '--workers', str(args.workers)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env,
+        )
+    try:
+        _wait_for(base_url)
+        user_ids = None
+        if args.user_ids:
+            start, _, end = args.user_ids.partition('-')
+            user_ids = list(range(int(start), int(end or start) + 1))
+        accounts = bootstrap_accounts(base_url, args.accounts, user_ids)
+        print(f"🚦 {args.vus} VUs x {args.processes} process(es), {args.socket_clients} socket clients, "
+              f"{args.duration}s, mix {args.mix}")
+
+        per_process = [args.vus // args.processes + (n < args.vus % args.processes) for n in range(args.processes)]
+        sockets = [args.socket_clients // args.processes + (n < args.socket_clients % args.processes)
+                   for n in range(args.processes)]
+        tasks = [
+            (base_url, args.socket_url, accounts, args.mix, per_process[n], sockets[n], args.duration,
+             args.think_time, args.seed + n * 10_000)
+            for n in range(args.processes)
+        ]
+        started = time.perf_counter()
+        if args.processes == 1:
+            samples = _run_process(tasks[0])
+        else:
+            with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+                samples = list(itertools.chain.from_iterable(pool.map(_run_process, tasks)))
+        report = summarize(samples, time.perf_counter() - started)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report['config'] = {
+        'base_url': base_url, 'vus': args.vus, 'processes': args.processes, 'duration_s': args.duration,
+        'mix': args.mix, 'socket_clients': args.socket_clients, 'think_time_s': args.think_time,
+        'cpu_count': os.cpu_count(),
+    }
+    if args.spawn_server:
+        report['config'].update(server=args.server, threads=args.threads, workers=args.workers,
+                                db_latency_ms=args.db_latency_ms)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"📄 Report written to {args.output}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadtest')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='Drive load against the API')
+    run_parser.add_argument('--base-url', default='http://localhost:5004')
+    run_parser.add_argument('--spawn-server', metavar='CONFIG',
+                            help='Start a local server with this config (e.g. benchmark)')
+    run_parser.add_argument('--server', choices=('threaded', 'asgi', 'prefork'), default='threaded',
+                            help='Spawned server: threaded WSGI, asgi.py with the async read path, '
+                                 'or the forked gunicorn workers of app/server.py')
+    run_parser.add_argument('--threads', type=int, default=0,
+                            help='Worker threads of the spawned threaded server (default: one per connection), '
+                                 'or per prefork worker (default SERVER_THREADS)')
+    run_parser.add_argument('--workers', type=int, default=0,
+                            help='Processes of the spawned prefork server (default: one per core)')
+    run_parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Add this much latency to each database round trip of the spawned server '
+                                 '(PostgreSQL BENCHMARK_DATABASE_URL)')
+    run_parser.add_argument('--vus', type=int, default=16, help='Concurrent HTTP virtual users')
+    run_parser.add_argument('--processes', type=int, default=1, help='Generator processes to spread VUs over')
+    run_parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    run_parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                            help=f'Weighted operations (default {DEFAULT_MIX}); available: {", ".join(OPERATIONS)}')
+    run_parser.add_argument('--accounts', type=int, default=10, help='Distinct users the VUs act as')
+    run_parser.add_argument('--user-ids', help='Use existing (seeded) users instead, e.g. 1-100')
+    run_parser.add_argument('--think-time', type=float, default=0, help='Mean seconds between a VU\'s operations')
+    run_parser.add_argument('--socket-url', default='http://localhost:5003')
+    run_parser.add_argument('--socket-clients', type=int, default=0, help='Concurrent Socket.IO clients')
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--output', help='Write the JSON report to this file')
+    run_parser.set_defaults(func=cmd_run)
+
+    serve_parser = sub.add_parser('serve', help='Run a local server for load testing')
+    serve_parser.add_argument('--config', default='benchmark')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5004)
+    serve_parser.add_argument('--server', choices=('threaded', 'asgi', 'prefork'), default='threaded')
+    serve_parser.add_argument('--threads', type=int, default=0)
+    serve_parser.add_argument('--workers', type=int, default=0)
+    serve_parser.set_defaults(func=cmd_serve)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
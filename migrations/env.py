@@ -5,6 +5,9 @@ from flask import current_app
 
 from alembic import context
 
+from app.services import partitions, search
+from app.services.online_migrations import INTERNAL_TABLES
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -16,6 +19,10 @@ logger = logging.getLogger('alembic.env')
 
 
 def get_engine():
+    # `flask db upgrade -x shard=shard1` (or `flask shards upgrade`) migrates a shard database
+    shard = context.get_x_argument(as_dictionary=True).get('shard')
+    if shard and shard != 'shard0':
+        return current_app.extensions['migrate'].db.engines[shard]
     try:
         # this works with Flask-SQLAlchemy<3 and Alchemical
         return current_app.extensions['migrate'].db.get_engine()
@@ -90,9 +97,25 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # Skip what the database has beyond the models on purpose: backfill_checkpoints (the
+    # migration helpers' own), the partitions of expenses with the parent's indexes, and
+    # the full-text search index (SQLite's FTS5 tables, PostgreSQL's search_vector)
+    def include_object(object, name, type_, reflected, compare_to):
+        if not reflected or compare_to is not None:
+            return True
+        if type_ == 'table':
+            return not (name in INTERNAL_TABLES or name in search.FTS_TABLES or partitions.is_partition_name(name))
+        if type_ == 'index':
+            return name not in (*partitions.PARENT_INDEXES, search.SEARCH_VECTOR_INDEX)
+        if type_ == 'column':
+            return not (object.table.name == 'expenses' and name == search.SEARCH_VECTOR_COLUMN)
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
@@ -0,0 +1,29 @@
+"""Add user data versions
+
+Revision ID: 3f1c2a7b9d4e
+Revises: e8d8bf241dcd
+Create Date: 2026-10-19 09:12:41.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7b9d4e'
+down_revision = 'e8d8bf241dcd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_data_versions',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_data_versions')
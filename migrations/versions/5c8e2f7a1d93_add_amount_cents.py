@@ -0,0 +1,33 @@
+"""Add integer amount_cents to expenses and budgets
+
+Revision ID: 5c8e2f7a1d93
+Revises: d4e7a91c3b58
+Create Date: 2026-10-19 18:22:47.905311
+
+The column is added nullable, a metadata-only change that doesn't rewrite
+the tables. The next revision fills it from amount in batches and then makes
+it NOT NULL.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e2f7a1d93'
+down_revision = 'd4e7a91c3b58'
+branch_labels = None
+depends_on = None
+
+TABLES = ('expenses', 'budgets')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('amount_cents', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('amount_cents')
@@ -0,0 +1,99 @@
+"""Partition expenses by month on expense_date
+
+Revision ID: 7a2d4c1e8b90
+Revises: 3f1c2a7b9d4e
+Create Date: 2026-10-19 11:40:03.117392
+
+Converts ``expenses`` into a PostgreSQL declarative range-partitioned table
+with one partition per month plus a default partition. The primary key
+becomes (id, expense_date) because it must contain the partition key; ids
+still come from the same sequence. Other databases are left unchanged.
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services import partitions
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2d4c1e8b90'
+down_revision = '3f1c2a7b9d4e'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 12
+
+COLUMNS = """
+    amount NUMERIC(10, 2) NOT NULL,
+    description VARCHAR(200) NOT NULL,
+    notes TEXT,
+    expense_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    payment_method VARCHAR(50),
+    receipt_url VARCHAR(255),
+    is_recurring BOOLEAN,
+    recurring_frequency VARCHAR(20),
+    user_id INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    id INTEGER NOT NULL DEFAULT nextval('expenses_id_seq'),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+"""
+
+COLUMN_NAMES = (
+    'amount, description, notes, expense_date, payment_method, receipt_url, is_recurring, '
+    'recurring_frequency, user_id, category_id, id, created_at, updated_at'
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE expenses RENAME TO expenses_unpartitioned')
+    op.execute('ALTER INDEX expenses_pkey RENAME TO expenses_unpartitioned_pkey')
+    op.execute('ALTER SEQUENCE expenses_id_seq OWNED BY NONE')
+
+    op.execute(f"""
+        CREATE TABLE expenses ({COLUMNS},
+            CONSTRAINT expenses_pkey PRIMARY KEY (id, expense_date),
+            CONSTRAINT expenses_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id),
+            CONSTRAINT expenses_category_id_fkey FOREIGN KEY (category_id) REFERENCES categories (id)
+        ) PARTITION BY RANGE (expense_date)
+    """)
+    op.execute('ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id')
+    op.execute(f'CREATE TABLE {partitions.DEFAULT_PARTITION} PARTITION OF expenses DEFAULT')
+    op.create_index('ix_expenses_user_id_expense_date', 'expenses', ['user_id', 'expense_date'])
+    op.create_index('ix_expenses_category_id', 'expenses', ['category_id'])
+
+    oldest = bind.execute(sa.text('SELECT min(expense_date) FROM expenses_unpartitioned')).scalar()
+    partitions.ensure_partitions(
+        bind, months_ahead=MONTHS_AHEAD, start=oldest or datetime.now(timezone.utc)
+    )
+
+    op.execute(f'INSERT INTO expenses ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM expenses_unpartitioned')
+    op.execute('DROP TABLE expenses_unpartitioned')
+    op.execute('ANALYZE expenses')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE expenses RENAME TO expenses_partitioned')
+    op.execute('ALTER INDEX expenses_pkey RENAME TO expenses_partitioned_pkey')
+    op.execute('ALTER SEQUENCE expenses_id_seq OWNED BY NONE')
+    op.execute(f"""
+        CREATE TABLE expenses ({COLUMNS},
+            CONSTRAINT expenses_pkey PRIMARY KEY (id),
+            CONSTRAINT expenses_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id),
+            CONSTRAINT expenses_category_id_fkey FOREIGN KEY (category_id) REFERENCES categories (id)
+        )
+    """)
+    op.execute('ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id')
+    op.execute(f'INSERT INTO expenses ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM expenses_partitioned')
+    op.execute('DROP TABLE expenses_partitioned CASCADE')
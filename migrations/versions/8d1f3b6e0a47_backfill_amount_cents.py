@@ -0,0 +1,58 @@
+"""Fill amount_cents from amount and make it NOT NULL
+
+Revision ID: 8d1f3b6e0a47
+Revises: 5c8e2f7a1d93
+Create Date: 2026-10-19 18:31:09.214836
+
+Filled in batches (see app.services.online_migrations) rather than with one
+UPDATE in the migration's transaction, which would hold the rows of expenses
+and budgets locked against the application's writes until it committed. Rows
+the application writes meanwhile already have amount_cents and are left alone.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.expense import SQLITE_FTS_DDL
+from app.services.online_migrations import Backfill, set_not_null
+
+
+# revision identifiers, used by Alembic.
+revision = '8d1f3b6e0a47'
+down_revision = '5c8e2f7a1d93'
+branch_labels = None
+depends_on = None
+
+TABLES = ('expenses', 'budgets')
+AMOUNT_CENTS = {'amount_cents': 'CAST(ROUND(amount * 100) AS BIGINT)'}
+
+EXPENSES_AMOUNT_CENTS = Backfill('expenses_amount_cents', 'expenses', AMOUNT_CENTS, where='amount_cents IS NULL')
+BUDGETS_AMOUNT_CENTS = Backfill('budgets_amount_cents', 'budgets', AMOUNT_CENTS, where='amount_cents IS NULL')
+
+
+def _set_nullable(nullable):
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite can't alter a column: the tables are rebuilt, which drops the FTS triggers
+        for table in TABLES:
+            with op.batch_alter_table(table, recreate='always') as batch_op:
+                batch_op.alter_column('amount_cents', existing_type=sa.BigInteger(), nullable=nullable)
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        return
+    for table in TABLES:
+        if nullable:
+            op.alter_column(table, 'amount_cents', existing_type=sa.BigInteger(), nullable=True)
+        else:
+            set_not_null(table, 'amount_cents')
+
+
+def upgrade():
+    EXPENSES_AMOUNT_CENTS.run()
+    BUDGETS_AMOUNT_CENTS.run()
+    _set_nullable(False)
+
+
+def downgrade():
+    _set_nullable(True)
+    EXPENSES_AMOUNT_CENTS.reset()
+    BUDGETS_AMOUNT_CENTS.reset()
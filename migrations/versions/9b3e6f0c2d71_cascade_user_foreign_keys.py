@@ -0,0 +1,67 @@
+"""Delete a user's expenses, budgets and categories with ON DELETE CASCADE
+
+Revision ID: 9b3e6f0c2d71
+Revises: 8d1f3b6e0a47
+Create Date: 2026-10-19 20:05:31.640218
+
+Recreates the three foreign keys to ``users`` with ``ON DELETE CASCADE`` so
+that deleting a user no longer needs the ORM to load and delete every child
+row. On PostgreSQL the budgets and categories keys are added ``NOT VALID`` and
+validated afterwards, which only takes a lock that lets writes continue; the
+partitioned ``expenses`` table does not support ``NOT VALID`` keys. SQLite
+cannot alter a constraint, so its three tables are rebuilt (the unnamed keys
+are matched through a naming convention) and the FTS triggers put back.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.expense import SQLITE_FTS_DDL
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e6f0c2d71'
+down_revision = '8d1f3b6e0a47'
+branch_labels = None
+depends_on = None
+
+TABLES = ('expenses', 'budgets', 'categories')
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def _recreate_foreign_keys(ondelete):
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # Rebuilding a referenced table drops it. Outside a transaction the keys can be
+        # switched off (the pragma is a no-op inside one); inside, their check is deferred to commit
+        op.execute('PRAGMA foreign_keys = OFF')
+        op.execute('PRAGMA defer_foreign_keys = ON')
+        for table in TABLES:
+            name = f'{table}_user_id_fkey'
+            with op.batch_alter_table(table, recreate='always', naming_convention=NAMING_CONVENTION) as batch_op:
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, 'users', ['user_id'], ['id'], ondelete=ondelete)
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        op.execute('PRAGMA foreign_keys = ON')
+        return
+
+    for table in TABLES:
+        name = f'{table}_user_id_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        if table == 'expenses' or bind.dialect.name != 'postgresql':
+            op.create_foreign_key(name, table, 'users', ['user_id'], ['id'], ondelete=ondelete)
+        else:
+            op.execute(
+                f'ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY (user_id) REFERENCES users (id)'
+                + (f' ON DELETE {ondelete}' if ondelete else '') + ' NOT VALID'
+            )
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+
+
+def upgrade():
+    _recreate_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _recreate_foreign_keys(None)
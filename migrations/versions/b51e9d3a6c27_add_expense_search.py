@@ -0,0 +1,49 @@
+"""Add full-text search over expense descriptions and notes
+
+Revision ID: b51e9d3a6c27
+Revises: 7a2d4c1e8b90
+Create Date: 2026-10-19 14:05:52.804113
+
+PostgreSQL: a stored generated tsvector column with a GIN index.
+SQLite: an external-content FTS5 table kept in sync by triggers.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.expense import SQLITE_FTS_DDL
+from app.services.search import TEXT_SEARCH_CONFIG
+
+
+# revision identifiers, used by Alembic.
+revision = 'b51e9d3a6c27'
+down_revision = '7a2d4c1e8b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(f"""
+            ALTER TABLE expenses ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '') || ' ' || coalesce(notes, ''))
+            ) STORED
+        """)
+        op.create_index('ix_expenses_search_vector', 'expenses', ['search_vector'], postgresql_using='gin')
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO expenses_fts(expenses_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_expenses_search_vector', table_name='expenses')
+        op.drop_column('expenses', 'search_vector')
+    elif dialect == 'sqlite':
+        for trigger in ('expenses_fts_ai', 'expenses_fts_ad', 'expenses_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS expenses_fts')
@@ -0,0 +1,39 @@
+"""Add the user directory for sharding
+
+Revision ID: c6a1f4e9b2d8
+Revises: 9b3e6f0c2d71
+Create Date: 2026-10-19 22:14:08.377512
+
+The directory is only read in the main database; on shards the table stays
+empty. ``flask shards init`` fills it from the existing users.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a1f4e9b2d8'
+down_revision = '9b3e6f0c2d71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_directory',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('shard', sa.String(length=32), nullable=False),
+    sa.Column('moving_to', sa.String(length=32), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_index(op.f('ix_user_directory_shard'), 'user_directory', ['shard'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_user_directory_shard'), table_name='user_directory')
+    op.drop_table('user_directory')
@@ -0,0 +1,38 @@
+"""Add recurring expense instances
+
+Revision ID: d4e7a91c3b58
+Revises: b51e9d3a6c27
+Create Date: 2026-10-19 16:40:12.381907
+
+Instances generated from a recurring template point back to it through
+recurring_parent_id. It is a plain column rather than a foreign key because
+the partitioned expenses table has a composite (id, expense_date) primary key.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e7a91c3b58'
+down_revision = 'b51e9d3a6c27'
+branch_labels = None
+depends_on = None
+
+TEMPLATE_PREDICATE = sa.text('is_recurring AND recurring_parent_id IS NULL')
+
+
+def upgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recurring_parent_id', sa.Integer(), nullable=True))
+        batch_op.create_index('uq_expenses_recurring_parent_id_expense_date',
+                              ['recurring_parent_id', 'expense_date'], unique=True)
+        batch_op.create_index('ix_expenses_recurring_templates', ['updated_at'],
+                              postgresql_where=TEMPLATE_PREDICATE, sqlite_where=TEMPLATE_PREDICATE)
+
+
+def downgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.drop_index('ix_expenses_recurring_templates')
+        batch_op.drop_index('uq_expenses_recurring_parent_id_expense_date')
+        batch_op.drop_column('recurring_parent_id')
@@ -0,0 +1,35 @@
+"""Add the token revocation list
+
+Revision ID: e2b7d94a5c13
+Revises: c6a1f4e9b2d8
+Create Date: 2026-10-19 23:41:52.104387
+
+Read from the main database only; on shards the table stays empty.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7d94a5c13'
+down_revision = 'c6a1f4e9b2d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('token_revocations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=32), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_token_revocations_expires_at'), 'token_revocations', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_token_revocations_expires_at'), table_name='token_revocations')
+    op.drop_table('token_revocations')
@@ -0,0 +1,34 @@
+"""Index expenses by user, category and date for budget spending
+
+Revision ID: f4c9a2e7d1b6
+Revises: e2b7d94a5c13
+Create Date: 2026-10-20 09:12:36.582047
+
+Built with CREATE INDEX CONCURRENTLY (per partition on PostgreSQL), so writes
+to expenses go on while it runs. amount_cents is included so the sums are
+answered from the index.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c9a2e7d1b6'
+down_revision = 'e2b7d94a5c13'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_expenses_user_id_category_id_expense_date'
+
+
+def upgrade():
+    create_index_concurrently(
+        INDEX, 'expenses', ['user_id', 'category_id', 'expense_date'], include=['amount_cents'],
+    )
+
+
+def downgrade():
+    drop_index_concurrently(INDEX, 'expenses')
@@ -1,12 +1,10 @@
 import os
 from app import create_app
 
-config_name = os.environ.get('FLASK_ENV', 'development')
+# Also the app of the flask CLI (FLASK_APP=run.py); production is served by `python -m app.server`
+config_name = os.environ.get('FLASK_ENV', 'production')
 app = create_app(config_name)
 
-from app.api import bp as api_bp
-from app.api.health_controller import bp as health_bp
-app.register_blueprint(api_bp, url_prefix='/api')
-app.register_blueprint(health_bp, url_prefix='/')
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5004)
\ No newline at end of file
+    # Flask's single-process development server: FLASK_ENV=development python run.py
+    app.run(debug=app.config['DEBUG'], host='0.0.0.0', port=5004)
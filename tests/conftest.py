@@ -0,0 +1,74 @@
+import pytest
+
+from app import create_app
+from app.config.config import TestConfig
+from app.config.extensions import db
+
+
+@pytest.fixture
+def app_config():
+    """Settings over TestConfig for the app of a test; modules override it to enable features."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, app_config):
+    # A database file rather than :memory:, so every connection and thread sees the same data
+    monkeypatch.setattr(TestConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    for name, value in app_config.items():
+        monkeypatch.setattr(TestConfig, name, value)
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(client):
+    """Create a user through the API and return its id."""
+    def make_user(username, password='secret123', **fields):
+        response = client.post('/api/users/', json={
+            'email': f'{username}@example.com', 'username': username, 'password': password, **fields,
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['data']['id']
+    return make_user
+
+
+@pytest.fixture
+def make_category(client):
+    def make_category(user_id, name='Food'):
+        response = client.post(f'/api/categories/?user_id={user_id}', json={'name': name})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['data']['id']
+    return make_category
+
+
+@pytest.fixture
+def make_expense(client):
+    def make_expense(user_id, category_id, amount='12.50', description='Lunch', **fields):
+        response = client.post(f'/api/expenses/?user_id={user_id}', json={
+            'amount': amount, 'description': description, 'category_id': category_id, **fields,
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['data']['id']
+    return make_expense
+
+
+@pytest.fixture
+def login(client):
+    """Log in and return the Authorization header for the token."""
+    def login(username, password='secret123'):
+        response = client.post('/api/auth/login', json={'login': username, 'password': password})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': f"Bearer {response.get_json()['data']['access_token']}"}
+    return login
@@ -0,0 +1,174 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert
+
+from app import create_app
+from app.config.extensions import db
+from app.models.token_revocation import TokenRevocation
+from app.models.user import User
+
+
+def test_login_issues_bearer_token(client, make_user):
+    make_user('alice')
+    response = client.post('/api/auth/login', json={'login': 'ALICE', 'password': 'secret123'})
+    assert response.status_code == 200
+    assert response.get_json()['data']['token_type'] == 'Bearer'
+
+
+def test_login_rejects_wrong_password(client, make_user):
+    make_user('alice')
+    response = client.post('/api/auth/login', json={'login': 'alice', 'password': 'wrong-password'})
+    assert response.status_code == 401
+
+
+def test_token_scopes_requests_to_its_user(client, make_user, make_category, make_expense, login):
+    alice, bob = make_user('alice'), make_user('bob')
+    make_expense(alice, make_category(alice))
+    make_expense(bob, make_category(bob))
+    headers = login('alice')
+
+    response = client.get('/api/expenses/', headers=headers)
+    assert response.status_code == 200
+    assert {expense['user_id'] for expense in response.get_json()['data']} == {alice}
+
+    response = client.post('/api/expenses/', headers=headers, json={
+        'amount': '3.00', 'description': 'Coffee', 'category_id': make_category(alice, 'Drinks'),
+    })
+    assert response.status_code == 201
+    assert response.get_json()['data']['user_id'] == alice
+
+
+def test_token_cannot_name_another_user(client, make_user, login):
+    make_user('alice')
+    bob = make_user('bob')
+    headers = login('alice')
+    assert client.get(f'/api/expenses/?user_id={bob}', headers=headers).status_code == 403
+    assert client.get(f'/api/users/{bob}', headers=headers).status_code == 403
+
+
+def test_other_users_expense_is_not_found(client, make_user, make_category, make_expense, login):
+    make_user('alice')
+    bob = make_user('bob')
+    expense = make_expense(bob, make_category(bob), description='Private')
+    headers = login('alice')
+
+    assert client.get(f'/api/expenses/{expense}', headers=headers).status_code == 404
+    assert client.put(f'/api/expenses/{expense}', headers=headers, json={'description': 'Changed'}).status_code == 404
+    assert client.delete(f'/api/expenses/{expense}', headers=headers).status_code == 404
+    assert client.get(f'/api/expenses/{expense}').get_json()['data']['description'] == 'Private'
+
+
+def test_other_users_etag_is_not_answered(client, make_user, make_category, make_expense, login):
+    make_user('alice')
+    bob = make_user('bob')
+    expense = make_expense(bob, make_category(bob))
+    etag = client.get(f'/api/expenses/{expense}').headers['ETag']
+
+    response = client.get(f'/api/expenses/{expense}', headers={**login('alice'), 'If-None-Match': etag})
+    assert response.status_code == 404
+
+
+def test_invalid_tokens_are_rejected(client):
+    assert client.get('/api/expenses/', headers={'Authorization': 'Bearer not-a-token'}).status_code == 401
+    response = client.get('/api/expenses/', headers={'Authorization': 'Basic abc'})
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+
+
+def test_logout_revokes_token(client, make_user, login):
+    make_user('alice')
+    headers = login('alice')
+    assert client.post('/api/auth/logout', headers=headers).status_code == 200
+    assert client.get('/api/expenses/', headers=headers).status_code == 401
+
+
+def test_logout_is_seen_by_other_processes(client, make_user, login):
+    make_user('alice')
+    headers = login('alice')
+    # Another worker: its own denylist, refreshed from the shared table
+    other = create_app('testing')
+    other.extensions['token_auth'].denylist.refresh_seconds = 0
+    assert other.test_client().get('/api/expenses/', headers=headers).status_code == 200
+
+    client.post('/api/auth/logout', headers=headers)
+    assert other.test_client().get('/api/expenses/', headers=headers).status_code == 401
+
+
+def test_deactivation_revokes_users_tokens(client, make_user, login):
+    bob = make_user('bob')
+    headers = login('bob')
+    assert client.put(f'/api/users/{bob}', json={'is_active': False}).status_code == 200
+    assert client.get('/api/expenses/', headers=headers).status_code == 401
+    response = client.post('/api/auth/login', json={'login': 'bob', 'password': 'secret123'})
+    assert response.status_code == 403
+
+    client.put(f'/api/users/{bob}', json={'is_active': True})
+    assert client.get('/api/expenses/', headers=login('bob')).status_code == 200
+
+
+def test_expired_token_is_rejected(app, client, make_user):
+    alice = make_user('alice')
+    auth = app.extensions['token_auth']
+    auth.ttl = 0.5
+    with app.app_context():
+        token = auth.issue(db.session.get(User, alice))
+    time.sleep(1.1)
+    response = client.get('/api/expenses/', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 401
+    assert 'expired' in response.get_json()['message']
+
+
+def test_auth_required_refuses_bare_user_id(app, client, make_user):
+    alice = make_user('alice')
+    app.config['AUTH_REQUIRED'] = True
+    assert client.get(f'/api/expenses/?user_id={alice}').status_code == 401
+    assert client.get('/health').status_code == 200
+    assert client.post('/api/auth/login', json={'login': 'alice', 'password': 'secret123'}).status_code == 200
+
+
+def test_failed_deactivation_keeps_tokens(client, make_user, login):
+    alice = make_user('alice')
+    make_user('bob')
+    headers = login('alice')
+
+    response = client.put(f'/api/users/{alice}', json={'is_active': False, 'email': 'bob@example.com'})
+    assert response.status_code == 409
+    assert client.get('/api/expenses/', headers=headers).status_code == 200
+    assert client.put('/api/users/999', json={'is_active': False}).status_code == 404
+    assert client.get('/api/expenses/', headers=headers).status_code == 200
+
+
+def test_deactivation_in_rolled_back_batch_keeps_tokens(client, make_user, login):
+    alice = make_user('alice')
+    headers = login('alice')
+    other = create_app('testing')
+    other.extensions['token_auth'].denylist.refresh_seconds = 0
+
+    response = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'PUT', 'path': f'/api/users/{alice}', 'body': {'is_active': False}},
+        {'path': '/api/nope'},
+    ]})
+    assert response.get_json()['data']['committed'] is False
+    assert client.get('/api/expenses/', headers=headers).status_code == 200
+    assert other.test_client().get('/api/expenses/', headers=headers).status_code == 200
+
+
+def test_revocation_committed_behind_newer_ones_is_seen(app, make_user, login):
+    alice, bob = make_user('alice'), make_user('bob')
+    headers = login('alice')
+    other = create_app('testing')
+    other.extensions['token_auth'].denylist.refresh_seconds = 0
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    expires_at = now + timedelta(hours=1)
+
+    with app.app_context():
+        db.session.execute(insert(TokenRevocation).values(id=10, user_id=bob, revoked_at=now, expires_at=expires_at))
+        db.session.commit()
+    assert other.test_client().get('/api/expenses/', headers=headers).status_code == 200
+
+    # A transaction that took the lower id commits after the row above was read
+    with app.app_context():
+        db.session.execute(insert(TokenRevocation).values(id=5, user_id=alice, revoked_at=now, expires_at=expires_at))
+        db.session.commit()
+    assert other.test_client().get('/api/expenses/', headers=headers).status_code == 401
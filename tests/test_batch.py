@@ -0,0 +1,103 @@
+def _count(client, path):
+    return len(client.get(path).get_json()['data'])
+
+
+def test_batch_runs_sub_requests_in_order(client, make_user, make_category):
+    alice = make_user('alice')
+    response = client.post('/api/batch', json={'requests': [
+        {'path': f'/api/users/{alice}'},
+        {'path': f'/api/categories/?user_id={alice}'},
+        {'path': '/api/nope'},
+    ]})
+    assert response.status_code == 200
+    responses = response.get_json()['data']['responses']
+    assert [item['status'] for item in responses] == [200, 200, 404]
+    assert responses[0]['body']['data']['username'] == 'alice'
+    assert 'ETag' in responses[1]['headers']
+
+
+def test_atomic_batch_rolls_back_on_failure(client, make_user, make_category):
+    alice = make_user('alice')
+    category = make_category(alice)
+    etag = client.get(f'/api/expenses/?user_id={alice}').headers['ETag']
+
+    response = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': f'/api/expenses/?user_id={alice}',
+         'body': {'amount': 10, 'description': 'Taxi', 'category_id': category}},
+        {'method': 'POST', 'path': f'/api/budgets/?user_id={alice}',
+         'body': {'name': 'Monthly', 'amount': 10, 'period': 'bogus'}},
+        {'path': f'/api/users/{alice}'},
+    ]})
+    data = response.get_json()
+    assert data['message'] == 'Batch rolled back'
+    assert data['data']['committed'] is False
+    assert [item['status'] for item in data['data']['responses']] == [201, 422, 424]
+
+    assert _count(client, f'/api/expenses/?user_id={alice}') == 0
+    assert client.get(f'/api/expenses/?user_id={alice}', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_atomic_batch_commits_together(client, make_user, make_category):
+    alice = make_user('alice')
+    category = make_category(alice)
+    response = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': f'/api/expenses/?user_id={alice}',
+         'body': {'amount': 10, 'description': 'Taxi', 'category_id': category}},
+        {'method': 'POST', 'path': f'/api/budgets/?user_id={alice}',
+         'body': {'name': 'Monthly', 'amount': 10, 'period': 'monthly'}},
+    ]})
+    data = response.get_json()
+    assert data['data']['committed'] is True
+    assert [item['status'] for item in data['data']['responses']] == [201, 201]
+    assert _count(client, f'/api/expenses/?user_id={alice}') == 1
+    assert _count(client, f'/api/budgets/?user_id={alice}') == 1
+
+
+def test_batches_cannot_nest(client):
+    response = client.post('/api/batch', json={'requests': [{'method': 'POST', 'path': '/api/batch', 'body': {}}]})
+    assert response.status_code == 400
+
+
+def test_batch_size_is_limited(app, client, make_user):
+    alice = make_user('alice')
+    limit = app.config['BATCH_MAX_REQUESTS']
+    response = client.post('/api/batch', json={'requests': [{'path': f'/api/users/{alice}'}] * (limit + 1)})
+    assert response.status_code == 400
+
+
+def test_reads_after_writes_in_atomic_batch_have_no_validators(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    expense = make_expense(alice, make_category(alice))
+    path = f'/api/expenses/?user_id={alice}'
+
+    response = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'path': path},
+        {'method': 'PUT', 'path': f'/api/expenses/{expense}', 'body': {'description': 'Rolled back'}},
+        {'path': path},
+        {'path': '/api/nope'},
+    ]})
+    responses = response.get_json()['data']['responses']
+    assert 'ETag' in responses[0]['headers']
+    assert 'headers' not in responses[2]
+
+    client.put(f'/api/expenses/{expense}', json={'description': 'Committed'})
+    assert client.get(path).headers['ETag'] != responses[0]['headers']['ETag']
+    assert client.get(path).get_json()['data'][0]['description'] == 'Committed'
+
+
+def test_rolled_back_version_is_not_reused_as_a_match(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    expense = make_expense(alice, make_category(alice))
+    path = f'/api/expenses/?user_id={alice}'
+    etag = client.get(path).headers['ETag']
+
+    response = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'PUT', 'path': f'/api/expenses/{expense}', 'body': {'description': 'Rolled back'}},
+        {'path': path, 'headers': {'If-None-Match': etag}},
+        {'path': '/api/nope'},
+    ]})
+    # The batch's own read is neither a 304 for the old tag nor tagged itself
+    rolled_back_read = response.get_json()['data']['responses'][1]
+    assert rolled_back_read['status'] == 200
+    assert 'headers' not in rolled_back_read
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,68 @@
+def _expenses(client, user_id):
+    return client.get(f'/api/expenses/?user_id={user_id}').get_json()['data']
+
+
+def test_bulk_update_sets_values_and_bumps_version(client, make_user, make_category, make_expense):
+    alice, bob = make_user('alice'), make_user('bob')
+    category = make_category(alice)
+    ids = [make_expense(alice, category) for _ in range(3)]
+    make_expense(bob, make_category(bob))
+    path = f'/api/expenses/?user_id={alice}'
+    etag = client.get(path).headers['ETag']
+    bob_etag = client.get(f'/api/expenses/?user_id={bob}').headers['ETag']
+
+    response = client.patch(f"/api/expenses/?ids={ids[0]},{ids[1]}", json={'description': 'Groceries'})
+    assert response.status_code == 200
+    assert response.get_json()['data']['updated'] == 2
+
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 200
+    assert client.get(f'/api/expenses/?user_id={bob}', headers={'If-None-Match': bob_etag}).status_code == 304
+    descriptions = {expense['id']: expense['description'] for expense in _expenses(client, alice)}
+    assert descriptions == {ids[0]: 'Groceries', ids[1]: 'Groceries', ids[2]: 'Lunch'}
+
+
+def test_bulk_update_keeps_amount_columns_equal(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    make_expense(alice, make_category(alice))
+    client.patch(f'/api/expenses/?user_id={alice}', json={'amount_cents': 1999})
+    assert _expenses(client, alice)[0]['amount'] == 19.99
+    response = client.get(f'/api/expenses/?user_id={alice}&amount_format=cents')
+    assert response.get_json()['data'][0]['amount_cents'] == 1999
+
+
+def test_bulk_dry_run_changes_nothing(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    make_expense(alice, make_category(alice))
+    etag = client.get(f'/api/expenses/?user_id={alice}').headers['ETag']
+
+    response = client.delete(f'/api/expenses/?user_id={alice}&dry_run=true')
+    assert response.get_json()['data'] == {'matched': 1, 'dry_run': True}
+    assert client.get(f'/api/expenses/?user_id={alice}', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_bulk_delete_needs_a_filter(client):
+    assert client.delete('/api/expenses/').status_code == 400
+
+
+def test_bulk_delete_removes_matches_and_bumps_version(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    food, travel = make_category(alice, 'Food'), make_category(alice, 'Travel')
+    make_expense(alice, food)
+    make_expense(alice, food)
+    kept = make_expense(alice, travel)
+    etag = client.get(f'/api/expenses/?user_id={alice}').headers['ETag']
+
+    response = client.delete(f'/api/expenses/?user_id={alice}&category_id={food}')
+    assert response.get_json()['data']['deleted'] == 2
+    assert client.get(f'/api/expenses/?user_id={alice}', headers={'If-None-Match': etag}).status_code == 200
+    assert [expense['id'] for expense in _expenses(client, alice)] == [kept]
+
+
+def test_bulk_writes_stay_within_token_user(client, make_user, make_category, make_expense, login):
+    make_user('alice')
+    bob = make_user('bob')
+    theirs = make_expense(bob, make_category(bob))
+
+    response = client.delete(f'/api/expenses/?ids={theirs}', headers=login('alice'))
+    assert response.get_json()['data']['deleted'] == 0
+    assert len(_expenses(client, bob)) == 1
@@ -0,0 +1,226 @@
+import os
+import pickle
+import threading
+import time
+from datetime import date, datetime
+
+import pytest
+
+from app.services import shared_cache
+from app.services.result_cache import ResultCache
+from app.services.shared_cache import MISSING, SharedCache
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {
+        'SHARED_CACHE_ENABLED': True,
+        'SHARED_CACHE_PATH': str(tmp_path / 'shared.cache'),
+        'SHARED_CACHE_SLOTS': 256,
+        'RESULT_CACHE_ENABLED': True,
+    }
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'unit.cache')
+
+
+def _open(path):
+    return SharedCache(path, slots=64, slot_bytes=512)
+
+
+# Shared cache
+
+def test_values_round_trip_between_processes(cache_path):
+    writer, reader = _open(cache_path), _open(cache_path)
+    value = {'at': datetime(2024, 5, 1, 12, 30), 'on': date(2024, 5, 1), 'rows': [[1, 'Food']]}
+    assert writer.set('categories', (1,), value, ttl=60)
+    assert reader.get('categories', (1,)) == value
+    assert reader.get('categories', (2,)) is MISSING
+
+
+def test_values_expire(cache_path):
+    cache = _open(cache_path)
+    cache.set('categories', (1,), [1], ttl=0.2)
+    time.sleep(0.3)
+    assert cache.get('categories', (1,)) is MISSING
+
+
+def test_invalidation_refuses_values_read_before_it(cache_path):
+    cache = _open(cache_path)
+    read_at = time.time()
+    cache.invalidate('versions', [('default', 1)], hold=5)
+    assert not cache.set('versions', ('default', 1), [1, 'stale'], ttl=60, read_at=read_at)
+    assert cache.get('versions', ('default', 1)) is MISSING
+
+
+def test_values_that_are_not_json_are_refused(cache_path):
+    with pytest.raises(TypeError):
+        _open(cache_path).set('categories', (1,), object(), ttl=60)
+
+
+unpickled = []
+
+
+class _Payload:
+    def __reduce__(self):
+        return unpickled.append, ('executed',)
+
+
+def test_pickled_bytes_are_never_unpickled(cache_path):
+    cache = _open(cache_path)
+    key = shared_cache._key_bytes('categories', (1,))
+    key_hash = shared_cache._hash(key)
+    with cache._locked():
+        cache._write_slot(
+            cache._window(key_hash)[0], key_hash, time.time() + 60, shared_cache._VALUE, key, pickle.dumps(_Payload()),
+        )
+    assert cache.get('categories', (1,)) is MISSING
+    assert unpickled == []
+
+
+def test_file_open_to_other_users_is_refused(cache_path):
+    _open(cache_path)
+    os.chmod(cache_path, 0o666)
+    with pytest.raises(PermissionError):
+        _open(cache_path)
+
+
+def test_symlink_is_not_followed(tmp_path, cache_path):
+    _open(cache_path)
+    link = str(tmp_path / 'link.cache')
+    os.symlink(cache_path, link)
+    with pytest.raises(OSError):
+        _open(link)
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason='changing the owner of a file needs root')
+def test_file_of_another_user_is_refused(cache_path):
+    _open(cache_path)
+    os.chown(cache_path, 65534, 65534)
+    with pytest.raises(PermissionError):
+        _open(cache_path)
+
+
+def test_private_directory_is_only_ours(tmp_path):
+    path = shared_cache.private_directory(str(tmp_path))
+    assert os.stat(path).st_mode & 0o777 == 0o700
+    os.chmod(path, 0o777)
+    with pytest.raises(PermissionError):
+        shared_cache.private_directory(str(tmp_path))
+
+
+def test_refused_cache_leaves_app_running(tmp_path, monkeypatch, app_config, make_user):
+    from app import create_app
+    from app.config.config import TestConfig
+    path = tmp_path / 'loose.cache'
+    _open(str(path))
+    os.chmod(path, 0o644)
+    monkeypatch.setattr(TestConfig, 'SHARED_CACHE_PATH', str(path))
+    other = create_app('testing')
+    assert 'shared_cache' not in other.extensions
+    assert other.test_client().get(f'/api/categories/?user_id={make_user("alice")}').status_code == 200
+
+
+# Through the API
+
+def test_category_list_follows_writes(client, make_user, make_category):
+    alice = make_user('alice')
+    category = make_category(alice)
+    path = f'/api/categories/?user_id={alice}'
+    assert [row['name'] for row in client.get(path).get_json()['data']] == ['Food']
+    assert [row['name'] for row in client.get(path).get_json()['data']] == ['Food']
+    assert client.get('/health/shared-cache').get_json()['namespaces']['categories']['hits'] >= 1
+
+    client.put(f'/api/categories/{category}', json={'name': 'Groceries'})
+    assert [row['name'] for row in client.get(path).get_json()['data']] == ['Groceries']
+
+
+def test_budget_spend_follows_new_expenses(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    category = make_category(alice)
+    response = client.post(f'/api/budgets/?user_id={alice}', json={
+        'name': 'Food', 'amount': 100, 'period': 'monthly', 'category_id': category,
+        'start_date': '2020-01-01T00:00:00',
+    })
+    budget = response.get_json()['data']['id']
+    assert client.get(f'/api/budgets/{budget}').get_json()['data']['spent_amount'] == 0
+    assert client.get(f'/api/budgets/?user_id={alice}').get_json()['data'][0]['spent_amount'] == 0
+
+    make_expense(alice, category, amount='30.00')
+    assert client.get(f'/api/budgets/{budget}').get_json()['data']['spent_amount'] == 30
+    assert client.get(f'/api/budgets/?user_id={alice}').get_json()['data'][0]['spent_amount'] == 30
+
+
+# Result cache
+
+def test_result_cache_computes_once_for_concurrent_callers():
+    cache = ResultCache()
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+                 for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while cache.stats()['coalesced'] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert cache.get_or_compute('key', compute) == 42
+    assert cache.stats()['hits'] == 1
+
+
+def test_result_cache_shares_errors_and_caches_nothing():
+    cache = ResultCache()
+    started, release, errors = threading.Event(), threading.Event(), []
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('boom')
+
+    def call():
+        try:
+            cache.get_or_compute('key', compute)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while cache.stats()['coalesced'] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert cache.stats()['errors'] == 1
+    assert cache.get_or_compute('key', lambda: 'fresh') == 'fresh'
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.get_or_compute(key, lambda: key)
+    cache.get_or_compute('a', lambda: 'recomputed')
+    cache.get_or_compute('c', lambda: 'c')
+    assert cache.get_or_compute('a', lambda: 'recomputed') == 'a'
+    assert cache.get_or_compute('b', lambda: 'recomputed') == 'recomputed'
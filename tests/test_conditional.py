@@ -0,0 +1,92 @@
+import pytest
+
+
+def test_list_etag_answers_304_until_data_changes(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    category = make_category(alice)
+    make_expense(alice, category)
+    path = f'/api/expenses/?user_id={alice}'
+
+    response = client.get(path)
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    make_expense(alice, category, description='Dinner')
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()['data']) == 2
+
+
+def test_etag_is_per_query(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    make_expense(alice, make_category(alice))
+    etag = client.get(f'/api/expenses/?user_id={alice}').headers['ETag']
+    assert client.get(f'/api/expenses/?user_id={alice}&amount_format=cents', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_detail_etag_changes_with_the_expense(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    expense = make_expense(alice, make_category(alice))
+    path = f'/api/expenses/{expense}'
+    etag = client.get(path).headers['ETag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    client.put(path, json={'description': 'Changed'})
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['data']['description'] == 'Changed'
+
+
+def test_detail_etag_changes_with_the_embedded_user(client, make_user, make_category, make_expense):
+    alice = make_user('alice', first_name='Alice')
+    expense = make_expense(alice, make_category(alice))
+    path = f'/api/expenses/{expense}'
+    etag = client.get(path).headers['ETag']
+
+    client.put(f'/api/users/{alice}', json={'first_name': 'Alicia'})
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['data']['user']['first_name'] == 'Alicia'
+
+
+def test_unchanged_update_keeps_etag(client, make_user, make_category, make_expense):
+    alice = make_user('alice', first_name='Alice')
+    expense = make_expense(alice, make_category(alice))
+    etag = client.get(f'/api/expenses/{expense}').headers['ETag']
+
+    client.put(f'/api/users/{alice}', json={'first_name': 'Alice'})
+    assert client.get(f'/api/expenses/{expense}', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_other_users_writes_keep_etag(client, make_user, make_category, make_expense):
+    alice, bob = make_user('alice'), make_user('bob')
+    make_expense(alice, make_category(alice))
+    path = f'/api/expenses/?user_id={alice}'
+    etag = client.get(path).headers['ETag']
+
+    make_expense(bob, make_category(bob))
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_msgpack_has_its_own_etag(client, make_user, make_category, make_expense):
+    pytest.importorskip('msgpack')
+    alice = make_user('alice')
+    expense = make_expense(alice, make_category(alice))
+    msgpack = {'Accept': 'application/msgpack'}
+
+    for path in (f'/api/expenses/{expense}', f'/api/expenses/?user_id={alice}'):
+        json_response = client.get(path)
+        assert 'Accept' in json_response.headers['Vary']
+
+        response = client.get(path, headers={**msgpack, 'If-None-Match': json_response.headers['ETag']})
+        assert response.status_code == 200
+        assert response.mimetype == 'application/msgpack'
+        assert 'Accept' in response.headers['Vary']
+        assert response.headers['ETag'] != json_response.headers['ETag']
+
+        not_modified = client.get(path, headers={**msgpack, 'If-None-Match': response.headers['ETag']})
+        assert not_modified.status_code == 304
+        assert 'Accept' in not_modified.headers['Vary']
+        assert client.get(path, headers={'If-None-Match': response.headers['ETag']}).status_code == 200
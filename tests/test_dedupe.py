@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from app.config.extensions import db
+from app.models.expense import Expense
+from app.services import dedupe
+
+
+def test_create_reports_possible_duplicates(client, make_user, make_category, make_expense):
+    alice, bob = make_user('alice'), make_user('bob')
+    category = make_category(alice)
+    first = make_expense(alice, category, description='Coffee at Blue Bottle')
+    make_expense(bob, make_category(bob), description='Coffee at Blue Bottle')
+
+    response = client.post(f'/api/expenses/?user_id={alice}', json={
+        'amount': '12.50', 'description': 'coffee at blue bottle!', 'category_id': category,
+    })
+    assert response.get_json()['data']['possible_duplicates'] == [first]
+
+    response = client.post(f'/api/expenses/?user_id={alice}', json={
+        'amount': '12.51', 'description': 'Coffee at Blue Bottle', 'category_id': category,
+    })
+    assert response.get_json()['data']['possible_duplicates'] == []
+
+
+def test_duplicates_endpoint_clusters_matches(client, make_user, make_category, make_expense):
+    alice = make_user('alice')
+    category = make_category(alice)
+    first = make_expense(alice, category, description='Uber to airport')
+    second = make_expense(alice, category, description='Uber to the airport')
+    make_expense(alice, category, description='Groceries')
+
+    clusters = client.get(f'/api/expenses/duplicates?user_id={alice}').get_json()['data']
+    assert [[expense['id'] for expense in cluster] for cluster in clusters] == [[first, second]]
+
+
+def test_batch_check_is_linear_in_existing_rows(app, make_user, make_category, monkeypatch):
+    alice = make_user('alice')
+    category = make_category(alice)
+    day = datetime(2024, 3, 1)
+    with app.app_context():
+        db.session.add_all(
+            Expense(user_id=alice, category_id=category, amount_cents=1250, expense_date=day, description=f'Lunch {i}')
+            for i in range(150)
+        )
+        db.session.commit()
+
+        calls = []
+        similarity = dedupe.similarity
+        monkeypatch.setattr(dedupe, 'similarity', lambda a, b: calls.append(1) or similarity(a, b))
+        rows = [{'amount_cents': 1250, 'expense_date': day, 'description': 'Lunch 7'}] * 2
+        matches = dedupe.find_duplicates_for_batch(alice, rows)
+
+    assert len(matches[0]) >= 1
+    assert ('batch', 0) in matches[1]
+    # Each new row is compared with the existing rows once; existing rows are never compared with each other
+    assert len(calls) <= 2 * 150 + 1
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+import sqlalchemy as sa
+from flask_migrate import check, downgrade, upgrade
+
+from app import create_app
+from app.config.config import TestConfig
+from app.config.extensions import db
+from app.services import partitions, search
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+@pytest.fixture
+def migrated_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(TestConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'migrations.db'}")
+    app = create_app('testing')
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_models_match_migrations(migrated_app):
+    # Exits when autogenerate finds a difference, e.g. the FTS tables it must not drop
+    check(directory=MIGRATIONS)
+    tables = sa.inspect(db.engine).get_table_names()
+    assert search.FTS_TABLE in tables
+
+
+def test_amount_cents_backfill(migrated_app):
+    downgrade(directory=MIGRATIONS, revision='5c8e2f7a1d93')
+    now = '2024-01-01 00:00:00'
+    with db.engine.begin() as connection:
+        connection.execute(sa.text(
+            "INSERT INTO users (id, email, username, password_hash, is_active, created_at, updated_at) "
+            "VALUES (1, 'a@example.com', 'alice', 'x', 1, :now, :now)"
+        ), {'now': now})
+        connection.execute(sa.text(
+            "INSERT INTO categories (id, name, user_id, created_at, updated_at) VALUES (1, 'Food', 1, :now, :now)"
+        ), {'now': now})
+        connection.execute(sa.text(
+            "INSERT INTO expenses (amount, description, expense_date, user_id, category_id, created_at, updated_at) "
+            "VALUES (12.345, 'Lunch', :now, 1, 1, :now, :now), (0.1, 'Gum', :now, 1, 1, :now, :now)"
+        ), {'now': now})
+        connection.execute(sa.text(
+            "INSERT INTO budgets (name, amount, period, start_date, is_active, user_id, created_at, updated_at) "
+            "VALUES ('Food', 250, 'monthly', :now, 1, 1, :now, :now)"
+        ), {'now': now})
+
+    upgrade(directory=MIGRATIONS)
+    with db.engine.connect() as connection:
+        assert connection.execute(sa.text('SELECT amount_cents FROM expenses ORDER BY id')).scalars().all() == [1235, 10]
+        assert connection.execute(sa.text('SELECT amount_cents FROM budgets')).scalar() == 25000
+        # The table rebuild kept search working
+        matches = connection.execute(sa.text(
+            f"SELECT rowid FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH 'lunch'"
+        )).scalars().all()
+    assert len(matches) == 1
+    columns = {column['name']: column for column in sa.inspect(db.engine).get_columns('expenses')}
+    assert columns['amount_cents']['nullable'] is False
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('expenses_p202401', True),
+    ('expenses_default', True),
+    ('expenses', False),
+    ('expenses_fts', False),
+    ('expenses_p2024', False),
+    ('budgets_p202401', False),
+])
+def test_partition_names(name, expected):
+    assert partitions.is_partition_name(name) is expected
@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy import insert, select
+
+from app.config.extensions import db
+from app.models.expense import Expense
+from app.models.role import Category
+from app.services.sharding import get_shard_router
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'SHARD_DATABASE_URLS': [f"sqlite:///{tmp_path / 'shard1.db'}"]}
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context():
+        db.metadata.create_all(db.engines['shard1'])
+    return app
+
+
+@pytest.fixture
+def users_by_shard(app, make_user):
+    """Users until both shards have one: {shard: user_id}."""
+    placed = {}
+    with app.app_context():
+        router = get_shard_router()
+        for n in range(40):
+            user_id = make_user(f'user{n}')
+            placed.setdefault(router.shard_of(user_id), user_id)
+            if len(placed) == 2:
+                return placed
+    pytest.fail('the hash ring put every user on one shard')
+
+
+def _shared_names(app, shard):
+    with app.app_context():
+        table = Category.__table__
+        with get_shard_router().engine(shard).connect() as connection:
+            return dict(connection.execute(select(table.c.id, table.c.name).where(table.c.user_id.is_(None))).all())
+
+
+def _create_shared(client, name='Household'):
+    response = client.post('/api/categories/', json={'name': name})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['data']['id']
+
+
+def test_shared_category_is_usable_on_every_shard(app, client, users_by_shard):
+    shared = _create_shared(client)
+    assert _shared_names(app, 'shard0') == _shared_names(app, 'shard1') == {shared: 'Household'}
+
+    for user_id in users_by_shard.values():
+        response = client.post(f'/api/expenses/?user_id={user_id}', json={
+            'amount': '5.00', 'description': 'Soap', 'category_id': shared,
+        })
+        assert response.status_code == 201, response.get_json()
+        assert response.get_json()['data']['category']['name'] == 'Household'
+
+
+def test_shared_category_changes_reach_every_shard(app, client, users_by_shard):
+    shared = _create_shared(client)
+    user_id = users_by_shard['shard1']
+    expense = client.post(f'/api/expenses/?user_id={user_id}', json={
+        'amount': '5.00', 'description': 'Soap', 'category_id': shared,
+    }).get_json()['data']['id']
+
+    assert client.put(f'/api/categories/{shared}', json={'name': 'Home'}).status_code == 200
+    assert _shared_names(app, 'shard1') == {shared: 'Home'}
+    assert client.get(f'/api/expenses/{expense}').get_json()['data']['category']['name'] == 'Home'
+
+    # Still used on shard1: refused everywhere
+    assert client.delete(f'/api/categories/{shared}').status_code == 409
+    assert _shared_names(app, 'shard0') == _shared_names(app, 'shard1') == {shared: 'Home'}
+
+    client.delete(f'/api/expenses/{expense}')
+    assert client.delete(f'/api/categories/{shared}').status_code == 200
+    assert _shared_names(app, 'shard0') == _shared_names(app, 'shard1') == {}
+
+
+def test_shared_ids_do_not_clash_with_shard_rows(app, client, users_by_shard, make_category):
+    for user_id in users_by_shard.values():
+        make_category(user_id, 'Mine')
+    shared = _create_shared(client)
+    for shard in ('shard0', 'shard1'):
+        assert _shared_names(app, shard) == {shared: 'Household'}
+
+
+def test_rolled_back_shared_category_leaves_no_copies(app, client, users_by_shard):
+    response = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': '/api/categories/', 'body': {'name': 'Household'}},
+        {'path': '/api/nope'},
+    ]})
+    assert response.get_json()['data']['committed'] is False
+    assert _shared_names(app, 'shard0') == _shared_names(app, 'shard1') == {}
+
+
+def test_sync_replaces_copies_made_under_other_ids(app, client, users_by_shard, make_category):
+    shared = _create_shared(client)
+    user_id = users_by_shard['shard1']
+    with app.app_context():
+        engine = get_shard_router().engine('shard1')
+        table = Category.__table__
+        with engine.begin() as connection:
+            # As an earlier move left it: its own copy under another id, used by an expense
+            connection.execute(table.delete().where(table.c.id == shared))
+            stray = connection.execute(
+                insert(table).values(id=shared + 100, name='Household', user_id=None).returning(table.c.id)
+            ).scalar_one()
+        category = make_category(user_id)
+        expense = client.post(f'/api/expenses/?user_id={user_id}', json={
+            'amount': '5.00', 'description': 'Soap', 'category_id': category,
+        }).get_json()['data']['id']
+        with engine.begin() as connection:
+            connection.execute(Expense.__table__.update().where(Expense.id == expense).values(category_id=stray))
+
+        assert get_shard_router().sync_shared_categories() == 1
+
+    assert _shared_names(app, 'shard1') == {shared: 'Household'}
+    assert client.get(f'/api/expenses/{expense}').get_json()['data']['category_id'] == shared